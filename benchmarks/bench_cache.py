@@ -0,0 +1,86 @@
+"""
+Compares opening an archive cold with opening
+it from an ArchiveCache's snapshots.
+
+    python -m benchmarks.bench_cache
+"""
+import os
+import tempfile
+import time
+from dataclasses import dataclass
+
+from mentalics import ArchiveCache, Archiver, NSCoding, Unarchiver
+from mentalics.ns_keyed_archive import NSKeyedArchive
+from mentalics.ns_types import NS_TYPES, NSPoint
+
+ITEM_COUNT = 50_000
+
+
+@dataclass
+class Item(NSCoding):
+    __slots__ = ("name", "number", "position", "parent")
+
+    name: str
+    number: int
+    position: NSPoint
+    parent: "Item"
+
+    def __init_from_archive__(self, decoder) -> "NSCoding":
+        self.name = decoder.decode("name")
+        self.number = decoder.decode("number")
+        self.position = decoder.decode("position")
+        self.parent = decoder.decode("parent")
+        return self
+
+    def encode_archive(self, coder) -> None:
+        coder.encode(self.name, for_key="name")
+        coder.encode(self.number, for_key="number")
+        coder.encode(self.position, for_key="position")
+        coder.encode(self.parent, for_key="parent")
+
+
+CLASSES = dict(NS_TYPES, Item=Item)
+
+
+def write_archive(path: str) -> None:
+    items = []
+    for i in range(ITEM_COUNT):
+        parent = items[i // 2] if items else None
+        items.append(Item(f"item {i}", i, NSPoint(i, -i), parent))
+
+    with open(path, "wb") as file:
+        archiver = Archiver(file, class_map=CLASSES)
+        archiver.encode(items)
+        archiver.finish()
+
+
+def timed(run) -> float:
+    start = time.perf_counter()
+    run()
+    return time.perf_counter() - start
+
+
+def main():
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "items.plist")
+        write_archive(path)
+        cache = ArchiveCache(os.path.join(directory, "cache"))
+
+        def load_cold():
+            with open(path, "rb") as file:
+                return NSKeyedArchive(file)
+
+        def decode_cold():
+            with open(path, "rb") as file:
+                return Unarchiver(file, class_map=dict(CLASSES)).decode()
+
+        cache.load_archive(path)
+        cache.decode(path, CLASSES)
+
+        print(f"{'':<10} {'cold':>8} {'cached':>8}")
+        print(f"{'$objects':<10} {timed(load_cold):>8.3f} {timed(lambda: cache.load_archive(path)):>8.3f}")
+        print(f"{'decode':<10} {timed(decode_cold):>8.3f} {timed(lambda: cache.decode(path, CLASSES)):>8.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Times decoding single very large NSArrays and
+NSDictionaries, of strings, numbers and instances.
+
+    python -m benchmarks.bench_collections
+"""
+import gc
+import plistlib as pl
+import time
+import typing as t
+
+from mentalics import Unarchiver
+from mentalics.ns_keyed_archive import NSKeyedArchive
+from mentalics.ns_types import NS_TYPES
+
+from .corpus import Node, _ArchiveBuilder
+
+SIZES = (100_000, 500_000)
+REPEATS = 3
+
+
+def string_array(size: int) -> tuple[_ArchiveBuilder, pl.UID]:
+    builder = _ArchiveBuilder()
+    root = builder.reserve()
+    builder.set(root, builder.array([builder.add(f"string {i}") for i in range(size)]))
+    return builder, root
+
+
+def instance_array(size: int) -> tuple[_ArchiveBuilder, pl.UID]:
+    builder = _ArchiveBuilder()
+    root = builder.reserve()
+    builder.set(root, builder.array([builder.add(builder.node("Node", i)) for i in range(size)]))
+    return builder, root
+
+
+def inline_array(size: int) -> tuple[_ArchiveBuilder, pl.UID]:
+    builder = _ArchiveBuilder()
+    root = builder.reserve()
+    builder.set(root, builder.array(list(range(size))))
+    return builder, root
+
+
+def dictionary(size: int) -> tuple[_ArchiveBuilder, pl.UID]:
+    builder = _ArchiveBuilder()
+    root = builder.reserve()
+    keys = [builder.add(f"key {i}") for i in range(size)]
+    values = [builder.add(builder.node("Node", i)) if i % 2 else i for i in range(size)]
+    builder.set(root, builder.instance("NSDictionary", **{"NS.keys": keys, "NS.objects": values}))
+    return builder, root
+
+
+COLLECTIONS: dict[str, t.Callable[[int], tuple[_ArchiveBuilder, pl.UID]]] = {
+    "array of strings": string_array,
+    "array of instances": instance_array,
+    "array of numbers": inline_array,
+    "dictionary": dictionary,
+    }
+
+
+def main():
+    class_map = dict(NS_TYPES, Node=Node)
+    print(f"{'collection':<32} {'seconds':>8} {'elements/s':>12}")
+    for name, build in COLLECTIONS.items():
+        for size in SIZES:
+            builder, root = build(size)
+            archive = NSKeyedArchive.from_objects(100_000, {"root": root}, builder.objects)
+            best = float("inf")
+            for _ in range(REPEATS):
+                gc.collect()
+                start = time.perf_counter()
+                Unarchiver(archive, class_map=dict(class_map)).decode()
+                best = min(best, time.perf_counter() - start)
+            print(f"{f'{name} x{size}':<32} {best:>8.3f} {size / best:>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
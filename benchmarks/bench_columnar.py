@@ -0,0 +1,60 @@
+"""
+Compares aggregating an attribute over many archives
+by decoding them and walking the objects, with exporting
+them once and scanning the exported column.
+
+    python -m benchmarks.bench_columnar
+"""
+import os
+import tempfile
+import time
+
+from mentalics import Unarchiver, explore_many
+from mentalics.columnar import export_columns, read_table
+
+from .corpus import generate
+
+ARCHIVE_COUNT = 4
+SIZE = 50_000
+
+
+def main():
+    with tempfile.TemporaryDirectory() as directory:
+        paths = []
+        for seed in range(ARCHIVE_COUNT):
+            archive = generate("cycles", SIZE, seed)
+            paths.append(os.path.join(directory, f"{seed}.plist"))
+            with open(paths[-1], "wb") as file:
+                file.write(archive.data)
+
+        start = time.perf_counter()
+        total = 0
+        for path in paths:
+            with open(path, "rb") as file:
+                root = Unarchiver(file, class_map=dict(archive.class_map)).decode()
+            node = root
+            while True:
+                total += node.value
+                node = node.next
+                if node is root:
+                    break
+        walk_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        explorer = explore_many(paths, workers=1)
+        export_columns(paths, os.path.join(directory, "columns"), explorer)
+        export_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        column_total = sum(read_table(os.path.join(directory, "columns"), "Node")["value"].values)
+        scan_seconds = time.perf_counter() - start
+
+        assert column_total == total
+        print(f"{ARCHIVE_COUNT} archives of {SIZE} objects")
+        print(f"decode and walk   {walk_seconds:>8.3f}s")
+        print(f"explore + export  {export_seconds:>8.3f}s (once)")
+        print(f"scan a column     {scan_seconds:>8.3f}s")
+
+
+if __name__ == "__main__":
+    main()
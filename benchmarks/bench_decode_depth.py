@@ -0,0 +1,115 @@
+"""
+Compares the Unarchiver's iterative decoding with the
+recursive list decoding it replaced, on synthetic deep
+and wide archives.
+
+    python -m benchmarks.bench_decode_depth
+"""
+import plistlib as pl
+import time
+import typing as t
+
+from mentalics import NSCoding, Unarchiver
+from mentalics.ns_keyed_archive import NSKeyedArchive
+
+REPEATS = 3
+NODE_CLASS = {"$classname": "Node", "$classes": ["Node", "NSObject"]}
+
+
+class Node(NSCoding):
+    __slots__ = ("value", "next")
+
+    def __init_from_archive__(self, decoder) -> "NSCoding":
+        self.value = decoder.decode("value")
+        self.next = decoder.decode("next")
+        return self
+
+
+class RecursiveUnarchiver(Unarchiver):
+    """
+    Decodes nested lists recursively, as before
+    """
+
+    def _decode_non_reference(self, archived_object: t.Any):
+        if isinstance(archived_object, list):
+            return [self._decode(o) for o in archived_object]
+
+        return archived_object
+
+
+def _archive(objects: list) -> NSKeyedArchive:
+    # Built in memory: plistlib itself cannot
+    # read lists nested this deep
+    return NSKeyedArchive.from_objects(100_000, {"root": pl.UID(2)}, objects)
+
+
+def linked_chain(length: int) -> NSKeyedArchive:
+    """
+    A chain of nodes, each referencing the next
+    """
+    objects: list = ["$null", NODE_CLASS]
+    for i in range(length):
+        next_uid = pl.UID(len(objects) + 1) if i < length - 1 else pl.UID(0)
+        objects.append({"$class": pl.UID(1), "value": i, "next": next_uid})
+    return _archive(objects)
+
+
+def wide_list(length: int) -> NSKeyedArchive:
+    """
+    One node referencing many others in a list
+    """
+    objects: list = ["$null", NODE_CLASS]
+    children = [pl.UID(3 + i) for i in range(length)]
+    objects.append({"$class": pl.UID(1), "value": children, "next": pl.UID(0)})
+    for i in range(length):
+        objects.append({"$class": pl.UID(1), "value": i, "next": pl.UID(0)})
+    return _archive(objects)
+
+
+def nested_lists(depth: int) -> NSKeyedArchive:
+    """
+    One node holding a plain list nested depth times
+    """
+    value: list = [0]
+    for i in range(depth):
+        value = [i, value]
+    return _archive(["$null", NODE_CLASS, {"$class": pl.UID(1), "value": value, "next": pl.UID(0)}])
+
+
+def many_small_lists(count: int) -> NSKeyedArchive:
+    value = [[i, [i, i + 1]] for i in range(count)]
+    return _archive(["$null", NODE_CLASS, {"$class": pl.UID(1), "value": value, "next": pl.UID(0)}])
+
+
+def time_decode(unarchiver_class: type[Unarchiver], archive: NSKeyedArchive) -> str:
+    best = float("inf")
+    for _ in range(REPEATS):
+        unarchiver = unarchiver_class(archive)
+        unarchiver.set_class(Node, "Node")
+
+        start = time.perf_counter()
+        try:
+            unarchiver.decode()
+        except RecursionError:
+            return "RecursionError"
+        best = min(best, time.perf_counter() - start)
+    return f"{best:.3f}s"
+
+
+def main():
+    cases = [
+        ("linked chain (200k)", linked_chain(200_000)),
+        ("wide list (200k)", wide_list(200_000)),
+        ("nested lists (20k deep)", nested_lists(20_000)),
+        ("small lists (100k)", many_small_lists(100_000)),
+        ]
+
+    print(f"{'archive':<26} {'iterative':>15} {'recursive':>15}")
+    for name, archive in cases:
+        iterative = time_decode(Unarchiver, archive)
+        recursive = time_decode(RecursiveUnarchiver, archive)
+        print(f"{name:<26} {iterative:>15} {recursive:>15}")
+
+
+if __name__ == "__main__":
+    main()
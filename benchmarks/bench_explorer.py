@@ -0,0 +1,55 @@
+"""
+Shows that Explorer's class inference scales
+linearly with the number of instances.
+
+    python -m benchmarks.bench_explorer
+"""
+import io
+import plistlib as pl
+import time
+
+from mentalics import Explorer
+from mentalics.ns_keyed_archive import NSKeyedArchive
+
+SIZES = (10_000, 20_000, 40_000, 80_000, 160_000)
+CLASS_COUNT = 50
+
+
+def make_archive(instance_count: int) -> NSKeyedArchive:
+    objects: list = ["$null"]
+    class_uids = []
+    for i in range(CLASS_COUNT):
+        chain = [f"Class{i}", f"Base{i % 5}", "NSObject"]
+        class_uids.append(pl.UID(len(objects)))
+        objects.append({"$classname": chain[0], "$classes": chain})
+
+    for i in range(instance_count):
+        n = i % CLASS_COUNT
+        objects.append({"$class": class_uids[n], "shared": i, f"own{n}": pl.UID(0)})
+
+    plist = {"$version": 100_000, "$archiver": "NSKeyedArchiver", "$top": {"root": pl.UID(CLASS_COUNT + 1)},
+             "$objects": objects}
+    return NSKeyedArchive(io.BytesIO(pl.dumps(plist, fmt=pl.FMT_BINARY)))
+
+
+def time_inference(archive: NSKeyedArchive, field_stats: bool) -> float:
+    explorer = Explorer.__new__(Explorer)
+    explorer._collect_field_stats = field_stats
+
+    start = time.perf_counter()
+    explorer._find_classes(archive)
+    return time.perf_counter() - start
+
+
+def main():
+    print(f"{'instances':>10} {'seconds':>10} {'us/instance':>12} {'with field stats':>17}")
+    for size in SIZES:
+        archive = make_archive(size)
+        elapsed = time_inference(archive, field_stats=False)
+        elapsed_with_stats = time_inference(archive, field_stats=True)
+
+        print(f"{size:>10} {elapsed:>10.3f} {elapsed / size * 1e6:>12.2f} {elapsed_with_stats / size * 1e6:>17.2f}")
+
+
+if __name__ == "__main__":
+    main()
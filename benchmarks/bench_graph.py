@@ -0,0 +1,46 @@
+"""
+Times building a ReferenceGraph and answering queries
+with it, against decoding the whole archive.
+
+    python -m benchmarks.bench_graph
+"""
+import io
+import time
+import typing as t
+
+from mentalics import ReferenceGraph, Unarchiver
+from mentalics.ns_keyed_archive import NSKeyedArchive
+
+from .corpus import generate
+
+SIZES = (10_000, 50_000)
+SHAPES = ("cycles", "deep_arrays", "many_classes")
+REPEATS = 3
+
+
+def best_time(run: t.Callable[[], t.Any]) -> float:
+    best = float("inf")
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        run()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    print(f"{'archive':<24} {'decode':>8} {'index':>8} {'reachable':>10} {'sccs':>8}  (seconds)")
+    for shape in SHAPES:
+        for size in SIZES:
+            corpus = generate(shape, size)
+            archive = NSKeyedArchive(io.BytesIO(corpus.data))
+            graph = ReferenceGraph(archive)
+
+            decode = best_time(lambda: Unarchiver(archive, class_map=dict(corpus.class_map)).decode())
+            index = best_time(lambda: ReferenceGraph(archive))
+            reachable = best_time(graph.unreachable)
+            sccs = best_time(graph.strongly_connected_components)
+            print(f"{f'{shape}/{size}':<24} {decode:>8.3f} {index:>8.3f} {reachable:>10.3f} {sccs:>8.3f}")
+
+
+if __name__ == "__main__":
+    main()
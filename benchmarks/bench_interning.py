@@ -0,0 +1,53 @@
+"""
+Compares the memory held by the decoded graphs of
+many similar archives, with and without an InternPool.
+
+    python -m benchmarks.bench_interning
+"""
+import gc
+import io
+import tracemalloc
+
+from mentalics import InternPool, Unarchiver
+
+from .corpus import generate
+
+ARCHIVE_COUNTS = (1, 2, 4, 8)
+SIZE = 10_000
+SHAPES = ("many_classes", "values", "wide_dictionary")
+
+
+def resident_bytes(archives: list, pool_size: int) -> int:
+    """
+    Memory held by the decoded roots of the archives,
+    with a pool of pool_size values (none if 0)
+    """
+    pool = InternPool(max_size=pool_size) if pool_size else None
+
+    gc.collect()
+    tracemalloc.start()
+    roots = []
+    for archive in archives:
+        unarchiver = Unarchiver(io.BytesIO(archive.data), class_map=dict(archive.class_map), intern_pool=pool)
+        roots.append(unarchiver.decode())
+        del unarchiver
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return size
+
+
+def main():
+    print(f"{'archives':<26} {'MB':>8} {'MB pooled':>10}")
+    for shape in SHAPES:
+        for count in ARCHIVE_COUNTS:
+            # Archives of the same shape and size share their
+            # strings' values, but differ in everything random
+            archives = [generate(shape, SIZE, seed) for seed in range(count)]
+            plain = resident_bytes(archives, 0)
+            pooled = resident_bytes(archives, 4 * SIZE)
+            print(f"{f'{shape} x{count}':<26} {plain / 1e6:>8.1f} {pooled / 1e6:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""
+Times reading and decoding binary archives with
+and without (generous) Limits, eagerly and lazily,
+to show what checking them costs.
+
+    python -m benchmarks.bench_limits
+"""
+import gc
+import io
+import time
+import typing as t
+
+from mentalics import Limits, Unarchiver
+
+from .corpus import SHAPES, generate
+
+SIZE = 50_000
+REPEATS = 3
+
+GENEROUS = Limits(max_objects=10 ** 8, max_bytes=1 << 40, max_list_length=10 ** 8, max_depth=10_000,
+                  timeout=3600.0)
+
+
+def _best(decode: t.Callable[[], t.Any]) -> float:
+    best = float("inf")
+    for _ in range(REPEATS):
+        gc.collect()
+        start = time.perf_counter()
+        decode()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    print(f"{'shape':<20} {'lazy':<6} {'no limits':>10} {'limits':>10} {'overhead':>9}")
+    for shape in SHAPES:
+        archive = generate(shape, SIZE)
+        for lazy in (False, True):
+            def decode(limits: t.Optional[Limits]) -> None:
+                unarchiver = Unarchiver(io.BytesIO(archive.data), class_map=dict(archive.class_map), lazy=lazy,
+                                        limits=limits)
+                unarchiver.decode()
+
+            unlimited = _best(lambda: decode(None))
+            limited = _best(lambda: decode(GENEROUS))
+            print(f"{shape:<20} {str(lazy):<6} {unlimited:>10.3f} {limited:>10.3f} "
+                  f"{limited / unlimited - 1:>+9.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+Times structural hashing, and measures how much a
+SubgraphStore saves on archives that are mostly alike.
+
+    python -m benchmarks.bench_merkle
+"""
+import io
+import os
+import tempfile
+import time
+
+from mentalics.merkle import SubgraphStore, structural_hashes
+from mentalics.ns_keyed_archive import NSKeyedArchive
+
+from .corpus import generate
+
+SIZES = (10_000, 50_000)
+SHAPES = ("cycles", "many_classes", "wide_dictionary")
+VERSION_COUNT = 20
+
+
+def edited(archive: NSKeyedArchive, version: int) -> NSKeyedArchive:
+    """
+    The archive with one string changed
+    """
+    objects = dict(archive.objects)
+    strings = [uid for uid, entry in objects.items() if isinstance(entry, str) and entry != "$null"]
+    if strings:
+        uid = strings[version * 7919 % len(strings)]
+        objects[uid] = f"{objects[uid]} (version {version})"
+    return NSKeyedArchive.from_objects(archive.version, archive.top, objects)
+
+
+def main():
+    print(f"{'archive':<24} {'hash s':>8} {'objects/s':>10}")
+    for shape in SHAPES:
+        for size in SIZES:
+            archive = NSKeyedArchive(io.BytesIO(generate(shape, size).data))
+            start = time.perf_counter()
+            structural_hashes(archive)
+            seconds = time.perf_counter() - start
+            print(f"{f'{shape}/{size}':<24} {seconds:>8.3f} {len(archive.objects) / seconds:>10.0f}")
+
+    print()
+    print(f"{VERSION_COUNT} edited versions of each archive:")
+    print(f"{'archive':<24} {'files MB':>9} {'stored MB':>10}")
+    for shape in SHAPES:
+        corpus = generate(shape, SIZES[0])
+        archive = NSKeyedArchive(io.BytesIO(corpus.data))
+        with tempfile.TemporaryDirectory() as directory:
+            with SubgraphStore(os.path.join(directory, "store.db")) as store:
+                for version in range(VERSION_COUNT):
+                    store.put(edited(archive, version))
+                stored = store.stored_bytes()
+        print(f"{f'{shape}/{SIZES[0]}':<24} {VERSION_COUNT * len(corpus.data) / 1e6:>9.1f} {stored / 1e6:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Compares the memory use and decoding speed of the
+slotted ns_types with the __dict__-backed classes
+they replaced.
+
+    python -m benchmarks.bench_ns_types
+"""
+import gc
+import plistlib as pl
+import time
+import tracemalloc
+from dataclasses import dataclass
+
+from mentalics import NSCoding, Unarchiver
+from mentalics.ns_keyed_archive import NSKeyedArchive
+from mentalics.ns_types import NS_TYPES, NSArray, NSPoint
+from mentalics.ns_types.ns_value import parse_pair
+
+COUNT = 200_000
+REPEATS = 3
+
+
+@dataclass
+class LegacyPoint(NSCoding):
+    x: int
+    y: int
+
+    def __init_from_archive__(self, decoder) -> "NSCoding":
+        as_string: str = decoder.decode("NS.pointval")
+
+        values_as_strings: list[str] = as_string.lstrip("{").rstrip("}").split(", ")
+        values = [int(x) for x in values_as_strings]
+
+        assert len(values) == 2
+        x, y = values
+        return self.__init__(x, y)
+
+
+class LegacyArray(NSCoding, list):
+    def __init_from_archive__(self, decoder) -> "NSCoding":
+        return self.__init__(decoder.decode("NS.objects"))
+
+
+def legacy_parse(as_string: str) -> tuple[int, int]:
+    x, y = [int(x) for x in as_string.lstrip("{").rstrip("}").split(", ")]
+    return x, y
+
+
+def bytes_per_instance(make) -> float:
+    gc.collect()
+    tracemalloc.start()
+    instances = [make(i) for i in range(COUNT)]
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del instances
+    return size / COUNT
+
+
+def best_time(run) -> float:
+    best = float("inf")
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        run()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def points_archive() -> NSKeyedArchive:
+    objects: list = ["$null", {"$classname": "NSArray", "$classes": ["NSArray", "NSObject"]},
+                     {"$classname": "NSValue", "$classes": ["NSValue", "NSObject"]}]
+    points = []
+    for i in range(COUNT):
+        points.append(pl.UID(len(objects)))
+        objects.append({"$class": pl.UID(2), "NS.special": 1, "NS.pointval": f"{{{i}, {i + 1}}}"})
+    objects.append({"$class": pl.UID(1), "NS.objects": points})
+
+    return NSKeyedArchive.from_objects(100_000, {"root": pl.UID(len(objects) - 1)}, objects)
+
+
+def main():
+    print(f"{'':<24} {'legacy':>10} {'slotted':>10}")
+
+    print(f"{'NSPoint bytes':<24} {bytes_per_instance(lambda i: LegacyPoint(i, i)):>10.0f} "
+          f"{bytes_per_instance(lambda i: NSPoint(i, i)):>10.0f}")
+    print(f"{'NSArray bytes':<24} {bytes_per_instance(lambda i: LegacyArray()):>10.0f} "
+          f"{bytes_per_instance(lambda i: NSArray()):>10.0f}")
+
+    strings = [f"{{{i}, {i + 1}}}" for i in range(COUNT)]
+    print(f"{'parse points (s)':<24} {best_time(lambda: [legacy_parse(s) for s in strings]):>10.3f} "
+          f"{best_time(lambda: [parse_pair(s) for s in strings]):>10.3f}")
+
+    archive = points_archive()
+    legacy_classes = dict(NS_TYPES, NSPoint=LegacyPoint, NSArray=LegacyArray)
+    print(f"{'decode points (s)':<24} "
+          f"{best_time(lambda: Unarchiver(archive, class_map=legacy_classes).decode()):>10.3f} "
+          f"{best_time(lambda: Unarchiver(archive).decode()):>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
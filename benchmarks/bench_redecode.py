@@ -0,0 +1,61 @@
+"""
+Compares decoding an edited archive from scratch with
+Unarchiver.redecode, which reuses the objects decoded
+from the archive before the edit.
+
+    python -m benchmarks.bench_redecode
+"""
+import io
+import time
+
+from mentalics import Unarchiver
+from mentalics.ns_keyed_archive import NSKeyedArchive
+
+from .corpus import generate
+
+SIZES = (1_000, 10_000, 50_000)
+SHAPES = ("cycles", "many_classes")
+REPEATS = 3
+
+
+def edited(archive: NSKeyedArchive) -> NSKeyedArchive:
+    """
+    The archive with the value of one object changed
+    """
+    objects = dict(archive.objects)
+    for uid, entry in objects.items():
+        if isinstance(entry, str) and entry != "$null":
+            objects[uid] = entry + " (edited)"
+            break
+        if isinstance(entry, dict) and isinstance(entry.get("value"), int):
+            objects[uid] = dict(entry, value=-entry["value"])
+            break
+    return NSKeyedArchive.from_objects(archive.version, archive.top, objects)
+
+
+def main():
+    print(f"{'archive':<24} {'full (s)':>10} {'redecode (s)':>13} {'speedup':>8}")
+    for shape in SHAPES:
+        for size in SIZES:
+            corpus = generate(shape, size)
+            archive = NSKeyedArchive(io.BytesIO(corpus.data))
+            new_archive = edited(archive)
+
+            full = redecode = float("inf")
+            for _ in range(REPEATS):
+                previous = Unarchiver(archive, class_map=dict(corpus.class_map))
+                previous.decode()
+
+                start = time.perf_counter()
+                Unarchiver(new_archive, class_map=dict(corpus.class_map)).decode()
+                full = min(full, time.perf_counter() - start)
+
+                start = time.perf_counter()
+                previous.redecode(new_archive).decode()
+                redecode = min(redecode, time.perf_counter() - start)
+
+            print(f"{f'{shape}/{size}':<24} {full:>10.4f} {redecode:>13.4f} {full / redecode:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Compares reading XML archives with NSKeyedArchive's
+incremental parser and with plistlib, in time and
+peak memory.
+
+    python -m benchmarks.bench_xml
+"""
+import gc
+import io
+import plistlib as pl
+import time
+import tracemalloc
+import typing as t
+
+from mentalics.ns_keyed_archive import NSKeyedArchive
+
+from .corpus import generate
+
+SIZES = (10_000, 50_000)
+SHAPES = ("cycles", "many_classes", "values")
+
+
+def _xml_value(value: t.Any) -> t.Any:
+    """
+    value with its UIDs written as CF$UID dicts,
+    which plistlib can't do itself
+    """
+    if isinstance(value, pl.UID):
+        return {"CF$UID": value.data}
+    if isinstance(value, dict):
+        return {k: _xml_value(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_xml_value(v) for v in value]
+    return value
+
+
+def as_xml(data: bytes) -> bytes:
+    return pl.dumps(_xml_value(pl.loads(data)), fmt=pl.FMT_XML, sort_keys=False)
+
+
+def measure(run: t.Callable[[], t.Any]) -> tuple[float, float]:
+    """
+    Seconds taken, and peak megabytes
+    """
+    gc.collect()
+    start = time.perf_counter()
+    run()
+    seconds = time.perf_counter() - start
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        run()
+        return seconds, tracemalloc.get_traced_memory()[1] / 1e6
+    finally:
+        tracemalloc.stop()
+
+
+def main():
+    print(f"{'archive':<24} {'file MB':>8} {'plistlib s':>11} {'MB':>7} {'incremental s':>14} {'MB':>7}")
+    for shape in SHAPES:
+        for size in SIZES:
+            data = as_xml(generate(shape, size).data)
+            plistlib_seconds, plistlib_mb = measure(lambda: pl.load(io.BytesIO(data)))
+            seconds, mb = measure(lambda: NSKeyedArchive(io.BytesIO(data)))
+            print(f"{f'{shape}/{size}':<24} {len(data) / 1e6:>8.1f} {plistlib_seconds:>11.3f} {plistlib_mb:>7.1f}"
+                  f" {seconds:>14.3f} {mb:>7.1f}")
+
+
+if __name__ == "__main__":
+    main()
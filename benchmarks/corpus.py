@@ -0,0 +1,174 @@
+"""
+A deterministic generator of synthetic NSKeyedArchiver
+archives, in a few shapes that stress different parts
+of the unarchiver. The same shape, size and seed always
+give the same bytes.
+"""
+import plistlib as pl
+import random
+import typing as t
+
+from mentalics import NSCoding
+from mentalics.ns_types import NS_TYPES
+
+DEFAULT_SEED = 0
+BLOB_SIZE = 64 * 1024
+# One blob per this many objects of size
+OBJECTS_PER_BLOB = 100
+MAX_CLASS_COUNT = 1000
+
+
+class Node(NSCoding):
+    """
+    The class of every object in the corpus that
+    is not built in, whatever its archived name
+    """
+
+    __slots__ = ("value", "next", "other")
+
+    def __init_from_archive__(self, decoder) -> "NSCoding":
+        self.value = decoder.decode("value")
+        self.next = decoder.decode("next")
+        self.other = decoder.decode("other")
+        return self
+
+
+class _ArchiveBuilder:
+    """
+    Writes $objects directly, so the corpus
+    does not depend on the Archiver under test
+    """
+
+    objects: list[t.Any]
+    node_class_names: set[str]  # decoded as Node
+    _class_uids: dict[str, pl.UID]
+
+    def __init__(self):
+        self.objects = ["$null"]
+        self.node_class_names = set()
+        self._class_uids = {}
+
+    def add(self, entry: t.Any) -> pl.UID:
+        self.objects.append(entry)
+        return pl.UID(len(self.objects) - 1)
+
+    def reserve(self) -> pl.UID:
+        return self.add(None)
+
+    def set(self, uid: pl.UID, entry: t.Any) -> None:
+        self.objects[uid.data] = entry
+
+    def instance(self, class_name: str, superclass_names: tuple[str, ...] = (), **fields) -> dict:
+        class_uid = self._class_uids.get(class_name)
+        if class_uid is None:
+            classes = [class_name, *superclass_names, "NSObject"]
+            class_uid = self._class_uids[class_name] = self.add({"$classname": class_name, "$classes": classes})
+        return {"$class": class_uid, **fields}
+
+    def array(self, uids: list[pl.UID]) -> dict:
+        return self.instance("NSArray", **{"NS.objects": uids})
+
+    def node(self, class_name: str, value: t.Any, next_uid: pl.UID = pl.UID(0),
+             other_uid: pl.UID = pl.UID(0)) -> dict:
+        self.node_class_names.add(class_name)
+        return self.instance(class_name, value=value, next=next_uid, other=other_uid)
+
+    def to_bytes(self, root: pl.UID) -> bytes:
+        return pl.dumps({
+            "$version": 100_000,
+            "$archiver": "NSKeyedArchiver",
+            "$top": {"root": root},
+            "$objects": self.objects,
+            }, fmt=pl.FMT_BINARY, sort_keys=False)
+
+
+def wide_dictionary(size: int, rng: random.Random) -> tuple[_ArchiveBuilder, pl.UID]:
+    builder = _ArchiveBuilder()
+    root = builder.reserve()
+    keys = [builder.add(f"key {i}") for i in range(size)]
+    values = [builder.add(f"value {rng.randrange(size)}") if i % 2 else rng.randrange(1 << 31) for i in range(size)]
+    builder.set(root, builder.instance("NSDictionary", **{"NS.keys": keys, "NS.objects": values}))
+    return builder, root
+
+
+def deep_arrays(size: int, rng: random.Random) -> tuple[_ArchiveBuilder, pl.UID]:
+    builder = _ArchiveBuilder()
+    uids = [builder.reserve() for _ in range(size)]
+    for i, uid in enumerate(uids):
+        # Each array holds a number and the next array
+        builder.set(uid, builder.array([rng.randrange(1000)] + uids[i + 1:i + 2]))
+    return builder, uids[0]
+
+
+def cycles(size: int, rng: random.Random) -> tuple[_ArchiveBuilder, pl.UID]:
+    builder = _ArchiveBuilder()
+    uids = [builder.reserve() for _ in range(size)]
+    for i, uid in enumerate(uids):
+        # A ring, and a random chord from every node
+        builder.set(uid, builder.node("Node", i, uids[(i + 1) % size], rng.choice(uids)))
+    return builder, uids[0]
+
+
+def values(size: int, rng: random.Random) -> tuple[_ArchiveBuilder, pl.UID]:
+    builder = _ArchiveBuilder()
+    root = builder.reserve()
+    uids = []
+    for i in range(size):
+        a, b = rng.randrange(-5000, 5000), rng.randrange(5000)
+        if i % 2:
+            uids.append(builder.add(builder.instance("NSValue", **{"NS.special": 1, "NS.pointval": f"{{{a}, {b}}}"})))
+        else:
+            uids.append(builder.add(builder.instance("NSValue", **{"NS.special": 2, "NS.sizeval": f"{{{b}, {a}}}"})))
+    builder.set(root, builder.array(uids))
+    return builder, root
+
+
+def data_blobs(size: int, rng: random.Random) -> tuple[_ArchiveBuilder, pl.UID]:
+    builder = _ArchiveBuilder()
+    root = builder.reserve()
+    uids = [builder.add(builder.instance("NSMutableData", ("NSData",), **{"NS.data": rng.randbytes(BLOB_SIZE)}))
+            for _ in range(max(1, size // OBJECTS_PER_BLOB))]
+    builder.set(root, builder.array(uids))
+    return builder, root
+
+
+def many_classes(size: int, rng: random.Random) -> tuple[_ArchiveBuilder, pl.UID]:
+    builder = _ArchiveBuilder()
+    root = builder.reserve()
+    class_count = min(size, MAX_CLASS_COUNT)
+    # Strings are referenced, as NSKeyedArchiver does
+    uids = [builder.add(builder.node(f"Class{rng.randrange(class_count)}", builder.add(f"object {i}")))
+            for i in range(size)]
+    builder.set(root, builder.array(uids))
+    return builder, root
+
+
+SHAPES: dict[str, t.Callable[[int, random.Random], tuple[_ArchiveBuilder, pl.UID]]] = {
+    "wide_dictionary": wide_dictionary,
+    "deep_arrays": deep_arrays,
+    "cycles": cycles,
+    "values": values,
+    "data_blobs": data_blobs,
+    "many_classes": many_classes,
+    }
+
+
+class CorpusArchive(t.NamedTuple):
+    shape: str
+    size: int
+    data: bytes
+    object_count: int
+    class_map: dict[str, type[NSCoding]]
+
+
+def generate(shape: str, size: int, seed: int = DEFAULT_SEED) -> CorpusArchive:
+    """
+    An archive of the given shape with about size objects,
+    and the class map needed to decode it
+    """
+    builder, root = SHAPES[shape](size, random.Random(f"{shape}-{size}-{seed}"))
+
+    class_map = dict(NS_TYPES)
+    class_map.update(dict.fromkeys(builder.node_class_names, Node))
+
+    return CorpusArchive(shape, size, builder.to_bytes(root), len(builder.objects), class_map)
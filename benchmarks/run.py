@@ -0,0 +1,143 @@
+"""
+Runs the Unarchiver and Explorer over the synthetic
+corpus at several sizes, and compares the results
+with a stored baseline:
+
+    python -m benchmarks.run                  # compare with benchmarks/baseline.json
+    python -m benchmarks.run --save           # record a new baseline
+    python -m benchmarks.run --sizes 1000 --shapes cycles values
+
+Timings are the best of a few runs, but are still only
+comparable between runs on the same machine.
+"""
+import argparse
+import gc
+import io
+import json
+import os
+import time
+import tracemalloc
+import typing as t
+
+from mentalics import Explorer, Unarchiver
+from mentalics.ns_keyed_archive import NSKeyedArchive
+
+from .corpus import SHAPES, CorpusArchive, generate
+
+DEFAULT_SIZES = (1_000, 10_000, 50_000)
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+REPEATS = 3
+# Slower than the baseline by more than this is flagged
+REGRESSION_THRESHOLD = 0.10
+
+# Lower is better for all of these but objects_per_second
+METRICS = ("parse_seconds", "decode_seconds", "explore_seconds", "peak_mb", "objects_per_second")
+
+
+def _best_time(run: t.Callable[[], t.Any]) -> float:
+    best = float("inf")
+    for _ in range(REPEATS):
+        gc.collect()
+        start = time.perf_counter()
+        run()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def _peak_memory(run: t.Callable[[], t.Any]) -> int:
+    gc.collect()
+    tracemalloc.start()
+    try:
+        run()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def measure(archive: CorpusArchive) -> dict[str, float]:
+    def parse():
+        return NSKeyedArchive(io.BytesIO(archive.data))
+
+    def decode():
+        Unarchiver(parse(), class_map=dict(archive.class_map)).decode()
+
+    parsed = parse()
+    parse_seconds = _best_time(parse)
+    # Excludes parsing, which is timed on its own
+    decode_seconds = _best_time(lambda: Unarchiver(parsed, class_map=dict(archive.class_map)).decode())
+    explore_seconds = _best_time(lambda: Explorer(parsed))
+
+    return {
+        "parse_seconds": parse_seconds,
+        "decode_seconds": decode_seconds,
+        "explore_seconds": explore_seconds,
+        "peak_mb": _peak_memory(decode) / 1e6,
+        "objects_per_second": archive.object_count / (parse_seconds + decode_seconds),
+        }
+
+
+def run(shapes: t.Iterable[str], sizes: t.Iterable[int]) -> dict[str, dict[str, float]]:
+    results = {}
+    for shape in shapes:
+        for size in sizes:
+            results[f"{shape}/{size}"] = measure(generate(shape, size))
+    return results
+
+
+def _change(metric: str, baseline: float, result: float) -> float:
+    """
+    How much worse the result is, as a fraction
+    """
+    if metric == "objects_per_second":
+        return baseline / result - 1 if result else float("inf")
+    return result / baseline - 1 if baseline else 0.0
+
+
+def report(results: dict[str, dict[str, float]], baseline: t.Optional[dict[str, dict[str, float]]]) -> int:
+    """
+    Print the results, against the baseline if there
+    is one, and return the number of regressions
+    """
+    regressions = 0
+    print(f"{'archive':<24}" + "".join(f"{metric:>26}" for metric in METRICS))
+    for name, result in results.items():
+        cells = []
+        for metric in METRICS:
+            cell = f"{result[metric]:.3f}" if metric != "objects_per_second" else f"{result[metric]:.0f}"
+            if baseline and name in baseline:
+                change = _change(metric, baseline[name][metric], result[metric])
+                flag = "!" if change > REGRESSION_THRESHOLD else " "
+                regressions += change > REGRESSION_THRESHOLD
+                cell += f" ({change:+.0%}){flag}"
+            cells.append(f"{cell:>26}")
+        print(f"{name:<24}" + "".join(cells))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Unarchiver and Explorer on a synthetic corpus")
+    parser.add_argument("--shapes", nargs="+", choices=sorted(SHAPES), default=list(SHAPES))
+    parser.add_argument("--sizes", nargs="+", type=int, default=list(DEFAULT_SIZES))
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save", action="store_true", help="store the results as the new baseline")
+    args = parser.parse_args()
+
+    baseline = None
+    if not args.save and os.path.exists(args.baseline):
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+
+    results = run(args.shapes, args.sizes)
+    regressions = report(results, baseline)
+
+    if args.save:
+        with open(args.baseline, "w") as file:
+            json.dump(results, file, indent=2, sort_keys=True)
+        print(f"Saved baseline to {args.baseline}")
+    elif baseline is not None:
+        print(f"{regressions} regression(s) of more than {REGRESSION_THRESHOLD:.0%} against {args.baseline}")
+        raise SystemExit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,9 @@
 from .unarchiver import Unarchiver
-from .explorer import Explorer
-from .nscoding import AutoNSCoding, NSCoding
+from .archiver import Archiver
+from .bulk import LoadResult, aload_many, load_many
+from .cache import ArchiveCache
+from .explorer import Explorer, ExplorerSummary, explore_many
+from .graph import ReferenceGraph
+from .interning import InternPool
+from .limits import LimitExceeded, Limits
+from .nscoding import AutoNSCoding, NSCoding, ValueNSCoding
@@ -0,0 +1,301 @@
+import plistlib as pl
+import typing as t
+from array import array
+from collections import deque
+from copy import copy
+from datetime import datetime
+
+from .bplist import BinaryPlistWriter
+from .ns_keyed_archive import NSKeyedArchive, NSVALUE_SPECIAL_CLASS_NAMES
+from .ns_types import NS_TYPES, NSArray, NSDictionary
+from .nscoding import NSCoding
+from .unarchiver import ARCHIVE_VERSION, NULL_UID
+
+ARCHIVER_NAME = "NSKeyedArchiver"
+ROOT_CLASS_NAME = "NSObject"
+
+# Inverse of NSVALUE_SPECIAL_CLASS_NAMES, for NSValue subclasses
+NSVALUE_SPECIALS = {name: special for special, name in NSVALUE_SPECIAL_CLASS_NAMES.items() if special != 0}
+
+# Values that are stored directly in the archived object
+INLINE_TYPES = (bool, int, float, bytes, bytearray, memoryview, datetime)
+
+
+class Archiver:
+    """
+    Archives object graphs as NSKeyedArchiver binary plists,
+    given a description of the objects contained.
+
+    ```
+    with open("my.plist", "wb") as file:
+        archiver = Archiver(file)
+        archiver.encode(root)
+        archiver.finish()
+    ```
+
+    Each object is written to the file as soon as it has
+    been encoded: the archive is never held in memory as
+    a whole. Objects are deduplicated by identity, and
+    strings and class descriptions by value.
+    """
+
+    _writer: BinaryPlistWriter
+    _class_names: dict[type, str]
+
+    _uids: dict[int, pl.UID]  # id(obj) -> UID
+    _encoded_objects: list[t.Any]  # keeps ids in _uids valid
+    _string_uids: dict[str, pl.UID]
+    _class_uids: dict[type, pl.UID]
+    _class_description_uids: dict[tuple[str, ...], pl.UID]
+    _object_refs: array  # UID -> reference in the plist
+
+    _current_container_stack: deque[dict[str, t.Any]]
+    _encode_later_queue: deque[tuple[NSCoding, pl.UID]]
+
+    @property
+    def _at_top_level(self):
+        # if the stack is only the top container
+        # then we are at the top
+        return len(self._current_container_stack) == 1
+
+    @property
+    def _current_container(self) -> dict[str, t.Any]:
+        return self._current_container_stack[-1]
+
+    def __init__(self, fp: t.IO, class_map: t.Optional[dict[str, type[NSCoding]]] = None, ref_size: int = 4):
+        self._writer = BinaryPlistWriter(fp, ref_size=ref_size)
+
+        class_map = class_map if class_map is not None else copy(NS_TYPES)
+        self._class_names = {cls: name for name, cls in class_map.items()}
+
+        self._uids = {}
+        self._encoded_objects = []
+        self._string_uids = {}
+        self._class_uids = {}
+        self._class_description_uids = {}
+        self._object_refs = array("Q")
+
+        self._current_container_stack = deque()
+        self._current_container_stack.append({})
+        self._encode_later_queue = deque()
+
+        # UID 0 is always $null
+        self._object_refs.append(self._writer.write("$null"))
+
+    def encode(self, value: t.Any, for_key: t.Optional[str] = None) -> None:
+        """
+        Encode a value on the object currently being archived.
+        Objects and strings are archived separately and referenced.
+        """
+        self._encode_for_key(self._encode(value), for_key)
+
+    def encode_inline(self, value: t.Any, for_key: str) -> None:
+        """
+        Store a plist value (e.g. a string) directly in the
+        current object instead of referencing it, like
+        NSCoder's encodePoint:forKey: does
+        """
+        self._encode_for_key(value, for_key)
+
+    def _encode_for_key(self, archived_value: t.Any, key: t.Optional[str]) -> None:
+        container = self._current_container
+
+        if key:
+            key = NSKeyedArchive.sanitize_key(key)
+
+        if key is None:
+            if self._at_top_level:
+                key = "root"
+            else:
+                raise ValueError("A key must be specified when encoding attributes of an object")
+
+        if key in container:
+            raise ValueError(f"Key {key} already encoded on the current object")
+
+        container[key] = archived_value
+
+        if self._at_top_level:
+            self._finish_encoding()
+
+    def _encode(self, value: t.Any) -> t.Any:
+        if value is None:
+            return NULL_UID
+
+        if isinstance(value, NSCoding):
+            return self._reference_to(value)
+
+        if isinstance(value, str):
+            return self._string_uid(value)
+
+        if isinstance(value, (list, tuple)):
+            return self._encode_list(value)
+
+        if isinstance(value, dict):
+            return self._wrapped_reference_to(value, NSDictionary)
+
+        if isinstance(value, INLINE_TYPES):
+            return value
+
+        raise TypeError(f"Cannot archive {type(value)}: it is not NSCoding")
+
+    def _encode_list(self, value: t.Union[list, tuple]) -> t.Any:
+        """
+        Lists are stored inline, nested lists included, and
+        are encoded without recursion. A list that contains
+        itself cannot be stored inline, so it is archived as
+        an NSArray and referenced instead.
+        """
+        # (list, its remaining items, its encoded items)
+        stack = [(value, iter(value), [])]
+        on_stack = {id(value)}
+        while True:
+            source, items, encoded = stack[-1]
+            for item in items:
+                if isinstance(item, (list, tuple)) and not isinstance(item, NSCoding):
+                    if id(item) in on_stack or id(item) in self._uids:
+                        encoded.append(self._wrapped_reference_to(item, NSArray))
+                    else:
+                        stack.append((item, iter(item), []))
+                        on_stack.add(id(item))
+                        break
+                else:
+                    encoded.append(self._encode(item))
+            else:
+                stack.pop()
+                on_stack.discard(id(source))
+                # Referenced from within itself
+                archived = self._uids.get(id(source), encoded)
+                if not stack:
+                    return archived
+                stack[-1][2].append(archived)
+
+    def _wrapped_reference_to(self, value: t.Any, wrapper: type[NSCoding]) -> pl.UID:
+        """
+        A reference to value archived as a wrapper, e.g. a
+        dict as an NSDictionary. Memoized by the identity
+        of value, so it is archived once, even in a cycle.
+        """
+        uid = self._uids.get(id(value))
+        if uid is None:
+            uid = self._uids[id(value)] = self._reference_to(wrapper(value))
+            self._encoded_objects.append(value)
+        return uid
+
+    def _reserve_uid(self) -> pl.UID:
+        uid = pl.UID(len(self._object_refs))
+        self._object_refs.append(0)  # filled in once written
+        return uid
+
+    def _reference_to(self, obj: NSCoding) -> pl.UID:
+        uid = self._uids.get(id(obj))
+        if uid is None:
+            # Reserve a UID now, so circular references
+            # can point at it, and encode the object later
+            uid = self._uids[id(obj)] = self._reserve_uid()
+            self._encoded_objects.append(obj)
+            self._encode_later(obj, uid)
+        return uid
+
+    def _string_uid(self, value: str) -> pl.UID:
+        uid = self._string_uids.get(value)
+        if uid is None:
+            uid = self._string_uids[value] = self._reserve_uid()
+            self._object_refs[uid.data] = self._writer.write(value)
+        return uid
+
+    def _class_name_of(self, cls: type) -> str:
+        if cls not in self._class_names:
+            raise ValueError(f"Class {cls} not set on archiver")
+        return self._class_names[cls]
+
+    def _class_uid(self, cls: type) -> pl.UID:
+        uid = self._class_uids.get(cls)
+        if uid is None:
+            # Different classes can share a description,
+            # e.g. NSPoint and NSSize are both NSValues
+            description = self._class_description(cls)
+            description_key = tuple(description["$classes"])
+
+            uid = self._class_description_uids.get(description_key)
+            if uid is None:
+                uid = self._class_description_uids[description_key] = self._reserve_uid()
+                self._object_refs[uid.data] = self._writer.write(description)
+            self._class_uids[cls] = uid
+        return uid
+
+    def _class_description(self, cls: type) -> dict[str, t.Any]:
+        class_name = self._archived_class_name(self._class_name_of(cls))
+
+        # Every archived superclass, most specific first
+        class_names = [class_name]
+        for superclass in cls.__mro__[1:]:
+            if superclass in self._class_names:
+                superclass_name = self._archived_class_name(self._class_names[superclass])
+                if superclass_name not in class_names:
+                    class_names.append(superclass_name)
+        if ROOT_CLASS_NAME not in class_names:
+            class_names.append(ROOT_CLASS_NAME)
+
+        return {"$classname": class_name, "$classes": class_names}
+
+    @staticmethod
+    def _archived_class_name(class_name: str) -> str:
+        # NSPoint etc. are archived as NSValues
+        if class_name in NSVALUE_SPECIAL_CLASS_NAMES.values():
+            return "NSValue"
+        return class_name
+
+    def _new_container(self, obj: NSCoding) -> dict[str, t.Any]:
+        cls = type(obj)
+        container = {"$class": self._class_uid(cls)}
+
+        # Inverse of Unarchiver._special_class_of_nsvalue
+        special = NSVALUE_SPECIALS.get(self._class_names[cls])
+        if special is not None:
+            container["NS.special"] = special
+
+        return container
+
+    def _encode_later(self, obj: NSCoding, uid: pl.UID):
+        self._encode_later_queue.append((obj, uid))
+
+    def _finish_encoding(self) -> None:
+        """
+        Encoding one object records the other objects
+        it references, which are encoded afterwards, in
+        order, so circular references are never followed.
+        Each object is written out once it is complete.
+        """
+        while self._encode_later_queue:  # is not empty
+            obj, uid = self._encode_later_queue.popleft()
+
+            self._current_container_stack.append(self._new_container(obj))
+            obj.encode_archive(self)
+            container = self._current_container_stack.pop()
+
+            self._object_refs[uid.data] = self._writer.write(container)
+
+    def finish(self) -> None:
+        """
+        Write $top, the table of $objects and the trailer.
+        Nothing can be encoded afterwards.
+        """
+        if not self._at_top_level:
+            raise ValueError("finish can only be called at the top level")
+
+        writer = self._writer
+        keys = ["$version", "$archiver", "$top", "$objects"]
+        values = [
+            writer.write(ARCHIVE_VERSION),
+            writer.write(ARCHIVER_NAME),
+            writer.write(self._current_container),
+            writer.write_array_refs(self._object_refs),
+            ]
+        writer.finish(writer.write_dict_refs([writer.write(k) for k in keys], values))
+
+    def set_class(self, cls: type[NSCoding], name: str):
+        self._class_names[cls] = name
+
+    def set_classes(self, classes: t.Mapping[str, type[NSCoding]]):
+        for name, cls in classes.items():
+            self.set_class(cls, name)
@@ -0,0 +1,500 @@
+import io
+import mmap
+import plistlib as pl
+import struct
+import typing as t
+from array import array
+from collections.abc import Mapping
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from .limits import Budget, LimitExceeded
+
+BPLIST_MAGIC = b"bplist00"
+TRAILER_FORMAT = ">6xBBQQQ"
+TRAILER_SIZE = 32
+
+# Binary plists count dates from 1/1/2001 (year of Mac OS X 10.0)
+BPLIST_EPOCH = datetime(2001, 1, 1)
+
+# struct formats for big-endian unsigned ints, by size
+INT_FORMATS = {1: "B", 2: "H", 4: "L", 8: "Q"}
+
+# Scalars that are only written once per plist
+MEMOIZED_TYPES = frozenset((str, int, float, bool, type(None), pl.UID, datetime))
+
+WRITE_CHUNK_SIZE = 1 << 16
+
+KEY_CACHE_SIZE = 4096
+
+# Containers are parsed recursively, so however deep a
+# budget allows, they can't be nested deeper than this
+MAX_DEPTH = 256
+
+
+@contextmanager
+def _invalid_file_errors() -> t.Iterator[None]:
+    """
+    Reading past the end of a truncated or corrupt file fails
+    in struct or in indexing: report it as an invalid file
+    """
+    try:
+        yield
+    except (LimitExceeded, pl.InvalidFileException):
+        raise
+    except (IndexError, struct.error, OverflowError, ValueError) as e:
+        raise pl.InvalidFileException() from e
+
+
+class LazyBinaryPlist:
+    """
+    Memory-maps a bplist00 file and parses objects
+    only when they are requested.
+
+    Opening only reads the header and trailer: object
+    offsets are read out of the offset table on demand.
+
+    With zero_copy=True, data objects are returned as
+    read-only memoryviews into the file instead of bytes.
+
+    With a budget, the length and nesting of arrays and
+    dictionaries are checked before they are parsed. Without
+    one, they are still nested at most MAX_DEPTH deep.
+
+    Corrupt files raise pl.InvalidFileException.
+    """
+
+    num_objects: int
+    top_object: int
+
+    _buffer: t.Union[mmap.mmap, bytes]
+    _view: t.Optional[memoryview]  # of _buffer, if zero-copy
+    _offset_size: int
+    _ref_size: int
+    _offset_table_offset: int
+
+    # Dictionary keys are shared between many objects,
+    # so the parsed keys are kept (up to a limit)
+    _key_cache: dict[int, t.Any]
+
+    _budget: t.Optional[Budget]
+    _depth: int  # of the containers being parsed
+
+    def __init__(self, fp: t.IO, zero_copy: bool = False, budget: t.Optional[Budget] = None):
+        self._buffer = self._map(fp)
+        self._view = memoryview(self._buffer) if zero_copy else None
+        self._budget = budget
+        self._depth = 0
+
+        if self._buffer[:len(BPLIST_MAGIC)] != BPLIST_MAGIC or len(self._buffer) < TRAILER_SIZE:
+            raise pl.InvalidFileException("Not a bplist00 file")
+
+        with _invalid_file_errors():
+            (
+                self._offset_size, self._ref_size, self.num_objects, self.top_object,
+                self._offset_table_offset
+            ) = struct.unpack(TRAILER_FORMAT, self._buffer[-TRAILER_SIZE:])
+
+        if self._offset_size == 0 or self._ref_size == 0:
+            raise pl.InvalidFileException("Invalid bplist00 trailer")
+
+        self._key_cache = {}
+
+    @staticmethod
+    def _map(fp: t.IO) -> t.Union[mmap.mmap, bytes]:
+        """
+        Files on disk are memory-mapped. Anything else
+        (e.g. BytesIO) is read into memory once.
+        """
+        try:
+            return mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+        except (AttributeError, OSError, ValueError, io.UnsupportedOperation):
+            fp.seek(0)
+            return fp.read()
+
+    def _read_int(self, position: int, size: int) -> int:
+        return int.from_bytes(self._buffer[position:position + size], "big")
+
+    def _read_ints(self, position: int, count: int, size: int) -> t.Sequence[int]:
+        if size in INT_FORMATS:
+            return struct.unpack_from(f">{count}{INT_FORMATS[size]}", self._buffer, position)
+        return [self._read_int(position + i * size, size) for i in range(count)]
+
+    def _offset_of(self, ref: int) -> int:
+        if not 0 <= ref < self.num_objects:
+            raise pl.InvalidFileException(f"Object reference {ref} out of range")
+        return self._read_ints(self._offset_table_offset + ref * self._offset_size, 1, self._offset_size)[0]
+
+    def _read_size(self, token_low: int, position: int) -> tuple[int, int]:
+        """
+        Returns the size of a variable-length object
+        and the position its contents start at
+        """
+        if token_low != 0xF:
+            return token_low, position
+
+        size_bytes = 1 << (self._buffer[position] & 0x3)
+        return self._read_int(position + 1, size_bytes), position + 1 + size_bytes
+
+    def _read_refs(self, position: int, count: int) -> t.Sequence[int]:
+        return self._read_ints(position, count, self._ref_size)
+
+    def container_refs(self, ref: int) -> tuple[int, int]:
+        """
+        Returns the position of the references held by an
+        array, and the number of references, without parsing
+        any of its elements
+        """
+        with _invalid_file_errors():
+            position = self._offset_of(ref)
+            token = self._buffer[position]
+            if token & 0xF0 != 0xA0:
+                raise pl.InvalidFileException(f"Object {ref} is not an array")
+            return self._read_size(token & 0x0F, position + 1)[::-1]
+
+    def ref_at(self, refs_position: int, index: int) -> int:
+        with _invalid_file_errors():
+            return self._read_refs(refs_position + index * self._ref_size, 1)[0]
+
+    def read_refs(self, refs_position: int, count: int) -> t.Sequence[int]:
+        """
+        The references held by an array, from container_refs
+        """
+        with _invalid_file_errors():
+            return self._read_refs(refs_position, count)
+
+    def read_dict_refs(self, ref: int) -> dict[t.Any, int]:
+        """
+        Parses the keys of a dictionary, but leaves
+        its values as object references
+        """
+        with _invalid_file_errors():
+            position = self._offset_of(ref)
+            token = self._buffer[position]
+            if token & 0xF0 != 0xD0:
+                raise pl.InvalidFileException(f"Object {ref} is not a dictionary")
+
+            count, position = self._read_size(token & 0x0F, position + 1)
+            key_refs = self._read_refs(position, count)
+            value_refs = self._read_refs(position + count * self._ref_size, count)
+        try:
+            return {self.read_object(k): v for k, v in zip(key_refs, value_refs)}
+        except TypeError:
+            raise pl.InvalidFileException("Unhashable dictionary key")
+
+    def read_object(self, ref: int) -> t.Any:
+        """
+        Parses an object and everything it contains
+        """
+        if self._budget is not None:
+            self._budget.tick()
+        self._depth = 0
+        with _invalid_file_errors():
+            return self._read_object(ref, {})
+
+    def _read_object(self, ref: int, seen: dict[int, t.Any]) -> t.Any:
+        # `seen` holds containers parsed during this call,
+        # so shared (or self-referencing) children
+        # are only built once
+        if ref in seen:
+            return seen[ref]
+
+        buffer = self._buffer
+        position = self._offset_of(ref)
+        token = buffer[position]
+        token_high, token_low = token & 0xF0, token & 0x0F
+        position += 1
+
+        if token == 0x00:
+            return None
+        if token == 0x08:
+            return False
+        if token == 0x09:
+            return True
+        if token == 0x0F:
+            return b""
+
+        if token_high == 0x10:  # int
+            size = 1 << token_low
+            return int.from_bytes(buffer[position:position + size], "big", signed=token_low >= 3)
+
+        if token == 0x22:  # real
+            return struct.unpack(">f", buffer[position:position + 4])[0]
+        if token == 0x23:  # real
+            return struct.unpack(">d", buffer[position:position + 8])[0]
+
+        if token == 0x33:  # date
+            seconds = struct.unpack(">d", buffer[position:position + 8])[0]
+            return BPLIST_EPOCH + timedelta(seconds=seconds)
+
+        if token_high == 0x40:  # data
+            size, position = self._read_size(token_low, position)
+            if self._view is not None:
+                return self._view[position:position + size]
+            return bytes(buffer[position:position + size])
+
+        if token_high == 0x50:  # ascii string
+            size, position = self._read_size(token_low, position)
+            return buffer[position:position + size].decode("ascii")
+
+        if token_high == 0x60:  # unicode string
+            size, position = self._read_size(token_low, position)
+            return buffer[position:position + size * 2].decode("utf-16be")
+
+        if token_high == 0x80:  # UID
+            return pl.UID(self._read_int(position, token_low + 1))
+
+        if token_high == 0xA0:  # array
+            size, position = self._read_size(token_low, position)
+            self._enter_container(size)
+            result = []
+            seen[ref] = result
+            result.extend(self._read_object(r, seen) for r in self._read_refs(position, size))
+            self._depth -= 1
+            return result
+
+        if token_high == 0xD0:  # dict
+            size, position = self._read_size(token_low, position)
+            self._enter_container(size)
+            key_refs = self._read_refs(position, size)
+            value_refs = self._read_refs(position + size * self._ref_size, size)
+            result = {}
+            seen[ref] = result
+            try:
+                for k, v in zip(key_refs, value_refs):
+                    result[self._read_key(k, seen)] = self._read_object(v, seen)
+            except TypeError:
+                raise pl.InvalidFileException("Unhashable dictionary key")
+            self._depth -= 1
+            return result
+
+        raise pl.InvalidFileException(f"Unknown object type {token:#x}")
+
+    def _enter_container(self, size: int) -> None:
+        self._depth += 1
+        if self._depth > MAX_DEPTH:
+            raise LimitExceeded("max_depth", self._depth, MAX_DEPTH)
+        if self._budget is not None:
+            self._budget.check_list(size)
+            self._budget.check_depth(self._depth)
+
+    def _read_key(self, ref: int, seen: dict[int, t.Any]) -> t.Any:
+        key = self._key_cache.get(ref)
+        if key is None:
+            key = self._read_object(ref, seen)
+            if len(self._key_cache) >= KEY_CACHE_SIZE:
+                self._key_cache.clear()
+            self._key_cache[ref] = key
+        return key
+
+
+class LazyObjects(Mapping):
+    """
+    A read-only view of an archive's $objects array,
+    mapping each pl.UID to its entry. Entries are parsed
+    each time they are looked up and not kept afterwards.
+    """
+
+    _plist: LazyBinaryPlist
+    _refs_position: int
+    _count: int
+
+    def __init__(self, plist: LazyBinaryPlist, array_ref: int):
+        self._plist = plist
+        self._refs_position, self._count = plist.container_refs(array_ref)
+
+    def __getitem__(self, uid: pl.UID) -> t.Any:
+        if uid not in self:
+            raise KeyError(uid)
+        return self._plist.read_object(self._plist.ref_at(self._refs_position, uid.data))
+
+    def __contains__(self, uid: t.Any) -> bool:
+        return isinstance(uid, pl.UID) and 0 <= uid.data < self._count
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __iter__(self) -> t.Iterator[pl.UID]:
+        return map(pl.UID, range(self._count))
+
+    def entries(self) -> list[t.Any]:
+        """
+        Parse every entry, in order of UID
+        """
+        read_object = self._plist.read_object
+        return [read_object(ref) for ref in self._plist.read_refs(self._refs_position, self._count)]
+
+
+class BinaryPlistWriter:
+    """
+    Writes a bplist00 file one object at a time, so
+    the whole plist never has to exist in memory.
+
+    Objects are written children first, and write()
+    returns the reference to use for them. Scalars are
+    only written once. References are ref_size bytes wide,
+    which has to be chosen before anything is written.
+    """
+
+    _fp: t.IO
+    _ref_size: int
+    _ref_format: str
+    _max_objects: int
+    _offsets: array
+    _position: int
+    _memo: dict[tuple[type, t.Any], int]
+
+    def __init__(self, fp: t.IO, ref_size: int = 4):
+        if ref_size not in (1, 2, 4, 8):
+            raise ValueError("ref_size must be 1, 2, 4 or 8")
+
+        self._fp = fp
+        self._ref_size = ref_size
+        self._ref_format = INT_FORMATS[ref_size]
+        self._max_objects = 1 << (8 * ref_size)
+        self._offsets = array("Q")
+        self._position = 0
+        self._memo = {}
+
+        self._emit(BPLIST_MAGIC)
+
+    def _emit(self, data: t.Union[bytes, bytearray, memoryview]) -> None:
+        self._fp.write(data)
+        self._position += len(data)
+
+    def _start_object(self) -> int:
+        ref = len(self._offsets)
+        if ref >= self._max_objects:
+            raise OverflowError(f"Too many objects for {self._ref_size}-byte references")
+        self._offsets.append(self._position)
+        return ref
+
+    def _refs(self, refs: t.Sequence[int]) -> bytes:
+        return struct.pack(f">{len(refs)}{self._ref_format}", *refs)
+
+    @staticmethod
+    def _int_bytes(value: int) -> bytes:
+        if value < 0:
+            return b"\x13" + value.to_bytes(8, "big", signed=True)
+        if value < 1 << 8:
+            return b"\x10" + value.to_bytes(1, "big")
+        if value < 1 << 16:
+            return b"\x11" + value.to_bytes(2, "big")
+        if value < 1 << 32:
+            return b"\x12" + value.to_bytes(4, "big")
+        if value < 1 << 63:
+            return b"\x13" + value.to_bytes(8, "big")
+        if value < 1 << 64:
+            return b"\x14" + value.to_bytes(16, "big", signed=True)
+        raise OverflowError(f"{value} is too large for a bplist")
+
+    @classmethod
+    def _marker(cls, token: int, size: int) -> bytes:
+        if size < 15:
+            return bytes((token | size,))
+        return bytes((token | 0xF,)) + cls._int_bytes(size)
+
+    def write(self, value: t.Any) -> int:
+        """
+        Write a plist value (and everything it contains)
+        and return its object reference
+        """
+        value_type = type(value)
+        if value_type in MEMOIZED_TYPES:
+            memo_key = (value_type, value)
+            ref = self._memo.get(memo_key)
+            if ref is None:
+                encoded = self._scalar_bytes(value)
+                ref = self._start_object()
+                self._emit(encoded)
+                self._memo[memo_key] = ref
+            return ref
+
+        if isinstance(value, dict):
+            key_refs = [self.write(k) for k in value.keys()]
+            value_refs = [self.write(v) for v in value.values()]
+            return self.write_dict_refs(key_refs, value_refs)
+
+        if isinstance(value, (list, tuple)):
+            return self.write_array_refs([self.write(v) for v in value])
+
+        if isinstance(value, (bytes, bytearray, memoryview)):
+            # Not memoized: hashing large blobs is expensive
+            data = memoryview(value).cast("B")
+            ref = self._start_object()
+            self._emit(self._marker(0x40, len(data)))
+            self._emit(data)
+            return ref
+
+        # e.g. subclasses of str or int
+        ref = self._start_object()
+        self._emit(self._scalar_bytes(value))
+        return ref
+
+    def _scalar_bytes(self, value: t.Any) -> bytes:
+        if value is None:
+            return b"\x00"
+        if value is False:
+            return b"\x08"
+        if value is True:
+            return b"\x09"
+
+        if isinstance(value, pl.UID):
+            data = value.data
+            if data < 1 << 8:
+                return b"\x80" + data.to_bytes(1, "big")
+            if data < 1 << 16:
+                return b"\x81" + data.to_bytes(2, "big")
+            if data < 1 << 32:
+                return b"\x83" + data.to_bytes(4, "big")
+            return b"\x87" + data.to_bytes(8, "big")
+
+        if isinstance(value, int):
+            return self._int_bytes(value)
+
+        if isinstance(value, float):
+            return b"\x23" + struct.pack(">d", value)
+
+        if isinstance(value, datetime):
+            return b"\x33" + struct.pack(">d", (value - BPLIST_EPOCH).total_seconds())
+
+        if isinstance(value, str):
+            if value.isascii():
+                return self._marker(0x50, len(value)) + value.encode("ascii")
+            encoded = value.encode("utf-16be")
+            return self._marker(0x60, len(encoded) // 2) + encoded
+
+        raise TypeError(f"Unsupported type: {type(value)}")
+
+    def write_array_refs(self, refs: t.Sequence[int]) -> int:
+        """
+        Write an array of already written objects
+        """
+        ref = self._start_object()
+        self._emit(self._marker(0xA0, len(refs)) + self._refs(refs))
+        return ref
+
+    def write_dict_refs(self, key_refs: t.Sequence[int], value_refs: t.Sequence[int]) -> int:
+        """
+        Write a dictionary of already written objects
+        """
+        ref = self._start_object()
+        self._emit(self._marker(0xD0, len(key_refs)) + self._refs(key_refs) + self._refs(value_refs))
+        return ref
+
+    def finish(self, top_ref: int) -> None:
+        """
+        Write the offset table and trailer.
+        Nothing can be written afterwards.
+        """
+        offset_table_offset = self._position
+        max_offset = self._offsets[-1] if self._offsets else 0
+        offset_size = next(size for size in (1, 2, 4, 8) if max_offset < 1 << (8 * size))
+
+        offset_format = INT_FORMATS[offset_size]
+        for start in range(0, len(self._offsets), WRITE_CHUNK_SIZE):
+            chunk = self._offsets[start:start + WRITE_CHUNK_SIZE]
+            self._emit(struct.pack(f">{len(chunk)}{offset_format}", *chunk))
+        self._emit(struct.pack(
+            TRAILER_FORMAT, offset_size, self._ref_size, len(self._offsets), top_ref, offset_table_offset
+            ))
@@ -0,0 +1,232 @@
+import asyncio
+import io
+import os
+import typing as t
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+
+from .limits import Limits
+from .ns_types import NS_TYPES
+from .nscoding import NSCoding
+from .unarchiver import Unarchiver
+
+PathLike = t.Union[str, os.PathLike]
+
+# Files queued per worker, so workers never wait
+# for work but results don't pile up unread
+IN_FLIGHT_PER_WORKER = 4
+# Files read ahead when loading in-process
+PREFETCHED_FILES = 2
+
+
+@dataclass
+class LoadResult:
+    """
+    The decoded root of one archive,
+    or the error that stopped it decoding
+    """
+
+    path: PathLike
+    root: t.Any = None
+    error: t.Optional[BaseException] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+@dataclass(frozen=True)
+class _LoadOptions:
+    # (name, class) pairs: sent to workers, so it has to
+    # pickle, which mappingproxy (say) doesn't under spawn
+    class_map: tuple[tuple[str, type[NSCoding]], ...]
+    error_on_ignored_attributes: bool
+    lazy: bool
+    limits: t.Optional[Limits]
+
+
+# Set once in each worker process, so the class
+# map is sent to a worker once rather than per file
+_worker_options: t.Optional[_LoadOptions] = None
+
+
+def _init_worker(options: _LoadOptions) -> None:
+    global _worker_options
+    _worker_options = options
+
+
+def _decode(fp: t.IO, options: _LoadOptions) -> t.Any:
+    # Unarchivers add to their class map, so each gets a copy
+    unarchiver = Unarchiver(fp, class_map=dict(options.class_map),
+                            error_on_ignored_attributes=options.error_on_ignored_attributes, lazy=options.lazy,
+                            limits=options.limits)
+    return unarchiver.decode()
+
+
+def _load_file(path: PathLike) -> LoadResult:
+    try:
+        with open(path, "rb") as fp:
+            return LoadResult(path, root=_decode(fp, _worker_options))
+    except Exception as e:
+        return LoadResult(path, error=e)
+
+
+def _options(class_map: t.Optional[t.Mapping[str, type[NSCoding]]], error_on_ignored_attributes: bool,
+             lazy: bool, limits: t.Optional[Limits]) -> _LoadOptions:
+    class_map = class_map if class_map is not None else NS_TYPES
+    return _LoadOptions(tuple(class_map.items()), error_on_ignored_attributes, lazy, limits)
+
+
+class _WorkerPool:
+    """
+    A process pool whose workers are given the load options,
+    started again if one of the workers dies (e.g. is killed
+    for using too much memory). The files in flight on the
+    broken pool fail, rather than every file after them.
+    """
+
+    _workers: int
+    _options: _LoadOptions
+    _executor: ProcessPoolExecutor
+
+    def __init__(self, workers: int, options: _LoadOptions):
+        self._workers = workers
+        self._options = options
+        self._executor = self._start()
+
+    def _start(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(max_workers=self._workers, initializer=_init_worker, initargs=(self._options,))
+
+    def submit(self, path: PathLike) -> Future:
+        try:
+            return self._executor.submit(_load_file, path)
+        except BrokenProcessPool:
+            self._executor.shutdown(wait=False)
+            self._executor = self._start()
+            return self._executor.submit(_load_file, path)
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+
+
+def _read_file(path: PathLike) -> bytes:
+    with open(path, "rb") as fp:
+        return fp.read()
+
+
+def _load_in_process(paths: t.Iterable[PathLike], options: _LoadOptions) -> t.Iterator[LoadResult]:
+    # A thread reads the next files while this one decodes
+    with ThreadPoolExecutor(max_workers=1) as reader:
+        paths = iter(paths)
+        reads: list[tuple[PathLike, Future]] = []
+        for path in paths:
+            reads.append((path, reader.submit(_read_file, path)))
+            if len(reads) <= PREFETCHED_FILES:
+                continue
+
+            yield _load_read_file(*reads.pop(0), options)
+
+        for path, read in reads:
+            yield _load_read_file(path, read, options)
+
+
+def _load_read_file(path: PathLike, read: Future, options: _LoadOptions) -> LoadResult:
+    try:
+        return LoadResult(path, root=_decode(io.BytesIO(read.result()), options))
+    except Exception as e:
+        return LoadResult(path, error=e)
+
+
+def load_many(paths: t.Iterable[PathLike], class_map: t.Optional[t.Mapping[str, type[NSCoding]]] = None,
+              workers: t.Optional[int] = None, error_on_ignored_attributes: bool = True,
+              lazy: bool = False, limits: t.Optional[Limits] = None) -> t.Iterator[LoadResult]:
+    """
+    Decode many archives, one process per core (or `workers`),
+    yielding a LoadResult for each as soon as it is done:
+
+    ```
+    for result in load_many(paths, class_map={**NS_TYPES, "MyClass": MyClass}):
+        if result.ok:
+            print(result.path, result.root)
+    ```
+
+    An archive that fails to decode only fails its own result.
+    Decoded roots are pickled back from the worker processes,
+    so their classes must be importable. With workers=1,
+    archives are decoded in this process instead.
+
+    With limits, each archive is read within them (see Limits),
+    so that one oversized archive only fails its own result.
+    """
+    options = _options(class_map, error_on_ignored_attributes, lazy, limits)
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        yield from _load_in_process(paths, options)
+        return
+
+    pool = _WorkerPool(workers, options)
+    try:
+        paths = iter(paths)
+        pending: dict[Future, PathLike] = {}
+        while True:
+            for path in paths:
+                pending[pool.submit(path)] = path
+                if len(pending) >= workers * IN_FLIGHT_PER_WORKER:
+                    break
+
+            if not pending:
+                return
+
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield _result_of(future, pending.pop(future))
+    finally:
+        pool.shutdown()
+
+
+def _result_of(future: Future, path: PathLike) -> LoadResult:
+    # Errors inside _load_file are already results: this is for
+    # the rest, e.g. roots that cannot be pickled back, or
+    # BrokenProcessPool if a worker died
+    try:
+        return future.result()
+    except Exception as e:
+        return LoadResult(path, error=e)
+
+
+async def aload_many(paths: t.Iterable[PathLike], class_map: t.Optional[t.Mapping[str, type[NSCoding]]] = None,
+                     workers: t.Optional[int] = None, error_on_ignored_attributes: bool = True,
+                     lazy: bool = False, limits: t.Optional[Limits] = None) -> t.AsyncIterator[LoadResult]:
+    """
+    load_many for asyncio: archives are decoded in a process
+    pool without blocking the event loop.
+
+    ```
+    async for result in aload_many(paths, class_map):
+        ...
+    ```
+    """
+    options = _options(class_map, error_on_ignored_attributes, lazy, limits)
+    workers = workers or os.cpu_count() or 1
+    loop = asyncio.get_running_loop()
+
+    pool = _WorkerPool(workers, options)
+    try:
+        paths = iter(paths)
+        pending: dict[asyncio.Future, PathLike] = {}
+        while True:
+            for path in paths:
+                pending[asyncio.wrap_future(pool.submit(path), loop=loop)] = path
+                if len(pending) >= workers * IN_FLIGHT_PER_WORKER:
+                    break
+
+            if not pending:
+                return
+
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for future in done:
+                yield _result_of(future, pending.pop(future))
+    finally:
+        # Waiting for the workers to exit would block the event loop
+        pool.shutdown(wait=False)
@@ -0,0 +1,386 @@
+import copyreg
+import gc
+import io
+import json
+import os
+import pickle
+import plistlib as pl
+import typing as t
+from contextlib import contextmanager
+from hashlib import blake2b
+
+from .ns_keyed_archive import NSKeyedArchive
+from .ns_types import NS_TYPES
+from .nscoding import NSCoding
+from .unarchiver import Unarchiver
+
+# Bump whenever what is stored in snapshots changes,
+# so older snapshots are treated as stale
+SNAPSHOT_FORMAT = 2
+SNAPSHOT_SUFFIX = ".pickle"
+INDEX_FILE_NAME = "index.json"
+
+DEFAULT_MAX_BYTES = 1 << 30
+HASH_CHUNK_SIZE = 1 << 20
+
+# Returned by _read_snapshot, as a decoded root can be None
+_MISSING = object()
+
+
+@contextmanager
+def _gc_paused():
+    # Unpickling creates a great many objects at once, which
+    # keeps triggering the cyclic garbage collector for nothing
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def _hash_file(path: str) -> str:
+    content_hash = blake2b(digest_size=16)
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(HASH_CHUNK_SIZE), b""):
+            content_hash.update(chunk)
+    return content_hash.hexdigest()
+
+
+def _share_uids(value: t.Any, uids: list[pl.UID]) -> t.Any:
+    """
+    Replace each UID with the one instance of it in uids,
+    so pickle only stores (and creates) each UID once
+    """
+    if isinstance(value, pl.UID):
+        return uids[value.data]
+    if isinstance(value, list):
+        return [_share_uids(v, uids) for v in value]
+    if isinstance(value, dict):
+        return {k: _share_uids(v, uids) for k, v in value.items()}
+    return value
+
+
+class _GraphPickler(pickle.Pickler):
+    """
+    Pickles the NSCoding objects of a graph one at a time:
+    each object another references is pickled as its index
+    in table, and added to the table to be pickled later
+    """
+
+    table: list[NSCoding]
+
+    _indexes: dict[int, int]  # id(obj) -> index in table
+    _inline: set[int]  # ids of objects pickled as usual
+
+    def __init__(self, file: t.IO):
+        super().__init__(file, protocol=pickle.HIGHEST_PROTOCOL)
+        self.table = []
+        self._indexes = {}
+        self._inline = set()
+
+    def persistent_id(self, obj: t.Any) -> t.Optional[int]:
+        if not isinstance(obj, NSCoding) or id(obj) in self._inline:
+            return None
+        index = self._indexes.get(id(obj))
+        if index is None:
+            reduced = obj.__reduce_ex__(pickle.HIGHEST_PROTOCOL)
+            if reduced[0] is not copyreg.__newobj__ or len(reduced[1]) != 1:
+                # e.g. NSPoint, which pickles as its arguments
+                self._inline.add(id(obj))
+                return None
+            index = self._indexes[id(obj)] = len(self.table)
+            self.table.append(obj)
+        return index
+
+
+class _GraphUnpickler(pickle.Unpickler):
+    _objects: list[NSCoding]
+
+    def __init__(self, file: t.IO, objects: list[NSCoding]):
+        super().__init__(file)
+        self._objects = objects
+
+    def persistent_load(self, pid: int) -> NSCoding:
+        return self._objects[pid]
+
+
+def _dump_graph(root: t.Any) -> tuple[list[type], bytes]:
+    """
+    A decoded graph as the class of each of its objects and a
+    pickle of their states, referencing each other by index.
+    Unlike pickling the root, this doesn't recurse along
+    references, so long chains of objects can be pickled.
+    """
+    file = io.BytesIO()
+    pickler = _GraphPickler(file)
+    pickler.dump(root)
+    index = 0
+    while index < len(pickler.table):  # which grows as states are pickled
+        reduced = pickler.table[index].__reduce_ex__(pickle.HIGHEST_PROTOCOL)
+        state, list_items, dict_items = (reduced[2:] + (None, None, None))[:3]
+        pickler.dump((state, list(list_items or ()), list(dict_items or ())))
+        index += 1
+    return [type(obj) for obj in pickler.table], file.getvalue()
+
+
+def _load_graph(classes: list[type], data: bytes) -> t.Any:
+    """
+    Inverse of _dump_graph: every object is created
+    first, so states can reference any of them
+    """
+    objects = [cls.__new__(cls) for cls in classes]
+    unpickler = _GraphUnpickler(io.BytesIO(data), objects)
+    root = unpickler.load()
+    for obj in objects:
+        state, list_items, dict_items = unpickler.load()
+        # As pickle builds objects from __reduce_ex__
+        if list_items:
+            obj.extend(list_items)
+        for key, value in dict_items:
+            obj[key] = value
+        if state is None:
+            continue
+        setstate = getattr(obj, "__setstate__", None)
+        if setstate is not None:
+            setstate(state)
+            continue
+        slot_state = None
+        if isinstance(state, tuple) and len(state) == 2:
+            state, slot_state = state
+        if state:
+            obj.__dict__.update(state)
+        if slot_state:
+            for name, value in slot_state.items():
+                setattr(obj, name, value)
+    return root
+
+
+class _FlatGraph:
+    """
+    A decoded graph, to be pickled with _dump_graph
+    """
+
+    __slots__ = ("root",)
+
+    def __init__(self, root: t.Any):
+        self.root = root
+
+    def __reduce__(self):
+        return _load_graph, _dump_graph(self.root)
+
+
+def _decode_options_digest(class_map: t.Mapping[str, type], error_on_ignored_attributes: bool) -> str:
+    # Decoded graphs depend on which classes were used, and
+    # a lenient decode mustn't be served to a strict caller
+    names = sorted((name, cls.__module__, cls.__qualname__) for name, cls in class_map.items())
+    return blake2b(repr((names, error_on_ignored_attributes)).encode(), digest_size=8).hexdigest()
+
+
+class ArchiveCache:
+    """
+    An opt-in on-disk cache of archives, for archives
+    that are opened again and again:
+
+    ```
+    cache = ArchiveCache("~/.cache/mentalics")
+
+    archive = cache.load_archive("my.plist")  # the parsed $objects
+    root = cache.decode("my.plist", class_map)  # the decoded graph
+    ```
+
+    Snapshots are pickles, keyed by the file's content hash.
+    The hash is only recomputed when the file's path, size
+    or mtime changes. When a snapshot is missing, stale or
+    unreadable, the archive is loaded normally (and a new
+    snapshot is written). Snapshots are evicted least
+    recently used first once they take up more than max_bytes.
+
+    Decoded graphs can only be cached if they can be
+    pickled, so their classes must be importable. Graphs
+    too deep for pickle (e.g. long linked lists) are
+    pickled an object at a time instead.
+    Only use directories that you trust: loading a
+    snapshot can run arbitrary code, as with any pickle.
+    """
+
+    directory: str
+    max_bytes: int
+
+    # real path -> {"size", "mtime_ns", "hash"}
+    _index: dict[str, dict[str, t.Any]]
+
+    def __init__(self, directory: t.Union[str, os.PathLike], max_bytes: int = DEFAULT_MAX_BYTES):
+        self.directory = os.path.expanduser(os.fspath(directory))
+        self.max_bytes = max_bytes
+        os.makedirs(self.directory, exist_ok=True)
+        self._index = self._read_index()
+        self._evict()  # in case max_bytes is smaller than before
+
+    def load_archive(self, path: t.Union[str, os.PathLike]) -> NSKeyedArchive:
+        """
+        The archive at path, as if loaded
+        with NSKeyedArchive(file)
+        """
+        return self._load_archive(path, self._content_hash(path))
+
+    def decode(self, path: t.Union[str, os.PathLike], class_map: t.Optional[t.Mapping[str, type[NSCoding]]] = None,
+               error_on_ignored_attributes: bool = True) -> t.Any:
+        """
+        The root object of the archive at path, as
+        decoded by an Unarchiver with class_map
+        """
+        class_map = class_map if class_map is not None else NS_TYPES
+        content_hash = self._content_hash(path)
+        snapshot_path = self._snapshot_path(
+            content_hash, "graph-" + _decode_options_digest(class_map, error_on_ignored_attributes))
+
+        root = self._read_snapshot(snapshot_path)
+        if root is not _MISSING:
+            return root
+
+        unarchiver = Unarchiver(self._load_archive(path, content_hash), class_map=dict(class_map),
+                                error_on_ignored_attributes=error_on_ignored_attributes)
+        root = unarchiver.decode()
+        self._write_snapshot(snapshot_path, root)
+        return root
+
+    def clear(self) -> None:
+        for file_name in os.listdir(self.directory):
+            if file_name.endswith(SNAPSHOT_SUFFIX):
+                os.remove(os.path.join(self.directory, file_name))
+        self._index = {}
+        self._write_index()
+
+    def _load_archive(self, path: t.Union[str, os.PathLike], content_hash: str) -> NSKeyedArchive:
+        snapshot_path = self._snapshot_path(content_hash, "objects")
+
+        snapshot = self._read_snapshot(snapshot_path)
+        if snapshot is not _MISSING:
+            version, top, objects = snapshot
+            return NSKeyedArchive.from_objects(version, top, objects)
+
+        with open(path, "rb") as file:
+            archive = NSKeyedArchive(file)
+
+        uids = list(archive.objects.keys())
+        objects = {uid: _share_uids(entry, uids) for uid, entry in archive.objects.items()}
+        self._write_snapshot(snapshot_path, (archive.version, _share_uids(archive.top, uids), objects))
+        return archive
+
+    def _content_hash(self, path: t.Union[str, os.PathLike]) -> str:
+        real_path = os.path.realpath(path)
+        stat = os.stat(real_path)
+
+        entry = self._index.get(real_path)
+        if entry is not None and entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns:
+            return entry["hash"]
+
+        # New or changed (or only touched): snapshots
+        # of the same contents can still be used
+        content_hash = _hash_file(real_path)
+        self._index[real_path] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "hash": content_hash}
+        self._write_index()
+        return content_hash
+
+    def _snapshot_path(self, content_hash: str, kind: str) -> str:
+        return os.path.join(self.directory, f"{content_hash}.{kind}{SNAPSHOT_SUFFIX}")
+
+    @staticmethod
+    def _content_hash_of(snapshot_path: str) -> str:
+        return os.path.basename(snapshot_path).split(".", 1)[0]
+
+    def _read_snapshot(self, snapshot_path: str) -> t.Any:
+        try:
+            with open(snapshot_path, "rb") as file, _gc_paused():
+                snapshot_format, payload = pickle.load(file)
+        except FileNotFoundError:
+            return _MISSING
+        except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError,
+                IndexError, TypeError, ValueError):
+            # Unreadable, e.g. a class has moved
+            self._remove(snapshot_path)
+            return _MISSING
+
+        if snapshot_format != SNAPSHOT_FORMAT:
+            self._remove(snapshot_path)
+            return _MISSING
+
+        # Its mtime is when it was last used
+        os.utime(snapshot_path)
+        return payload
+
+    def _write_snapshot(self, snapshot_path: str, payload: t.Any) -> bool:
+        """
+        Write a snapshot of payload, returning
+        whether it could be pickled
+        """
+        try:
+            try:
+                data = pickle.dumps((SNAPSHOT_FORMAT, payload), protocol=pickle.HIGHEST_PROTOCOL)
+            except RecursionError:
+                # Long chains of objects: pickled flat instead,
+                # which is slower to load but doesn't recurse
+                data = pickle.dumps((SNAPSHOT_FORMAT, _FlatGraph(payload)), protocol=pickle.HIGHEST_PROTOCOL)
+        except (pickle.PicklingError, AttributeError, TypeError, RecursionError):
+            # e.g. classes defined in a function, memoryviews, or
+            # lists nested thousands deep: this archive is not cached
+            return False
+
+        # Written whole or not at all, in case
+        # another process is reading it
+        temporary_path = f"{snapshot_path}.{os.getpid()}.tmp"
+        with open(temporary_path, "wb") as file:
+            file.write(data)
+        os.replace(temporary_path, snapshot_path)
+
+        self._evict()
+        return True
+
+    def _evict(self) -> None:
+        snapshots = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(SNAPSHOT_SUFFIX):
+                stat = entry.stat()
+                snapshots.append((stat.st_mtime_ns, stat.st_size, entry.path))
+
+        total_bytes = sum(size for _, size, _ in snapshots)
+        kept_hashes = set()
+        for _, size, snapshot_path in sorted(snapshots):  # least recently used first
+            if total_bytes <= self.max_bytes:
+                kept_hashes.add(self._content_hash_of(snapshot_path))
+                continue
+            self._remove(snapshot_path)
+            total_bytes -= size
+
+        self._prune_index(kept_hashes)
+
+    def _prune_index(self, content_hashes: set[str]) -> None:
+        # Files are only worth indexing while there is
+        # a snapshot of their contents to find
+        index = {path: entry for path, entry in self._index.items() if entry["hash"] in content_hashes}
+        if len(index) != len(self._index):
+            self._index = index
+            self._write_index()
+
+    @staticmethod
+    def _remove(snapshot_path: str) -> None:
+        try:
+            os.remove(snapshot_path)
+        except FileNotFoundError:
+            pass
+
+    def _read_index(self) -> dict[str, dict[str, t.Any]]:
+        try:
+            with open(os.path.join(self.directory, INDEX_FILE_NAME)) as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_index(self) -> None:
+        index_path = os.path.join(self.directory, INDEX_FILE_NAME)
+        temporary_path = f"{index_path}.{os.getpid()}.tmp"
+        with open(temporary_path, "w") as file:
+            json.dump(self._index, file)
+        os.replace(temporary_path, index_path)
@@ -0,0 +1,221 @@
+import keyword
+import re
+import typing as t
+
+from .explorer import Explorer, InferredClass
+from .ns_types import NS_TYPES
+from .nscoding import NSCoding
+
+UNIVERSAL_CLASS_NAME = "$Object"
+
+# Instances of NSValue are decoded as the class
+# of their NS.special (e.g. NSPoint), never as NSValue
+SKIPPED_CLASS_NAMES = frozenset(("NSValue",))
+
+_CAMEL_BOUNDARY = re.compile(r"(?<=[a-z0-9])(?=[A-Z])")
+_NOT_IDENTIFIER = re.compile(r"\W")
+
+
+def _identifier(name: str, snake_case: bool) -> str:
+    if snake_case:
+        name = _CAMEL_BOUNDARY.sub("_", name).lower()
+    name = _NOT_IDENTIFIER.sub("_", name)
+    if not name or name[0].isdigit():
+        name = "_" + name
+    if keyword.iskeyword(name):
+        name += "_"
+    return name
+
+
+class _ClassSource:
+    """
+    What is needed to write out one generated class
+    """
+
+    name: str  # as archived
+    identifier: str
+    base: str  # identifier of the base class
+    fields: list[tuple[str, str, bool]]  # (key, attribute, optional)
+
+    def __init__(self, name: str, identifier: str, base: str):
+        self.name = name
+        self.identifier = identifier
+        self.base = base
+        self.fields = []
+
+    def source(self) -> str:
+        attributes = ", ".join(f'"{attribute}"' for _, attribute, _ in self.fields)
+        lines = [
+            f"class {self.identifier}({self.base}):",
+            f"    __slots__ = ({attributes}{',' if len(self.fields) == 1 else ''})",
+            "",
+            "    def __init_from_archive__(self, decoder):",
+            ]
+        if self.base != "NSCoding":
+            lines.append("        super().__init_from_archive__(decoder)")
+        if self.fields:
+            lines.append("        decode = decoder.decode")
+        for key, attribute, optional in self.fields:
+            if optional:
+                lines.append(f"        self.{attribute} = decode({key!r}) if decoder.contains_value({key!r}) else None")
+            else:
+                lines.append(f"        self.{attribute} = decode({key!r})")
+        lines += [
+            "        return self",
+            "",
+            "    def encode_archive(self, coder):",
+            ]
+        if self.base != "NSCoding":
+            lines.append("        super().encode_archive(coder)")
+        if self.fields:
+            lines.append("        encode = coder.encode")
+        for key, attribute, optional in self.fields:
+            if optional:
+                lines.append(f"        if self.{attribute} is not None:")
+                lines.append(f"            encode(self.{attribute}, for_key={key!r})")
+            else:
+                lines.append(f"        encode(self.{attribute}, for_key={key!r})")
+        if not self.fields and self.base == "NSCoding":
+            lines.append("        return")
+
+        return "\n".join(lines)
+
+
+class _Generator:
+    """
+    Walks the Explorer's inferred class tree top down,
+    so every class is generated after its superclass
+    """
+
+    _known: t.Mapping[str, type]
+    _classes: list[_ClassSource]
+    _used_identifiers: set[str]
+
+    def __init__(self, known: t.Mapping[str, type]):
+        self._known = known
+        self._classes = []
+        self._used_identifiers = {"NSCoding"} | {cls.__name__ for cls in known.values()}
+
+    def generate(self, explorer: Explorer) -> list[_ClassSource]:
+        universal_class = explorer._classes[UNIVERSAL_CLASS_NAME]
+
+        # Attributes inferred for $Object belong to
+        # the topmost generated classes instead
+        stack = [(subclass, "NSCoding", NSCoding, universal_class.attrs, frozenset())
+                 for subclass in reversed(universal_class.subclasses)]
+        while stack:
+            cls, base, known_base, inherited_attrs, used_attributes = stack.pop()
+
+            if cls.name in self._known or cls.name in SKIPPED_CLASS_NAMES:
+                # Use it as is: it decodes its own attributes
+                if cls.name in self._known:
+                    known_base = self._known[cls.name]
+                    base = known_base.__name__
+                stack += [(subclass, base, known_base, frozenset(), used_attributes)
+                          for subclass in reversed(cls.subclasses)]
+                continue
+
+            class_source = _ClassSource(cls.name, self._unique_identifier(cls.name), base)
+
+            attributes = set(used_attributes)
+            for key in sorted(set(cls.attrs) | set(inherited_attrs)):
+                attribute = _identifier(key, snake_case=True)
+                # Mustn't shadow a slot or a method of a base class
+                while attribute in attributes or hasattr(known_base, attribute):
+                    attribute += "_"
+                attributes.add(attribute)
+                class_source.fields.append((key, attribute, self._is_optional(cls, key)))
+
+            self._classes.append(class_source)
+            stack += [(subclass, class_source.identifier, known_base, frozenset(), frozenset(attributes))
+                      for subclass in reversed(cls.subclasses)]
+
+        return self._classes
+
+    def _unique_identifier(self, class_name: str) -> str:
+        identifier = _identifier(class_name, snake_case=False)
+        while identifier in self._used_identifiers:
+            identifier += "_"
+        self._used_identifiers.add(identifier)
+        return identifier
+
+    @staticmethod
+    def _is_optional(cls: InferredClass, key: str) -> bool:
+        """
+        A key is optional if any instance of the
+        class or its subclasses was archived without it
+        """
+        stack = [cls]
+        while stack:
+            cls = stack.pop()
+            stack += cls.subclasses
+            if not cls.instance_count:
+                continue
+
+            # Without statistics, keys are assumed to be required
+            stats = cls.field_stats.get(key)
+            if stats is None:
+                if cls.field_stats:  # never seen on this class
+                    return True
+            elif stats.count < cls.instance_count:
+                return True
+
+        return False
+
+
+def generate_source(explorer: Explorer, known: t.Optional[t.Mapping[str, type]] = None) -> str:
+    """
+    Write a Python module with an NSCoding class for each
+    class the explorer inferred, decoding a fixed list of keys.
+    Classes in known (NS_TYPES by default) are used, not generated.
+
+    The module's CLASSES maps archived class names to
+    the generated classes, for Unarchiver.set_classes.
+    """
+    known = known if known is not None else NS_TYPES
+    generator = _Generator(known)
+    classes = generator.generate(explorer)
+
+    imports = ["from mentalics import NSCoding"]
+    bases = {class_source.base for class_source in classes}
+    for cls in known.values():
+        if cls.__name__ in bases:
+            imports.append(f"from {cls.__module__} import {cls.__qualname__}")
+
+    class_map = ["CLASSES = {"]
+    class_map += [f"    {class_source.name!r}: {class_source.identifier}," for class_source in classes]
+    class_map.append("    }")
+
+    parts = ["\n".join(imports)]
+    parts += [class_source.source() for class_source in classes]
+    parts.append("\n".join(class_map))
+    return "\n\n\n".join(parts) + "\n"
+
+
+def generate_classes(explorer: Explorer, known: t.Optional[t.Mapping[str, type]] = None
+                     ) -> dict[str, type[NSCoding]]:
+    """
+    Generate NSCoding classes for the classes the explorer
+    inferred (see generate_source), and return them
+    by archived class name:
+
+    ```
+    unarchiver.set_classes(generate_classes(explorer))
+    ```
+
+    The classes only exist in this process: pickle can't find
+    them, so instances of them can't be sent back from
+    load_many's workers or kept in ArchiveCache snapshots.
+    For those, write generate_source's output to a module
+    and import the classes from it.
+    """
+    known = known if known is not None else NS_TYPES
+    generator = _Generator(known)
+    classes = generator.generate(explorer)
+
+    namespace: dict[str, t.Any] = {"NSCoding": NSCoding, "__name__": __name__}
+    namespace.update({cls.__name__: cls for cls in known.values()})
+    exec(compile("\n\n".join(class_source.source() for class_source in classes),
+                 "<mentalics.codegen>", "exec"), namespace)
+
+    return {class_source.name: namespace[class_source.identifier] for class_source in classes}
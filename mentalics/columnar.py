@@ -0,0 +1,410 @@
+import json
+import os
+import plistlib as pl
+import sys
+import typing as t
+from array import array
+from base64 import b64encode
+from datetime import datetime
+
+from .explorer import Explorer, FieldStats, explore_many
+from .ns_keyed_archive import NSKeyedArchive
+
+try:
+    import numpy as np
+except ImportError:  # optional
+    np = None
+
+FORMAT_VERSION = 1
+MANIFEST_NAME = "manifest.json"
+
+# Rows are buffered per column, and appended to
+# the column's files every so many rows
+DEFAULT_CHUNK_ROWS = 1 << 16
+
+# Column types, and the typecodes of their values
+INT = "int"
+FLOAT = "float"
+BOOL = "bool"
+UID = "uid"  # references to instances; 0 is $null
+STR = "str"  # strings, and references to strings
+UID_LIST = "uid_list"  # lists of references
+JSON = "json"  # anything else, as JSON text
+
+_UID_TYPECODE = "I" if array("I").itemsize >= 4 else "L"
+_TYPECODES = {INT: "q", FLOAT: "d", BOOL: "B", UID: _UID_TYPECODE, UID_LIST: _UID_TYPECODE}
+# Of the offsets of each row into STR, UID_LIST and JSON values
+_OFFSET_TYPECODE = "Q"
+_VALIDITY_TYPECODE = "B"
+
+# Columns of every table, for joining references
+ARCHIVE_COLUMN = "$archive"  # index into the manifest's archives
+UID_COLUMN = "$uid"
+
+# What the Explorer calls references' targets
+# that are plist values rather than instances
+_INLINE_TARGETS = frozenset(("int", "float", "bool", "bytes", "date", "list", "dict", "str"))
+
+
+def _column_type(stats: FieldStats) -> str:
+    """
+    The narrowest column type for the values the
+    Explorer saw for an attribute
+    """
+    value_types = set(stats.value_types) - {"null"}
+    targets = set(stats.target_classes)
+    if not value_types:
+        return UID  # only ever $null
+    if value_types == {"bool"}:
+        return BOOL
+    if value_types == {"int"}:
+        return INT
+    if value_types <= {"int", "float"}:
+        return FLOAT
+    if value_types == {"str"} or (value_types <= {"str", "uid"} and targets == {"str"}):
+        return STR
+    if value_types == {"uid"} and "str" not in targets and targets.isdisjoint(_INLINE_TARGETS):
+        return UID
+    if value_types == {"list"} and set(stats.element_types) <= {"uid", "null"}:
+        return UID_LIST
+    return JSON
+
+
+def _json_default(value: t.Any) -> t.Any:
+    if isinstance(value, pl.UID):
+        return {"CF$UID": value.data}
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return b64encode(value).decode()
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Can't export {type(value).__name__}")
+
+
+class _Column:
+    """
+    The buffered rows of one column, and its files
+    """
+
+    type: str
+    nullable: bool
+    path: str  # of its files, without their extensions
+
+    _values: array
+    _offsets: t.Optional[array]  # for variable-length values
+    _validity: t.Optional[array]
+    _value_count: int
+
+    def __init__(self, column_type: str, nullable: bool, path: str):
+        self.type = column_type
+        self.nullable = nullable
+        self.path = path
+        self._value_count = 0
+        self._reset()
+        # A new export replaces any old files
+        for extension in (".values", ".offsets", ".validity"):
+            if os.path.exists(path + extension):
+                os.remove(path + extension)
+
+    def _reset(self) -> None:
+        typecode = _TYPECODES.get(self.type, "B")  # text is stored as UTF-8
+        self._values = array(typecode)
+        self._offsets = array(_OFFSET_TYPECODE) if self.type in (STR, UID_LIST, JSON) else None
+        self._validity = array(_VALIDITY_TYPECODE) if self.nullable else None
+
+    def append(self, value: t.Any, objects: t.Mapping[pl.UID, t.Any]) -> None:
+        missing = value is None or (isinstance(value, pl.UID) and not value.data)
+        if missing and not self.nullable:
+            raise ValueError(f"{self.path}: no value, but the column isn't nullable")
+        if self._validity is not None:
+            self._validity.append(not missing)
+
+        if self._offsets is not None:
+            if not missing:
+                self._append_variable(value, objects)
+            self._offsets.append(self._value_count + len(self._values))
+        elif missing:
+            self._values.append(0)
+        elif self.type == UID:
+            if not isinstance(value, pl.UID):
+                raise ValueError(f"{self.path}: {value!r} is not a reference")
+            self._values.append(value.data)
+        else:
+            try:
+                self._values.append(value)
+            except (TypeError, OverflowError):
+                raise ValueError(f"{self.path}: {value!r} doesn't fit a {self.type} column") from None
+
+    def _append_variable(self, value: t.Any, objects: t.Mapping[pl.UID, t.Any]) -> None:
+        if self.type == UID_LIST:
+            if not isinstance(value, list) or not all(isinstance(e, pl.UID) for e in value):
+                raise ValueError(f"{self.path}: {value!r} is not a list of references")
+            self._values.extend(e.data for e in value)
+            return
+
+        if self.type == STR:
+            if isinstance(value, pl.UID):
+                value = objects[value]
+            if not isinstance(value, str):
+                raise ValueError(f"{self.path}: {value!r} is not a string")
+            text = value
+        else:
+            text = json.dumps(value, default=_json_default)
+        self._values.frombytes(text.encode())
+
+    def flush(self) -> None:
+        for extension, buffer in ((".values", self._values), (".offsets", self._offsets),
+                                  (".validity", self._validity)):
+            if buffer:
+                with open(self.path + extension, "ab") as file:
+                    buffer.tofile(file)
+        if self._offsets is not None:
+            self._value_count += len(self._values)
+        self._reset()
+
+    def manifest(self) -> dict[str, t.Any]:
+        return {
+            "type": self.type,
+            "typecode": self._values.typecode,
+            "nullable": self.nullable,
+            "path": os.path.basename(os.path.dirname(self.path)) + "/" + os.path.basename(self.path),
+            }
+
+
+class _Table:
+    class_name: str
+    columns: dict[str, _Column]  # by attribute, including $archive and $uid
+    row_count: int
+
+    def __init__(self, class_name: str, columns: dict[str, _Column]):
+        self.class_name = class_name
+        self.columns = columns
+        self.row_count = 0
+
+
+class ColumnarWriter:
+    """
+    Exports the instances in archives as one table per
+    class, with a column per archived attribute, without
+    decoding anything:
+
+    ```
+    explorer = explore_many(paths)
+    with ColumnarWriter("out/", explorer) as writer:
+        for path in paths:
+            with open(path, "rb") as file:
+                writer.add_archive(NSKeyedArchive(file), name=path)
+
+    values = read_table("out/", "MyClass")["value"].values
+    ```
+
+    Column types come from the Explorer's statistics about
+    each attribute, which must cover every archive added.
+    Numbers and booleans are stored as arrays of machine
+    types, references as UIDs (0 for $null), and strings
+    and lists of references with offsets into their values.
+    Each table also has $archive and $uid columns, to
+    look up the rows that references point to.
+
+    Rows are written as they are added, a chunk at a time,
+    and the manifest describing the tables once closed.
+    """
+
+    directory: str
+    archives: list[str]  # names of the archives added, by index
+
+    _explorer: Explorer
+    _class_names: t.Optional[set[str]]
+    _chunk_rows: int
+    _tables: dict[str, _Table]
+
+    def __init__(self, directory: t.Union[str, os.PathLike], explorer: Explorer,
+                 class_names: t.Optional[t.Iterable[str]] = None, chunk_rows: int = DEFAULT_CHUNK_ROWS):
+        if not explorer.summary().field_stats:
+            raise ValueError("The explorer must collect field stats to infer column types")
+
+        self.directory = os.fspath(directory)
+        self.archives = []
+        self._explorer = explorer
+        self._class_names = set(class_names) if class_names is not None else None
+        self._chunk_rows = chunk_rows
+        self._tables = {}
+        os.makedirs(self.directory, exist_ok=True)
+
+    def __enter__(self) -> "ColumnarWriter":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def add_archive(self, archive: NSKeyedArchive, name: t.Optional[str] = None) -> None:
+        archive_index = len(self.archives)
+        self.archives.append(name if name is not None else str(archive_index))
+        objects = archive.objects
+
+        for uid, class_name, fields in archive.iter_instances(self._class_names):
+            table = self._tables.get(class_name)
+            if table is None:
+                table = self._tables[class_name] = self._new_table(class_name)
+
+            columns = table.columns
+            if not fields.keys() <= columns.keys():
+                raise ValueError(f"{class_name} has attributes the explorer didn't find: "
+                                 f"{sorted(fields.keys() - columns.keys())}")
+
+            columns[ARCHIVE_COLUMN].append(archive_index, objects)
+            columns[UID_COLUMN].append(uid.data, objects)
+            for attr, column in columns.items():
+                if attr not in (ARCHIVE_COLUMN, UID_COLUMN):
+                    column.append(fields.get(attr), objects)
+
+            table.row_count += 1
+            if table.row_count % self._chunk_rows == 0:
+                for column in columns.values():
+                    column.flush()
+
+    def _new_table(self, class_name: str) -> _Table:
+        summary = self._explorer.summary()
+        # Special NSValues (e.g. NSPoint) are
+        # explored together, as NSValue
+        stats_name = class_name if class_name in summary.final_attrs else "NSValue"
+        if stats_name not in summary.final_attrs:
+            raise ValueError(f"The explorer didn't find {class_name}")
+
+        instance_count = summary.instance_counts.get(stats_name, 0)
+        field_stats = summary.field_stats.get(stats_name, {})
+        directory = os.path.join(self.directory, str(len(self._tables)))
+        os.makedirs(directory, exist_ok=True)
+
+        columns = {
+            ARCHIVE_COLUMN: _Column(INT, False, os.path.join(directory, "0")),
+            UID_COLUMN: _Column(INT, False, os.path.join(directory, "1")),
+            }
+        # Field stats cover every attribute seen, where final_attrs
+        # may not (e.g. NSValues of different types)
+        for attr in sorted(summary.final_attrs[stats_name] | field_stats.keys()):
+            stats = field_stats.get(attr, FieldStats())
+            nullable = stats.null_count > 0 or stats.count < instance_count
+            columns[attr] = _Column(_column_type(stats), nullable, os.path.join(directory, str(len(columns))))
+        return _Table(class_name, columns)
+
+    def close(self) -> None:
+        """
+        Write out the remaining rows and the manifest
+        """
+        for table in self._tables.values():
+            for column in table.columns.values():
+                column.flush()
+
+        manifest = {
+            "format": FORMAT_VERSION,
+            "byteorder": sys.byteorder,
+            "archives": self.archives,
+            "tables": {
+                table.class_name: {
+                    "rows": table.row_count,
+                    "columns": {attr: column.manifest() for attr, column in table.columns.items()},
+                    }
+                for table in self._tables.values()
+                },
+            }
+        temporary_path = os.path.join(self.directory, MANIFEST_NAME + ".tmp")
+        with open(temporary_path, "w") as file:
+            json.dump(manifest, file, indent=1)
+        os.replace(temporary_path, os.path.join(self.directory, MANIFEST_NAME))
+
+
+def export_columns(paths: t.Iterable[t.Union[str, os.PathLike]], directory: t.Union[str, os.PathLike],
+                   explorer: t.Optional[Explorer] = None, class_names: t.Optional[t.Iterable[str]] = None,
+                   lazy: bool = True) -> None:
+    """
+    Export the instances in the archives at paths with a
+    ColumnarWriter, exploring them first if no explorer is given
+    """
+    paths = list(paths)
+    if explorer is None:
+        explorer = explore_many(paths)
+
+    with ColumnarWriter(directory, explorer, class_names) as writer:
+        for path in paths:
+            with open(path, "rb") as file:
+                writer.add_archive(NSKeyedArchive(file, lazy=lazy), name=os.fspath(path))
+
+
+class Column(t.NamedTuple):
+    type: str
+    # An array (a NumPy array if asked for) for fixed-size
+    # types, a list of values (or arrays of UIDs) otherwise
+    values: t.Any
+    # 1 where there is a value, if the column has nulls
+    validity: t.Optional[t.Any]
+
+
+def read_manifest(directory: t.Union[str, os.PathLike]) -> dict[str, t.Any]:
+    with open(os.path.join(directory, MANIFEST_NAME)) as file:
+        manifest = json.load(file)
+    if manifest.get("format") != FORMAT_VERSION:
+        raise ValueError(f"Unknown columnar format {manifest.get('format')}")
+    return manifest
+
+
+def read_table(directory: t.Union[str, os.PathLike], class_name: str,
+               use_numpy: bool = False) -> dict[str, Column]:
+    """
+    The columns of the table of class_name in an export,
+    as arrays, or NumPy arrays mapped from the files
+    (which needs NumPy to be installed)
+    """
+    if use_numpy and np is None:
+        raise ImportError("use_numpy=True needs NumPy to be installed")
+
+    directory = os.fspath(directory)
+    manifest = read_manifest(directory)
+    if class_name not in manifest["tables"]:
+        raise KeyError(class_name)
+    table = manifest["tables"][class_name]
+    swap = manifest["byteorder"] != sys.byteorder
+
+    reader = _read_numpy if use_numpy else _read_array
+    columns = {}
+    for attr, column in table["columns"].items():
+        path = os.path.join(directory, column["path"])
+        values = reader(path + ".values", column["typecode"], swap)
+        validity = reader(path + ".validity", _VALIDITY_TYPECODE, False) if column["nullable"] else None
+
+        if column["type"] in (STR, UID_LIST, JSON):
+            offsets = _read_array(path + ".offsets", _OFFSET_TYPECODE, swap)
+            values = _split(values, offsets, column["type"])
+        columns[attr] = Column(column["type"], values, validity)
+    return columns
+
+
+def _read_array(path: str, typecode: str, swap: bool) -> array:
+    values = array(typecode)
+    if os.path.exists(path):
+        with open(path, "rb") as file:
+            values.frombytes(file.read())
+    if swap:
+        values.byteswap()
+    return values
+
+
+def _read_numpy(path: str, typecode: str, swap: bool) -> t.Any:
+    dtype = np.dtype(typecode)
+    if swap:
+        dtype = dtype.newbyteorder()
+    if not os.path.exists(path) or not os.path.getsize(path):
+        return np.empty(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode="r")
+
+
+def _split(values: t.Any, offsets: array, column_type: str) -> list:
+    rows = []
+    start = 0
+    for end in offsets:
+        if column_type == UID_LIST:
+            rows.append(values[start:end])
+        else:
+            text = bytes(values[start:end]).decode()
+            rows.append(text if column_type == STR else json.loads(text) if text else None)
+        start = end
+    return rows
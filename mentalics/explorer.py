@@ -1,11 +1,116 @@
+import os
 import typing as t
 import plistlib as pl
+from bisect import insort
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
 from copy import copy
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+from datetime import datetime
+from functools import reduce
+from hashlib import blake2b
 from queue import Queue
 
 from .ns_keyed_archive import NSKeyedArchive
 
+NULL_UID = pl.UID(0)
+
+# Bounds on the memory used by each FieldStats
+MAX_SAMPLES = 8
+MAX_SAMPLE_LENGTH = 80
+MAX_TARGET_CLASSES = 32
+DISTINCT_SKETCH_SIZE = 64  # more is more accurate
+LIST_ELEMENTS_SAMPLED = 16
+
+OTHER_TARGETS = "<other>"
+
+
+def _value_type(value: t.Any) -> str:
+    if isinstance(value, pl.UID):
+        return "null" if value == NULL_UID else "uid"
+    if isinstance(value, bool):
+        return "bool"
+    if isinstance(value, datetime):
+        return "date"
+    return type(value).__name__
+
+
+def _stable_hash(value: t.Any) -> int:
+    # hash() of strings differs between processes,
+    # and sketches are merged across processes
+    return int.from_bytes(blake2b(repr(value).encode(), digest_size=8).digest(), "big")
+
+
+@dataclass
+class FieldStats:
+    """
+    Statistics about the values of one attribute of one
+    class, in bounded memory: samples and referenced classes
+    are capped, and distinct values are estimated with
+    a k-minimum-values sketch.
+    """
+
+    count: int = 0
+    null_count: int = 0  # $null references
+    value_types: Counter = field(default_factory=Counter)
+    element_types: Counter = field(default_factory=Counter)  # of the first elements of lists
+    target_classes: Counter = field(default_factory=Counter)  # of references
+    samples: list = field(default_factory=list)
+    distinct_sketch: list[int] = field(default_factory=list)  # smallest hashes seen, sorted
+
+    @property
+    def null_rate(self) -> float:
+        return self.null_count / self.count if self.count else 0.0
+
+    @property
+    def cardinality(self) -> int:
+        """
+        Estimated number of distinct values
+        """
+        if len(self.distinct_sketch) < DISTINCT_SKETCH_SIZE:
+            return len(self.distinct_sketch)  # exact
+        return int((DISTINCT_SKETCH_SIZE - 1) * (1 << 64) / (self.distinct_sketch[-1] + 1))
+
+    def add_sample(self, value: t.Any) -> None:
+        if isinstance(value, (str, bytes)):
+            value = value[:MAX_SAMPLE_LENGTH]
+        elif not isinstance(value, (int, float, datetime)):
+            return
+        if len(self.samples) < MAX_SAMPLES and value not in self.samples:
+            self.samples.append(value)
+
+    def add_distinct(self, value: t.Any) -> None:
+        value_hash = _stable_hash(value)
+        sketch = self.distinct_sketch
+        if len(sketch) < DISTINCT_SKETCH_SIZE or value_hash < sketch[-1]:
+            if value_hash not in sketch:
+                insort(sketch, value_hash)
+                if len(sketch) > DISTINCT_SKETCH_SIZE:
+                    sketch.pop()
+
+    def add_target(self, class_name: str) -> None:
+        if class_name in self.target_classes or len(self.target_classes) < MAX_TARGET_CLASSES:
+            self.target_classes[class_name] += 1
+        else:
+            self.target_classes[OTHER_TARGETS] += 1
+
+    def merge(self, other: "FieldStats") -> "FieldStats":
+        merged = FieldStats(
+            self.count + other.count,
+            self.null_count + other.null_count,
+            self.value_types + other.value_types,
+            self.element_types + other.element_types,
+            )
+        for class_name, count in (self.target_classes + other.target_classes).most_common():
+            if len(merged.target_classes) < MAX_TARGET_CLASSES:
+                merged.target_classes[class_name] = count
+            else:
+                merged.target_classes[OTHER_TARGETS] += count
+        for sample in self.samples + other.samples:
+            merged.add_sample(sample)
+        merged.distinct_sketch = sorted(set(self.distinct_sketch + other.distinct_sketch))[:DISTINCT_SKETCH_SIZE]
+        return merged
+
 
 class InferredClass:
     name: str
@@ -16,23 +121,72 @@ class InferredClass:
     attrs: t.Optional[set[str]]
     final_attrs: t.Optional[set[str]]
 
+    instance_count: int
+    field_stats: dict[str, FieldStats]
+
     def __init__(self, name: str, superclass: t.Optional["InferredClass"], final_attrs: t.Optional[set[str]] = None):
         self.name = name
         self.superclass = superclass
         self.subclasses = []
         self.attrs = None
         self.final_attrs = final_attrs
+        self.instance_count = 0
+        self.field_stats = {}
 
     def __hash__(self):
         return hash(self.name)
 
     def __eq__(self, other):
-        return self.name == other.class_name
+        return isinstance(other, InferredClass) and self.name == other.name
 
     def __repr__(self):
         return f"<InferredClass {self.name}>"
 
 
+@dataclass
+class ExplorerSummary:
+    """
+    What the Explorer found out about the classes in
+    one or more archives. Small, picklable, and can be
+    merged with the summaries of other archives.
+    """
+
+    # class name -> names of its superclasses, top down
+    hierarchy: dict[str, tuple[str, ...]] = field(default_factory=dict)
+    # class name -> attributes archived by instances of it
+    final_attrs: dict[str, set[str]] = field(default_factory=dict)
+    instance_counts: dict[str, int] = field(default_factory=dict)
+    # class name -> attribute -> statistics about its values
+    field_stats: dict[str, dict[str, FieldStats]] = field(default_factory=dict)
+    archive_count: int = 1
+
+    def merge(self, other: "ExplorerSummary") -> "ExplorerSummary":
+        hierarchy = dict(self.hierarchy)
+        for class_name, superclass_names in other.hierarchy.items():
+            if hierarchy.setdefault(class_name, superclass_names) != superclass_names:
+                raise ValueError(f"Conflicting superclasses for {class_name}: "
+                                 f"{hierarchy[class_name]} and {superclass_names}")
+
+        # Attributes may be optional, so
+        # keep every attribute that was seen
+        final_attrs = {name: set(attrs) for name, attrs in self.final_attrs.items()}
+        for class_name, attrs in other.final_attrs.items():
+            final_attrs.setdefault(class_name, set()).update(attrs)
+
+        instance_counts = dict(self.instance_counts)
+        for class_name, count in other.instance_counts.items():
+            instance_counts[class_name] = instance_counts.get(class_name, 0) + count
+
+        field_stats = {name: dict(stats) for name, stats in self.field_stats.items()}
+        for class_name, other_stats in other.field_stats.items():
+            stats = field_stats.setdefault(class_name, {})
+            for attr, attr_stats in other_stats.items():
+                stats[attr] = stats[attr].merge(attr_stats) if attr in stats else attr_stats
+
+        return ExplorerSummary(hierarchy, final_attrs, instance_counts, field_stats,
+                               self.archive_count + other.archive_count)
+
+
 
 class Explorer:
     """
@@ -41,94 +195,52 @@ class Explorer:
     """
 
     _classes: dict[str, InferredClass]
+    _summary: ExplorerSummary
     _UID_map: dict[int, ]
 
-    def __init__(self, fp: t.IO):
-        data = NSKeyedArchive(fp)
-        self._classes = self._find_classes(data)
-
-    def _find_classes(self, data: NSKeyedArchive):
-        # We want to find all classes.
-        # We can start at the root object
-        # and explore pl.UIDs.
-
-        instances: dict[pl.UID, list[pl.UID]] = {}
-
-        for uid, entry in data._objects.items():
-            if isinstance(entry, dict) and "$class" in entry:  # a class instance
-                defintion_uid = entry["$class"]
-
-                if defintion_uid not in instances:
-                    instances[defintion_uid] = []
+    _collect_field_stats: bool
 
-                instances[defintion_uid].append(uid)
-
-        # instances is now a mapping of classes to all their instances
-        # We can use this to build a map of the attributes of each class
-        # and infer their types.
-        # Then we can use each class and the hierarchy table
-        # to infer parent classes.
+    def __init__(self, fp: t.Union[t.IO, NSKeyedArchive], lazy: bool = False, field_stats: bool = True):
+        data = fp if isinstance(fp, NSKeyedArchive) else NSKeyedArchive(fp, lazy=lazy)
+        self._collect_field_stats = field_stats
+        self._classes = self._find_classes(data)
 
+    @classmethod
+    def from_summary(cls, summary: ExplorerSummary) -> "Explorer":
+        """
+        Rebuild the inferred classes from a (merged)
+        summary instead of reading an archive
+        """
+        explorer = cls.__new__(cls)
+        explorer._collect_field_stats = bool(summary.field_stats)
+        explorer._summary = summary
+        explorer._classes = explorer._build_classes(summary)
+        return explorer
+
+    def summary(self) -> ExplorerSummary:
+        return self._summary
+
+    def _build_classes(self, summary: ExplorerSummary) -> dict[str, InferredClass]:
         classes: dict[str, InferredClass] = {}
 
         universal_class = InferredClass("$Object", None)
         classes["$Object"] = universal_class
 
-        for cls_uid, instance_uids in instances.items():
-            cls_archived = data._objects[cls_uid]
-            for uid in instance_uids:
-                instance_archived: dict = data._objects[uid]
-                attrs = instance_archived.keys()
-                attrs = filter(lambda a: not a.startswith("$"), attrs)
-
-                assert cls_archived["$classes"][0] == cls_archived["$classname"]
-
-                parent_class_names = cls_archived["$classes"][:-1]
-                parent_class_names_top_down = parent_class_names[::-1]
-
-                last_class: t.Optional[InferredClass] = universal_class
-                for class_name in parent_class_names_top_down:
-                    # If we haven't recorded this class yet, do so
-                    if class_name not in classes:
-                        cls = InferredClass(
-                            name=class_name,
-                            superclass=last_class
-                            )
-                        classes[class_name] = cls
-                    else:
-                        cls = classes[class_name]
-
-                    if cls not in last_class.subclasses:
-                        last_class.subclasses.append(cls)
-                    last_class = cls
-
-                # Now, we need to look at our resultant class
-
-                class_name = cls_archived["$classname"]
-                if class_name not in classes:
-                    cls = InferredClass(
-                        name=class_name,
-                        superclass=last_class,
-                        final_attrs=set(attrs),
-                        )
-                    classes[class_name] = cls
-                else:
-                    # This end class was already created
-                    cls = classes[class_name]
-                    if cls.final_attrs is None:
-                        # Created as a parent of another class
-                        cls.final_attrs = set(attrs)
-                    else:
-                        # Created as an end class
-                        if class_name == "NSValue":
-                            # NSValue is very annoying
-                            # and doesn't always serialize to the
-                            # same attributes. So it needs
-                            # special handling.
-                            pass  # fixme: diversification of NSValues
-                        else:
-                            # Sanity check attributes
-                            assert cls.final_attrs == set(attrs)
+        for class_name, superclass_names in summary.hierarchy.items():
+            last_class = universal_class
+            for name in superclass_names + (class_name,):
+                # Classes are only linked to their superclass
+                # when created, so subclasses never need a
+                # membership check
+                if name not in classes:
+                    cls = classes[name] = InferredClass(name=name, superclass=last_class)
+                    last_class.subclasses.append(cls)
+                last_class = classes[name]
+
+        for class_name, attrs in summary.final_attrs.items():
+            classes[class_name].final_attrs = set(attrs)
+            classes[class_name].instance_count = summary.instance_counts.get(class_name, 0)
+            classes[class_name].field_stats = summary.field_stats.get(class_name, {})
 
         # We have a list of classes and their final attributes
         # Now we need to find all classes with the same superclass
@@ -144,6 +256,138 @@ class Explorer:
 
         return classes
 
+    def _find_classes(self, data: NSKeyedArchive) -> dict[str, InferredClass]:
+        self._summary = self._summarize(data)
+        return self._build_classes(self._summary)
+
+    def _summarize(self, data: NSKeyedArchive) -> ExplorerSummary:
+        # We want to find all classes, in a single pass
+        # over the archive. Each class description ($classes)
+        # is only looked at once, the first time an instance
+        # of it is seen.
+
+        summary = ExplorerSummary()
+
+        class_names: dict[pl.UID, str] = {}
+        # The archived keys of the first instance of each class:
+        # most instances have exactly the same keys, which
+        # is cheap to check
+        first_keys: dict[pl.UID, frozenset[str]] = {}
+
+        def class_name_of(cls_uid: pl.UID) -> str:
+            class_name = class_names.get(cls_uid)
+            if class_name is None:
+                class_name = class_names[cls_uid] = self._record_hierarchy(summary, data.objects[cls_uid])
+            return class_name
+
+        # The class name (or value type) of each referenced
+        # object, and whether it is an instance: looking it up
+        # again would parse its entry again in lazy archives
+        targets: dict[pl.UID, tuple[str, bool]] = {}
+
+        def target_of(uid: pl.UID) -> tuple[str, bool]:
+            target = targets.get(uid)
+            if target is None:
+                entry = data.objects[uid]
+                if data.is_instance(entry):
+                    target = (class_name_of(entry["$class"]), True)
+                else:
+                    target = (_value_type(entry), False)
+                targets[uid] = target
+            return target
+
+        for uid, entry in data.objects.items():
+            if not data.is_instance(entry):
+                continue
+
+            cls_uid = entry["$class"]
+            class_name = class_name_of(cls_uid)
+            if cls_uid not in first_keys:
+                first_keys[cls_uid] = frozenset(entry.keys())
+
+            summary.instance_counts[class_name] = summary.instance_counts.get(class_name, 0) + 1
+
+            if self._collect_field_stats:
+                class_stats = summary.field_stats.setdefault(class_name, {})
+                for key, value in entry.items():
+                    if not data.is_key_internal(key):
+                        attr = data.unsanitize_key(key)
+                        if attr not in class_stats:
+                            class_stats[attr] = FieldStats()
+                        self._record_value(class_stats[attr], value, data, target_of)
+
+            if entry.keys() == first_keys[cls_uid] and class_name in summary.final_attrs:
+                continue
+
+            attrs = {data.unsanitize_key(k) for k in entry.keys() if not data.is_key_internal(k)}
+
+            if class_name not in summary.final_attrs:
+                summary.final_attrs[class_name] = attrs
+            elif class_name == "NSValue":
+                # NSValue is very annoying
+                # and doesn't always serialize to the
+                # same attributes. So it needs
+                # special handling.
+                pass  # fixme: diversification of NSValues
+            else:
+                # Sanity check attributes
+                assert summary.final_attrs[class_name] == attrs
+
+        return summary
+
+    @staticmethod
+    def _record_value(stats: FieldStats, value: t.Any, data: NSKeyedArchive,
+                      target_of: t.Callable[[pl.UID], tuple[str, bool]]) -> None:
+        value_type = _value_type(value)
+        stats.count += 1
+        stats.value_types[value_type] += 1
+
+        if value_type == "null":
+            stats.null_count += 1
+            return
+
+        if value_type == "list":
+            for element in value[:LIST_ELEMENTS_SAMPLED]:
+                stats.element_types[_value_type(element)] += 1
+                if isinstance(element, pl.UID) and element != NULL_UID:
+                    stats.add_target(target_of(element)[0])
+            return
+
+        if value_type == "uid":
+            target_name, is_instance = target_of(value)
+            stats.add_target(target_name)
+            if is_instance:
+                stats.add_distinct(value)
+                return
+            # Strings etc. are referenced too:
+            # describe them rather than their UID
+            value = data.objects[value]
+
+        stats.add_sample(value)
+        if not isinstance(value, (dict, list)):
+            stats.add_distinct(value)
+
+    @staticmethod
+    def _record_hierarchy(summary: ExplorerSummary, cls_archived: dict) -> str:
+        """
+        Record a class and its superclasses,
+        and return the class's name
+        """
+        assert NSKeyedArchive.is_class(cls_archived)
+        assert cls_archived["$classes"][0] == cls_archived["$classname"]
+
+        # The last class is the root (NSObject), which is
+        # represented by $Object, unless it is the class
+        # itself: so the class is always recorded, and its
+        # ancestors between it and the root separately
+        class_name = cls_archived["$classname"]
+        ancestors_top_down = cls_archived["$classes"][1:-1][::-1]
+        for i, ancestor in enumerate(ancestors_top_down):
+            summary.hierarchy.setdefault(ancestor, tuple(ancestors_top_down[:i]))
+        summary.hierarchy.setdefault(class_name, tuple(ancestors_top_down))
+
+        return class_name
+
     def _infer_attrs(self, cls: t.Optional[InferredClass]):
         # We want to take all the final attributes that each class has
         # and walk up the inheritance tree to infer what attrs each
@@ -193,14 +437,28 @@ class Explorer:
         pass
 
 
+def _summarize_file(path: t.Union[str, os.PathLike], lazy: bool, field_stats: bool) -> ExplorerSummary:
+    with open(path, "rb") as fp:
+        return Explorer(fp, lazy=lazy, field_stats=field_stats).summary()
 
 
-
-
-
-
-
-
-
-
-
+def explore_many(paths: t.Iterable[t.Union[str, os.PathLike]], workers: t.Optional[int] = None,
+                 lazy: bool = True, field_stats: bool = True) -> Explorer:
+    """
+    Explore many archives at once, one process per core
+    (or `workers`), and merge what was found in each
+    """
+    paths = list(paths)
+    if not paths:
+        raise ValueError("No archives to explore")
+
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        summaries = (_summarize_file(path, lazy, field_stats) for path in paths)
+        return Explorer.from_summary(reduce(ExplorerSummary.merge, summaries))
+
+    chunksize = max(1, len(paths) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        summaries = executor.map(_summarize_file, paths, [lazy] * len(paths), [field_stats] * len(paths),
+                                 chunksize=chunksize)
+        return Explorer.from_summary(reduce(ExplorerSummary.merge, summaries))
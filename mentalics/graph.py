@@ -0,0 +1,227 @@
+import plistlib as pl
+import typing as t
+from array import array
+
+from .ns_keyed_archive import NSKeyedArchive
+
+NULL_UID = pl.UID(0)
+
+# For UIDs and edge offsets: unsigned, at least 32 bits
+_INDEX_TYPECODE = "I" if array("I").itemsize >= 4 else "L"
+
+
+def _references_in(entry: t.Any) -> t.Iterator[int]:
+    """
+    The UIDs an entry of $objects refers to, as ints, including
+    its class and any in (nested) plain lists and dicts
+    """
+    if isinstance(entry, pl.UID):
+        yield entry.data
+        return
+    if not isinstance(entry, (dict, list)):
+        return
+
+    stack = [entry]
+    while stack:
+        container = stack.pop()
+        for value in container.values() if isinstance(container, dict) else container:
+            if isinstance(value, pl.UID):
+                yield value.data
+            elif isinstance(value, (dict, list)):
+                stack.append(value)
+
+
+def _compress(sources: array, targets: array, node_count: int) -> tuple[array, array]:
+    """
+    Sort the edges by source (a counting sort) into offsets,
+    where the edges from node i are the targets from
+    offsets[i] to offsets[i + 1]
+    """
+    counts = [0] * (node_count + 1)
+    for source in sources:
+        counts[source + 1] += 1
+    for i in range(node_count):
+        counts[i + 1] += counts[i]
+    offsets = array(_INDEX_TYPECODE, counts)
+
+    positions = counts[:-1]
+    sorted_targets = array(_INDEX_TYPECODE, bytes(targets.itemsize * len(targets)))
+    for source, target in zip(sources, targets):
+        sorted_targets[positions[source]] = target
+        positions[source] += 1
+    return offsets, sorted_targets
+
+
+class ReferenceGraph:
+    """
+    An index of which objects of an archive refer to which,
+    built from $objects without decoding anything:
+
+    ```
+    graph = ReferenceGraph(NSKeyedArchive(file))
+    graph.referrers(media_uid)        # what refers to it
+    graph.unreachable()               # what nothing in $top leads to
+    graph.cycles()                    # groups of objects that refer to each other
+    ```
+
+    References are stored both ways as compact integer
+    arrays (compressed sparse rows). Instances refer to their
+    class descriptors, so descriptors that are in use are
+    reachable. References to $null are left out.
+    """
+
+    node_count: int
+    roots: list[pl.UID]  # the UIDs in $top
+
+    _offsets: array
+    _targets: array
+    _reverse_offsets: array
+    _reverse_targets: array
+
+    def __init__(self, archive: NSKeyedArchive):
+        objects = archive.objects
+        self.node_count = max((uid.data for uid in objects), default=-1) + 1
+        self.roots = [pl.UID(uid) for uid in _references_in(archive.top) if uid != NULL_UID.data]
+
+        sources = array(_INDEX_TYPECODE)
+        targets = array(_INDEX_TYPECODE)
+        for uid, entry in objects.items():
+            for target in _references_in(entry):
+                if target != 0:
+                    sources.append(uid.data)
+                    targets.append(target)
+
+        if targets and max(targets) >= self.node_count:
+            raise ValueError(f"An object refers to UID {max(targets)}, which is not in the archive")
+
+        self._offsets, self._targets = _compress(sources, targets, self.node_count)
+        self._reverse_offsets, self._reverse_targets = _compress(targets, sources, self.node_count)
+
+    def __len__(self) -> int:
+        return self.node_count
+
+    @property
+    def edge_count(self) -> int:
+        return len(self._targets)
+
+    def references(self, uid: pl.UID) -> list[pl.UID]:
+        """
+        The UIDs uid refers to, once per reference
+        """
+        return self._neighbours(self._offsets, self._targets, uid)
+
+    def referrers(self, uid: pl.UID) -> list[pl.UID]:
+        """
+        The UIDs that refer to uid, once per reference
+        """
+        return self._neighbours(self._reverse_offsets, self._reverse_targets, uid)
+
+    def _neighbours(self, offsets: array, targets: array, uid: pl.UID) -> list[pl.UID]:
+        if not 0 <= uid.data < self.node_count:
+            raise KeyError(uid)
+        return list(map(pl.UID, targets[offsets[uid.data]:offsets[uid.data + 1]]))
+
+    def reachable(self, *uids: pl.UID, reverse: bool = False) -> set[pl.UID]:
+        """
+        The UIDs reachable from uids (from $top if none are
+        given), including themselves. With reverse=True, the
+        UIDs that lead to uids instead, e.g. everything whose
+        decoding would decode one of them.
+        """
+        marks = self._mark(uids or self.roots, reverse)
+        return {pl.UID(i) for i in range(self.node_count) if marks[i]}
+
+    def unreachable(self) -> set[pl.UID]:
+        """
+        The UIDs of objects that nothing in $top leads to,
+        which would never be decoded (except $null)
+        """
+        marks = self._mark(self.roots, reverse=False)
+        return {pl.UID(i) for i in range(1, self.node_count) if not marks[i]}
+
+    def _mark(self, uids: t.Iterable[pl.UID], reverse: bool) -> bytearray:
+        offsets, targets = (self._reverse_offsets, self._reverse_targets) if reverse else (self._offsets, self._targets)
+        marks = bytearray(self.node_count)
+        stack = []
+        for uid in uids:
+            if not 0 <= uid.data < self.node_count:
+                raise KeyError(uid)
+            if not marks[uid.data]:
+                marks[uid.data] = 1
+                stack.append(uid.data)
+
+        while stack:
+            node = stack.pop()
+            for target in targets[offsets[node]:offsets[node + 1]]:
+                if not marks[target]:
+                    marks[target] = 1
+                    stack.append(target)
+        return marks
+
+    def strongly_connected_components(self) -> list[list[pl.UID]]:
+        """
+        All the strongly connected components (groups of objects
+        that can each reach the others), referenced components
+        before the components referring to them
+        """
+        # Tarjan's algorithm, with an explicit stack
+        # so deep archives don't hit the recursion limit
+        offsets, targets = self._offsets, self._targets
+        unvisited = self.node_count
+        index = array(_INDEX_TYPECODE, [unvisited]) * self.node_count
+        low_link = array(_INDEX_TYPECODE, bytes(index.itemsize * self.node_count))
+        on_stack = bytearray(self.node_count)
+        component_stack = []
+        components = []
+        next_index = 0
+
+        for start in range(self.node_count):
+            if index[start] != unvisited:
+                continue
+
+            index[start] = low_link[start] = next_index
+            next_index += 1
+            component_stack.append(start)
+            on_stack[start] = 1
+            # (node, position of its next edge)
+            call_stack = [(start, offsets[start])]
+
+            while call_stack:
+                node, edge = call_stack[-1]
+                if edge < offsets[node + 1]:
+                    call_stack[-1] = (node, edge + 1)
+                    target = targets[edge]
+                    if index[target] == unvisited:
+                        index[target] = low_link[target] = next_index
+                        next_index += 1
+                        component_stack.append(target)
+                        on_stack[target] = 1
+                        call_stack.append((target, offsets[target]))
+                    elif on_stack[target]:
+                        low_link[node] = min(low_link[node], index[target])
+                    continue
+
+                call_stack.pop()
+                if call_stack:
+                    parent = call_stack[-1][0]
+                    low_link[parent] = min(low_link[parent], low_link[node])
+
+                if low_link[node] == index[node]:
+                    component = []
+                    while True:
+                        member = component_stack.pop()
+                        on_stack[member] = 0
+                        component.append(pl.UID(member))
+                        if member == node:
+                            break
+                    components.append(component)
+
+        return components
+
+    def cycles(self) -> list[list[pl.UID]]:
+        """
+        The strongly connected components that contain a cycle:
+        more than one object, or one that refers to itself
+        """
+        return [component for component in self.strongly_connected_components()
+                if len(component) > 1 or component[0] in self.references(component[0])]
@@ -0,0 +1,66 @@
+import threading
+import typing as t
+from collections import OrderedDict
+
+DEFAULT_MAX_SIZE = 1 << 16
+
+T = t.TypeVar("T")
+
+
+class InternPool:
+    """
+    Canonical copies of equal immutable values (strings,
+    NSPoints etc.), so that objects decoded from many
+    archives share them instead of each having their own:
+
+    ```
+    pool = InternPool()
+    for path in paths:
+        with open(path, "rb") as file:
+            roots.append(Unarchiver(file, intern_pool=pool).decode())
+    ```
+
+    The pool keeps at most max_size values, evicting the least
+    recently used. Evicted values are not shared with values
+    decoded later, but stay valid wherever they are used.
+    A pool can be shared between threads.
+    """
+
+    max_size: int
+    hits: int
+    misses: int
+
+    _values: OrderedDict[t.Any, t.Any]
+    _lock: threading.Lock
+
+    def __init__(self, max_size: int = DEFAULT_MAX_SIZE):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._values = OrderedDict()
+        self._lock = threading.Lock()
+
+    def intern(self, value: T) -> T:
+        """
+        The pool's copy of value, which
+        becomes the pool's copy if it has none
+        """
+        with self._lock:
+            canonical = self._values.get(value)
+            if canonical is not None:
+                self._values.move_to_end(value)
+                self.hits += 1
+                return canonical
+
+            self._values[value] = value
+            self.misses += 1
+            if len(self._values) > self.max_size:
+                self._values.popitem(last=False)
+            return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+    def __len__(self):
+        return len(self._values)
@@ -0,0 +1,108 @@
+import typing as t
+from dataclasses import dataclass
+from time import monotonic
+
+# The clock is only read every so many objects
+DEADLINE_CHECK_EVERY = 1024
+
+
+class LimitExceeded(ValueError):
+    """
+    An archive is larger (or takes longer to read)
+    than the Limits it was read with allow
+    """
+
+    limit: str  # the name of the Limits field
+    value: t.Any
+    maximum: t.Any
+
+    def __init__(self, limit: str, value: t.Any, maximum: t.Any):
+        # Kept as the args, so that it can be pickled (e.g. back from load_many's workers)
+        super().__init__(limit, value, maximum)
+        self.limit = limit
+        self.value = value
+        self.maximum = maximum
+
+    def __str__(self) -> str:
+        return f"{self.limit} exceeded: {self.value} > {self.maximum}"
+
+
+@dataclass(frozen=True)
+class Limits:
+    """
+    Budgets for reading untrusted archives. Each is
+    checked before whatever it limits is allocated,
+    and raises LimitExceeded. None means no limit.
+
+    ```
+    limits = Limits(max_objects=100_000, max_bytes=50 << 20, timeout=5.0)
+    Unarchiver(file, limits=limits).decode()
+    ```
+    """
+
+    # Entries of $objects
+    max_objects: t.Optional[int] = None
+    # Size of the archive's file, as read: not a limit
+    # on the memory the decoded objects take up
+    max_bytes: t.Optional[int] = None
+    # Elements of any one array (or dictionary)
+    max_list_length: t.Optional[int] = None
+    # Nesting of arrays and dictionaries in an entry (binary
+    # plists are never read deeper than bplist.MAX_DEPTH)
+    max_depth: t.Optional[int] = None
+    # Seconds from when reading starts
+    timeout: t.Optional[float] = None
+
+    def start(self) -> "Budget":
+        return Budget(self)
+
+
+class Budget:
+    """
+    The Limits of one read of an archive, with its deadline.
+    Shared by the NSKeyedArchive and Unarchiver reading it.
+    """
+
+    limits: Limits
+    deadline: t.Optional[float]  # time.monotonic()
+
+    _ticks: int
+
+    def __init__(self, limits: Limits):
+        self.limits = limits
+        self.deadline = monotonic() + limits.timeout if limits.timeout is not None else None
+        self._ticks = 0
+
+    def check_objects(self, count: int) -> None:
+        maximum = self.limits.max_objects
+        if maximum is not None and count > maximum:
+            raise LimitExceeded("max_objects", count, maximum)
+
+    def check_bytes(self, size: int) -> None:
+        maximum = self.limits.max_bytes
+        if maximum is not None and size > maximum:
+            raise LimitExceeded("max_bytes", size, maximum)
+
+    def check_list(self, length: int) -> None:
+        maximum = self.limits.max_list_length
+        if maximum is not None and length > maximum:
+            raise LimitExceeded("max_list_length", length, maximum)
+
+    def check_depth(self, depth: int) -> None:
+        maximum = self.limits.max_depth
+        if maximum is not None and depth > maximum:
+            raise LimitExceeded("max_depth", depth, maximum)
+
+    def check_deadline(self) -> None:
+        if self.deadline is not None and monotonic() > self.deadline:
+            raise LimitExceeded("timeout", f"{monotonic() - self.deadline + self.limits.timeout:.3f}s",
+                                f"{self.limits.timeout}s")
+
+    def tick(self) -> None:
+        """
+        Called once per object: checks
+        the deadline every so often
+        """
+        self._ticks += 1
+        if not self._ticks % DEADLINE_CHECK_EVERY:
+            self.check_deadline()
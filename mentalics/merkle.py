@@ -0,0 +1,513 @@
+import os
+import plistlib as pl
+import sqlite3
+import struct
+import typing as t
+from datetime import datetime
+from hashlib import blake2b
+
+from .graph import ReferenceGraph
+from .ns_keyed_archive import NSKeyedArchive
+
+NULL_UID = pl.UID(0)
+
+KEY_SIZE = 16
+
+# Records are the canonical encoding of objects: a tag byte,
+# then (for most values) a length and the value's bytes.
+# References are to other records by key and member index
+_LENGTH = struct.Struct(">I")
+_INDEX = struct.Struct(">I")
+_FLOAT = struct.Struct(">d")
+
+_NULL = b"N"
+_MEMBER = b"M"  # a reference within the same record
+_EXTERNAL = b"U"  # a reference to a member of another record
+_STRING = b"S"
+_DATA = b"B"
+_TRUE = b"T"
+_FALSE = b"F"
+_INTEGER = b"I"
+_REAL = b"R"
+_DATE = b"A"
+_LIST = b"L"
+_DICT = b"D"
+_COMPONENT = b"C"  # a record: its member count, then its members
+
+# Refining labels in long cycles can take a round per member,
+# and a few are enough to find a member unlike the others
+MAX_REFINEMENT_ROUNDS = 16
+
+STORE_FORMAT = 1
+
+
+def _key(record: bytes) -> bytes:
+    return blake2b(record, digest_size=KEY_SIZE).digest()
+
+
+def _encode(value: t.Any, reference: t.Callable[[pl.UID], bytes], out: bytearray) -> None:
+    """
+    Append the canonical encoding of an archived value to
+    out, with each UID encoded by reference. Dicts are
+    encoded in key order, so their order doesn't matter.
+    """
+    stack = [value]
+    while stack:
+        value = stack.pop()
+        cls = value.__class__
+        if cls is pl.UID:
+            out += reference(value)
+        elif cls is str:
+            data = value.encode()
+            out += _STRING + _LENGTH.pack(len(data)) + data
+        elif cls is bool:
+            out += _TRUE if value else _FALSE
+        elif cls is int:
+            data = str(value).encode()
+            out += _INTEGER + _LENGTH.pack(len(data)) + data
+        elif cls is float:
+            out += _REAL + _FLOAT.pack(value)
+        elif cls in (bytes, bytearray, memoryview):
+            out += _DATA + _LENGTH.pack(len(value)) + bytes(value)
+        elif cls is datetime:
+            data = value.isoformat().encode()
+            out += _DATE + _LENGTH.pack(len(data)) + data
+        elif cls is list:
+            out += _LIST + _LENGTH.pack(len(value))
+            stack.extend(reversed(value))
+        elif cls is dict:
+            out += _DICT + _LENGTH.pack(len(value))
+            for key in sorted(value, reverse=True):
+                stack.append(value[key])
+                stack.append(key)
+        else:
+            raise TypeError(f"Can't hash {cls.__name__}")
+
+
+def _decode(record: bytes, position: int,
+            reference: t.Callable[[bytes, t.Optional[bytes], int], pl.UID]) -> tuple[t.Any, int]:
+    """
+    Inverse of _encode: the value encoded at position in
+    record, and the position after it. References are
+    resolved by reference(tag, key or None, index)
+    """
+    # (container, values still to read, key waiting for a value)
+    stack: list[list] = []
+    while True:
+        tag = record[position:position + 1]
+        position += 1
+        if tag in (_STRING, _DATA, _INTEGER, _DATE):
+            (length,) = _LENGTH.unpack_from(record, position)
+            position += _LENGTH.size
+            data = record[position:position + length]
+            position += length
+            if tag == _STRING:
+                value = data.decode()
+            elif tag == _DATA:
+                value = bytes(data)
+            elif tag == _INTEGER:
+                value = int(data)
+            else:
+                value = datetime.fromisoformat(data.decode())
+        elif tag == _TRUE or tag == _FALSE:
+            value = tag == _TRUE
+        elif tag == _REAL:
+            (value,) = _FLOAT.unpack_from(record, position)
+            position += _FLOAT.size
+        elif tag == _NULL:
+            value = NULL_UID
+        elif tag == _MEMBER:
+            (index,) = _INDEX.unpack_from(record, position)
+            position += _INDEX.size
+            value = reference(tag, None, index)
+        elif tag == _EXTERNAL:
+            key = bytes(record[position:position + KEY_SIZE])
+            (index,) = _INDEX.unpack_from(record, position + KEY_SIZE)
+            position += KEY_SIZE + _INDEX.size
+            value = reference(tag, key, index)
+        elif tag == _LIST or tag == _DICT:
+            (length,) = _LENGTH.unpack_from(record, position)
+            position += _LENGTH.size
+            container = [] if tag == _LIST else {}
+            if length:
+                # Dicts read twice as many values: keys, then values
+                stack.append([container, length * (2 if tag == _DICT else 1), None])
+                continue
+            value = container
+        else:
+            raise ValueError(f"Unknown tag {tag!r} at {position - 1}")
+
+        # Add the value to the innermost container, and
+        # close each container that is now full
+        while stack:
+            frame = stack[-1]
+            container = frame[0]
+            if container.__class__ is list:
+                container.append(value)
+            elif frame[2] is None:
+                frame[2] = value  # a key
+            else:
+                container[frame[2]] = value
+                frame[2] = None
+            frame[1] -= 1
+            if frame[1]:
+                break
+            stack.pop()
+            value = container
+        else:
+            return value, position
+
+
+class _Component:
+    """
+    A strongly connected component of an archive, and
+    its record: each member's entry, in canonical order
+    """
+
+    members: list[int]  # UIDs, in canonical order
+    record: bytes
+    key: bytes
+
+    def __init__(self, members: list[int], record: bytes):
+        self.members = members
+        self.record = record
+        self.key = _key(record)
+
+
+class _Hasher:
+    """
+    Hashes every object of an archive bottom up, a strongly
+    connected component at a time (in the order of the
+    ReferenceGraph), so hashes don't depend on UID numbering.
+
+    Acyclic objects are records of their own, referencing
+    what they reference by key. The members of a cycle are
+    one record, ordered by Weisfeiler-Lehman refinement:
+    each member is labelled by its own entry, then repeatedly
+    by its label and the labels of the members it references,
+    until the labels stop telling more members apart.
+
+    Members that are still alike are ordered by a walk in
+    reference order, from each member of the smallest group of
+    alike members in turn, keeping the order with the smallest
+    record. When several orders give that record (e.g. in a ring
+    of equal objects, any member can come first) the one chosen
+    puts the members reached first from $top first, so neither
+    the record nor references to its members depend on UIDs.
+    """
+
+    _objects: t.Mapping[pl.UID, t.Any]
+    _top: dict[str, t.Any]
+    _visits: t.Optional[dict[int, int]]  # see _visit_order
+    # UID -> (component, index in the component)
+    _locations: dict[int, tuple[_Component, int]]
+    components: list[_Component]
+
+    def __init__(self, archive: NSKeyedArchive, graph: t.Optional[ReferenceGraph] = None):
+        self._objects = archive.objects
+        self._top = archive.top
+        self._visits = None
+        self._locations = {}
+        self.components = []
+
+        graph = graph if graph is not None else ReferenceGraph(archive)
+        for uids in graph.strongly_connected_components():
+            members = [uid.data for uid in uids]
+            if members == [0]:
+                continue  # $null is never referenced by key
+            component = self._component(members) if len(members) > 1 else self._single(members[0])
+            self.components.append(component)
+            for index, member in enumerate(component.members):
+                self._locations[member] = (component, index)
+
+    def object_hash(self, uid: int) -> bytes:
+        component, index = self._locations[uid]
+        if len(component.members) == 1:
+            return component.key
+        return _key(component.key + _INDEX.pack(index))
+
+    def external_reference(self, uid: pl.UID) -> bytes:
+        if not uid.data:
+            return _NULL
+        component, index = self._locations[uid.data]
+        return _EXTERNAL + component.key + _INDEX.pack(index)
+
+    def _single(self, uid: int) -> _Component:
+        record = bytearray(_COMPONENT + _INDEX.pack(1))
+        # A single object can still reference itself
+        _encode(self._objects[pl.UID(uid)], lambda ref: _MEMBER + _INDEX.pack(0) if ref.data == uid
+                else self.external_reference(ref), record)
+        return _Component([uid], bytes(record))
+
+    def _component(self, members: list[int]) -> _Component:
+        member_set = set(members)
+        # The members each member references, in encoding order
+        internal: dict[int, list[int]] = {member: [] for member in member_set}
+
+        labels = {}
+        for member in members:
+            def reference(ref: pl.UID, member=member) -> bytes:
+                if ref.data in member_set:
+                    internal[member].append(ref.data)
+                    return _MEMBER
+                return self.external_reference(ref)
+
+            encoding = bytearray()
+            _encode(self._objects[pl.UID(member)], reference, encoding)
+            labels[member] = _key(encoding)
+
+        distinct = len(set(labels.values()))
+        for _ in range(min(len(members), MAX_REFINEMENT_ROUNDS)):
+            refined = {member: _key(labels[member] + b"".join(labels[ref] for ref in internal[member]))
+                       for member in members}
+            refined_distinct = len(set(refined.values()))
+            labels = refined
+            if refined_distinct == distinct:
+                break
+            distinct = refined_distinct
+
+        # A member unlike any other is the only start tried
+        alike: dict[bytes, list[int]] = {}
+        for member in members:
+            alike.setdefault(labels[member], []).append(member)
+        starts = min(alike.values(), key=lambda group: (len(group), labels[group[0]]))
+
+        smallest = None
+        orders = []
+        for start in starts:
+            ordered = self._walk(start, members, labels, internal)
+            indices = {member: index for index, member in enumerate(ordered)}
+            # Stands in for the record, which it determines
+            shape = [(labels[member], [indices[ref] for ref in internal[member]]) for member in ordered]
+            if smallest is None or shape < smallest:
+                smallest = shape
+                orders = [ordered]
+            elif shape == smallest:
+                orders.append(ordered)
+        ordered = orders[0] if len(orders) == 1 else self._first_reached_first(orders)
+
+        indices = {member: index for index, member in enumerate(ordered)}
+        record = bytearray(_COMPONENT + _INDEX.pack(len(ordered)))
+        for member in ordered:
+            _encode(self._objects[pl.UID(member)], lambda ref: _MEMBER + _INDEX.pack(indices[ref.data])
+                    if ref.data in indices else self.external_reference(ref), record)
+        return _Component(ordered, bytes(record))
+
+    @staticmethod
+    def _walk(start: int, members: list[int], labels: dict[int, bytes],
+              internal: dict[int, list[int]]) -> list[int]:
+        """
+        The members ordered by label, and alike members by
+        a walk in reference order from start
+        """
+        walk_order = {}
+        stack = [start]
+        while stack:
+            member = stack.pop()
+            if member not in walk_order:
+                walk_order[member] = len(walk_order)
+                stack.extend(reversed(internal[member]))
+        return sorted(members, key=lambda member: (labels[member], walk_order[member]))
+
+    def _first_reached_first(self, orders: list[list[int]]) -> list[int]:
+        """
+        Of orders giving the same record, the one placing the
+        members reached first from $top earliest. Members
+        unreachable from $top are left in any order.
+        """
+        visits = self._visit_order()
+        unreached = len(visits)
+        by_visit = sorted(orders[0], key=lambda member: visits.get(member, unreached))
+
+        def placement(ordered: list[int]) -> list[int]:
+            indices = {member: index for index, member in enumerate(ordered)}
+            return [indices[member] for member in by_visit]
+
+        return min(orders, key=placement)
+
+    def _visit_order(self) -> dict[int, int]:
+        """
+        The order objects are first reached from $top in,
+        following references in encoding order, which
+        doesn't depend on UIDs
+        """
+        if self._visits is None:
+            visits = self._visits = {}
+            stack = [self._top]
+            while stack:
+                value = stack.pop()
+                cls = value.__class__
+                if cls is pl.UID:
+                    if value.data not in visits:
+                        visits[value.data] = len(visits)
+                        stack.append(self._objects[value])
+                elif cls is list:
+                    stack.extend(reversed(value))
+                elif cls is dict:
+                    stack.extend(value[key] for key in sorted(value, reverse=True))
+        return self._visits
+
+    def top_record(self, archive: NSKeyedArchive) -> bytes:
+        record = bytearray()
+        _encode({"$version": archive.version, "$top": archive.top}, self.external_reference, record)
+        return bytes(record)
+
+
+def structural_hashes(archive: NSKeyedArchive, graph: t.Optional[ReferenceGraph] = None) -> dict[pl.UID, bytes]:
+    """
+    A hash of each object in the archive (but $null) and
+    everything it references, whatever their UIDs: equal
+    subgraphs of different archives have equal hashes
+    """
+    hasher = _Hasher(archive, graph)
+    return {pl.UID(uid): hasher.object_hash(uid) for uid in hasher._locations}
+
+
+def archive_digest(archive: NSKeyedArchive, graph: t.Optional[ReferenceGraph] = None) -> bytes:
+    """
+    A hash of the archive's whole object graph, equal for
+    archives that only differ in UID numbering or in
+    objects unreachable from $top
+    """
+    return _key(_Hasher(archive, graph).top_record(archive))
+
+
+def structural_diff(a: NSKeyedArchive, b: NSKeyedArchive) -> tuple[set[pl.UID], set[pl.UID]]:
+    """
+    The UIDs of objects in a with no equal subgraph
+    in b, and of objects in b with none in a
+    """
+    hashes_a = structural_hashes(a)
+    hashes_b = structural_hashes(b)
+    in_a = set(hashes_a.values())
+    in_b = set(hashes_b.values())
+    return ({uid for uid, h in hashes_a.items() if h not in in_b},
+            {uid for uid, h in hashes_b.items() if h not in in_a})
+
+
+class SubgraphStore:
+    """
+    A content-addressed store of archives, which keeps
+    each distinct subgraph once however many archives
+    (or places in an archive) it appears in:
+
+    ```
+    with SubgraphStore("archives.db") as store:
+        key = store.put(NSKeyedArchive(file))
+        ...
+        archive = store.get(key)
+    ```
+
+    Records are keyed by the hash of their contents, which
+    include the keys of what they reference (as in a Merkle
+    tree), so equal subgraphs share records. Archives are
+    rebuilt with their objects renumbered, and without
+    objects unreachable from $top.
+    """
+
+    path: str
+
+    _connection: sqlite3.Connection
+
+    def __init__(self, path: t.Union[str, os.PathLike]):
+        self.path = os.fspath(path)
+        self._connection = sqlite3.connect(self.path)
+        self._connection.executescript("""
+            CREATE TABLE IF NOT EXISTS records (key BLOB PRIMARY KEY, record BLOB NOT NULL);
+            CREATE TABLE IF NOT EXISTS archives (key BLOB PRIMARY KEY, record BLOB NOT NULL);
+            CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value);
+            """)
+        format_row = self._connection.execute("SELECT value FROM meta WHERE name = 'format'").fetchone()
+        if format_row is None:
+            with self._connection:
+                self._connection.execute("INSERT INTO meta VALUES ('format', ?)", (STORE_FORMAT,))
+        elif format_row[0] != STORE_FORMAT:
+            raise ValueError(f"{self.path} is in store format {format_row[0]}, not {STORE_FORMAT}")
+
+    def __enter__(self) -> "SubgraphStore":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._connection.close()
+
+    def __contains__(self, key: bytes) -> bool:
+        return self._connection.execute("SELECT 1 FROM archives WHERE key = ?", (key,)).fetchone() is not None
+
+    def put(self, archive: NSKeyedArchive) -> bytes:
+        """
+        Store the archive, and return its key
+        (its archive_digest)
+        """
+        graph = ReferenceGraph(archive)
+        hasher = _Hasher(archive, graph)
+        reachable = graph.reachable()
+
+        top_record = hasher.top_record(archive)
+        key = _key(top_record)
+        rows = ((component.key, component.record) for component in hasher.components
+                if pl.UID(component.members[0]) in reachable)
+        with self._connection:
+            self._connection.executemany("INSERT OR IGNORE INTO records VALUES (?, ?)", rows)
+            self._connection.execute("INSERT OR IGNORE INTO archives VALUES (?, ?)", (key, top_record))
+        return key
+
+    def get(self, key: bytes) -> NSKeyedArchive:
+        """
+        Rebuild the archive stored with key
+        """
+        row = self._connection.execute("SELECT record FROM archives WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            raise KeyError(key)
+
+        objects: dict[pl.UID, t.Any] = {NULL_UID: "$null"}
+        uids = [NULL_UID]  # each UID made once, as the XML parser does
+        bases: dict[bytes, int] = {}  # record key -> UID of its first member
+        pending: list[tuple[bytes, int]] = []  # records to decode, and their bases
+
+        def uid(index: int) -> pl.UID:
+            while len(uids) <= index:
+                uids.append(pl.UID(len(uids)))
+            return uids[index]
+
+        def external(tag: bytes, record_key: t.Optional[bytes], index: int) -> pl.UID:
+            if tag == _MEMBER:
+                return uid(current_base + index)
+            base = bases.get(record_key)
+            if base is None:
+                record = self._record(record_key)
+                base = bases[record_key] = len(uids)
+                (member_count,) = _INDEX.unpack_from(record, 1)
+                uid(base + member_count - 1)  # reserve the members' UIDs
+                pending.append((record, base))
+            return uid(base + index)
+
+        current_base = 0
+        top_value, _ = _decode(row[0], 0, external)
+        while pending:
+            record, current_base = pending.pop()
+            (member_count,) = _INDEX.unpack_from(record, 1)
+            position = 1 + _INDEX.size
+            for index in range(member_count):
+                objects[uid(current_base + index)], position = _decode(record, position, external)
+
+        return NSKeyedArchive.from_objects(top_value["$version"], top_value["$top"],
+                                           [objects[u] for u in uids])
+
+    def _record(self, key: bytes) -> bytes:
+        row = self._connection.execute("SELECT record FROM records WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            raise KeyError(f"Missing record {key.hex()}")
+        return row[0]
+
+    def stored_bytes(self) -> int:
+        """
+        The size of the records stored, not counting the
+        database's own overhead
+        """
+        row = self._connection.execute(
+            "SELECT (SELECT COALESCE(SUM(LENGTH(record)), 0) FROM records)"
+            " + (SELECT COALESCE(SUM(LENGTH(record)), 0) FROM archives)").fetchone()
+        return row[0]
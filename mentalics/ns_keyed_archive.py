@@ -1,17 +1,179 @@
+import io
+import os
 import plistlib as pl
 import typing as t
 from dataclasses import dataclass
 
+from .bplist import BPLIST_MAGIC, LazyBinaryPlist, LazyObjects
+from .limits import Budget, Limits
+from .xmlplist import load_xml_archive
+
+# For compatibility reasons, Obj-C struct types like NSPoint
+# are archived as "special" NSValues, told apart by NS.special
+NSVALUE_SPECIAL_CLASS_NAMES = {
+    0: "NSValue",
+    1: "NSPoint",
+    2: "NSSize",
+    # other types?
+    }
+
 
 class NSKeyedArchive:
+    """
+    The raw contents of an NSKeyedArchiver plist.
+
+    With lazy=True, binary plists are memory-mapped
+    and each entry of $objects is only parsed when
+    it is looked up. Other formats are loaded normally.
+    XML plists are always parsed incrementally, straight
+    into $objects.
+
+    With zero_copy=True as well, data in binary plists
+    is not copied out of the file: it is read as
+    memoryviews of the memory-mapped file.
+
+    With limits, the file's size, the number of objects and
+    the length and nesting of arrays and dictionaries are
+    checked as the archive is read (binary plists are then
+    always read entry by entry), raising LimitExceeded.
+    """
+
     version: int
-    objects: dict[pl.UID, t.Any]
+    objects: t.Mapping[pl.UID, t.Any]
     top: dict[str, pl.UID]
 
-    def __init__(self, fp: t.IO):
+    def __init__(self, fp: t.IO, lazy: bool = False, zero_copy: bool = False,
+                 limits: t.Union[Limits, Budget, None] = None):
+        if zero_copy and not lazy:
+            raise ValueError("zero_copy=True needs lazy=True")
+        # A Budget is passed on by an Unarchiver, to share its deadline
+        budget = limits.start() if isinstance(limits, Limits) else limits
+        if budget is not None:
+            budget.check_bytes(self._size_of(fp))
+
+        is_binary = self._is_binary(fp)
+        if is_binary and (lazy or budget is not None):
+            self._load_lazy(fp, zero_copy, budget)
+            if not lazy:
+                self._load_objects(self.version, self.top, self.objects.entries())
+                budget.check_deadline()
+            return
+        if not is_binary:
+            self._load_objects(*load_xml_archive(fp, budget))
+            return
+
         as_dict = pl.load(fp)
-        self.version = as_dict["$version"]
-        self.top = as_dict["$top"]
+        self._load_objects(as_dict["$version"], as_dict["$top"], as_dict["$objects"])
+
+    @classmethod
+    def from_objects(cls, version: int, top: dict[str, pl.UID],
+                     objects: t.Union[t.Sequence[t.Any], dict[pl.UID, t.Any]]) -> "NSKeyedArchive":
+        """
+        An archive made from an already parsed $objects
+        array (or its entries by UID), e.g. one that was cached
+        """
+        archive = cls.__new__(cls)
+        archive._load_objects(version, top, objects)
+        return archive
+
+    def _load_objects(self, version: int, top: dict[str, pl.UID],
+                      objects: t.Union[t.Sequence[t.Any], dict[pl.UID, t.Any]]) -> None:
+        self.version = version
+        self.top = top
+        if isinstance(objects, dict):
+            self.objects = objects
+        else:
+            self.objects = {pl.UID(i): o for i, o in enumerate(objects)}
+
+    @staticmethod
+    def _size_of(fp: t.IO) -> int:
+        try:
+            return os.fstat(fp.fileno()).st_size
+        except (AttributeError, OSError, io.UnsupportedOperation):
+            position = fp.tell()
+            size = fp.seek(0, os.SEEK_END)
+            fp.seek(position)
+            return size
+
+    @staticmethod
+    def _is_binary(fp: t.IO) -> bool:
+        header = fp.read(len(BPLIST_MAGIC))
+        fp.seek(0)
+        return header == BPLIST_MAGIC
+
+    def _load_lazy(self, fp: t.IO, zero_copy: bool, budget: t.Optional[Budget] = None) -> None:
+        plist = LazyBinaryPlist(fp, zero_copy=zero_copy, budget=budget)
+        top_refs = plist.read_dict_refs(plist.top_object)
+
+        self.version = plist.read_object(top_refs["$version"])
+        self.top = plist.read_object(top_refs["$top"])
+        self.objects = LazyObjects(plist, top_refs["$objects"])
+        if budget is not None:
+            budget.check_objects(len(self.objects))
+
+    def iter_instances(self, class_names: t.Optional[t.Iterable[str]] = None
+                       ) -> t.Iterator[tuple[pl.UID, str, dict[str, t.Any]]]:
+        """
+        Yield (uid, class name, fields) for each instance in the
+        archive, optionally only for some classes, without decoding
+        anything. Fields are as archived, so references stay UIDs.
+
+        Special NSValues are named after their type (e.g. NSPoint),
+        as the Unarchiver does.
+        """
+        wanted = set(class_names) if class_names is not None else None
+        class_names_by_uid: dict[pl.UID, str] = {}
+        objects = self.objects
+
+        for uid, entry in objects.items():
+            if not self.is_instance(entry):
+                continue
+
+            class_ref = entry["$class"]
+            class_name = class_names_by_uid.get(class_ref)
+            if class_name is None:
+                archived_class = objects[class_ref]
+                if not self.is_class(archived_class):
+                    raise ValueError(f"Instance {uid} refers to {class_ref}, which is not a class")
+                class_name = class_names_by_uid[class_ref] = archived_class["$classname"]
+
+            if class_name == "NSValue":
+                special = entry.get("NS.special", 0)
+                class_name = NSVALUE_SPECIAL_CLASS_NAMES.get(special, class_name)
+
+            if wanted is not None and class_name not in wanted:
+                continue
+
+            fields = {self.unsanitize_key(k): v for k, v in entry.items() if not self.is_key_internal(k)}
+            yield uid, class_name, fields
+
+    @staticmethod
+    def sanitize_key(key: str) -> str:
+        """
+        NSKeyedArchiver's metadata keys start with $
+        and we mustn't collide with them
+        """
+        if key.startswith("$"):
+            return "$" + key
+        return key
+
+    @staticmethod
+    def unsanitize_key(key: str) -> str:
+        """
+        Inverse of NSKeyedArchive.sanitize_key
+        """
+        if key.startswith("$"):
+            return key[1:]
+        return key
+
+    @staticmethod
+    def is_key_internal(key: str) -> bool:
+        return len(key) >= 2 and key[0] == "$" and key[1] != "$"
+
+    @staticmethod
+    def is_class(archived_object: t.Any) -> bool:
+        return isinstance(archived_object, dict) and "$classname" in archived_object
 
-        objects = as_dict["$objects"]
-        self.objects = {pl.UID(i): o for i, o in enumerate(objects)}
+    @staticmethod
+    def is_instance(archived_object: t.Any) -> bool:
+        return isinstance(archived_object, dict) and "$class" in archived_object
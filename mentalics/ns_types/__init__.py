@@ -1,4 +1,5 @@
 from .ns_array import NSArray
+from .ns_data import NSData
 from .ns_dictionary import NSDictionary
 from .ns_image import NSImage
 from .ns_mutable_array import NSMutableArray
@@ -9,6 +10,7 @@ from .ns_size import NSSize
 
 NS_TYPES = {
     "NSArray": NSArray,
+    "NSData": NSData,
     "NSDictionary": NSDictionary,
     "NSImage": NSImage,
     "NSMutableArray": NSMutableArray,
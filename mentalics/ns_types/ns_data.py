@@ -1,3 +1,4 @@
+import typing as t
 from dataclasses import dataclass
 
 from ..nscoding import NSCoding
@@ -5,17 +6,39 @@ from ..nscoding import NSCoding
 
 @dataclass
 class NSData(NSCoding):
-    data: bytes
+    """
+    data may be a memoryview into the archive's file
+    (see Unarchiver's zero_copy), so it is only copied
+    when asked for with bytes(obj)
+    """
+
+    __slots__ = ("data",)
+
+    data: t.Union[bytes, bytearray, memoryview]
 
     def __init_from_archive__(self, decoder) -> "NSCoding":
-        data: bytes = decoder.decode("NS.data")
+        data: t.Union[bytes, memoryview] = decoder.decode("NS.data")
         return self.__init__(data)
 
     def encode_archive(self, coder) -> None:
-        pass
+        coder.encode(self.data, for_key="NS.data")
+
+    def view(self) -> memoryview:
+        """
+        The data, without copying it
+        """
+        return memoryview(self.data)
 
     def __bytes__(self):
-        return self.data
+        # bytes() of bytes is not a copy
+        return bytes(self.data)
+
+    def __len__(self):
+        return len(self.data)
+
+    def __bool__(self):
+        # Truthy even when empty, as it was before __len__
+        return True
 
     def __repr__(self):
         return object.__repr__(self)
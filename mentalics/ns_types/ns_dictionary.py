@@ -2,10 +2,18 @@ from ..nscoding import NSCoding
 
 
 class NSDictionary(NSCoding, dict):
+    __slots__ = ()
+
     def __init_from_archive__(self, decoder) -> "NSCoding":
         keys: list = decoder.decode("NS.keys")
         values: list = decoder.decode("NS.objects")
-        return self.__init__(zip(keys, values))
+        if len(keys) != len(values):
+            raise ValueError(f"NSDictionary has {len(keys)} keys but {len(values)} values")
+        # Cleared first, in case it is decoded again (see Unarchiver.redecode)
+        self.clear()
+        self.update(zip(keys, values))
+        return self
 
     def encode_archive(self, coder) -> None:
-        pass
+        coder.encode(list(self.keys()), for_key="NS.keys")
+        coder.encode(list(self.values()), for_key="NS.objects")
@@ -6,6 +6,8 @@ import typing as t
 
 @dataclass
 class NSImage(NSCoding):
+    __slots__ = ("accessibility_description", "color", "image_flags", "reps", "resizing_mode")
+
     accessibility_description: str
     color: t.Any  # eventually: another class
     image_flags: int
@@ -27,4 +29,8 @@ class NSImage(NSCoding):
             )
 
     def encode_archive(self, coder) -> None:
-        pass
+        coder.encode(self.accessibility_description, for_key="NSAccessibilityDescription")
+        coder.encode(self.color, for_key="NSColor")
+        coder.encode(self.image_flags, for_key="NSImageFlags")
+        coder.encode(self.reps, for_key="NSReps")
+        coder.encode(self.resizing_mode, for_key="NSResizingMode")
@@ -3,4 +3,4 @@ from ..nscoding import NSCoding
 
 
 class NSMutableArray(NSArray):
-    pass
+    __slots__ = ()
@@ -3,4 +3,13 @@ from ..nscoding import NSCoding
 
 
 class NSMutableData(NSData):
-    pass
+    __slots__ = ()
+
+    def make_mutable(self) -> bytearray:
+        """
+        Copy the data into a bytearray (if it is not
+        one already), so it can be changed in place
+        """
+        if not isinstance(self.data, bytearray):
+            self.data = bytearray(self.data)
+        return self.data
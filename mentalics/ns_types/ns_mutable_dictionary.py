@@ -3,4 +3,4 @@ from .ns_dictionary import NSDictionary
 
 
 class NSMutableDictionary(NSDictionary):
-    pass
+    __slots__ = ()
@@ -1,23 +1,27 @@
 from dataclasses import dataclass
 
-from ..nscoding import NSCoding
+from .ns_value import Number, format_pair, parse_pair
+from ..nscoding import NSCoding, ValueNSCoding
 
 
-@dataclass
-class NSPoint(NSCoding):
-    x: int
-    y: int
+@dataclass(frozen=True)
+class NSPoint(ValueNSCoding):
+    __slots__ = ("x", "y")
+
+    x: Number
+    y: Number
 
     def __init_from_archive__(self, decoder) -> "NSCoding":
         # NSPoint is stored as an NSValue with NS.pointval -> "{x, y}"
-        as_string: str = decoder.decode("NS.pointval")
-
-        values_as_strings: list[str] = as_string.lstrip("{").rstrip("}").split(", ")
-        values = [int(x) for x in values_as_strings]
+        x, y = parse_pair(decoder.decode("NS.pointval"))
+        object.__setattr__(self, "x", x)  # frozen
+        object.__setattr__(self, "y", y)
+        return self
 
-        assert len(values) == 2
-        x, y = values
-        return self.__init__(x, y)
+    def __reduce__(self):
+        # Frozen slots can't be set by the default unpickling
+        return self.__class__, (self.x, self.y)
 
     def encode_archive(self, coder) -> None:
-        pass
+        # NS.special is written by the archiver
+        coder.encode_inline(format_pair(self.x, self.y), for_key="NS.pointval")
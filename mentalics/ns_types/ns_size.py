@@ -1,23 +1,27 @@
 from dataclasses import dataclass
 
-from ..nscoding import NSCoding
+from .ns_value import Number, format_pair, parse_pair
+from ..nscoding import NSCoding, ValueNSCoding
 
 
-@dataclass
-class NSSize(NSCoding):
-    width: int
-    height: int
+@dataclass(frozen=True)
+class NSSize(ValueNSCoding):
+    __slots__ = ("width", "height")
+
+    width: Number
+    height: Number
 
     def __init_from_archive__(self, decoder) -> "NSCoding":
-        # NSSize is stored as an NSValue with NS.sizeval -> "{x, y}"
-        as_string: str = decoder.decode("NS.sizeval")
-        
-        values_as_strings: list[str] = as_string.lstrip("{").rstrip("}").split(", ")
-        values = [int(x) for x in values_as_strings]
+        # NSSize is stored as an NSValue with NS.sizeval -> "{w, h}"
+        width, height = parse_pair(decoder.decode("NS.sizeval"))
+        object.__setattr__(self, "width", width)  # frozen
+        object.__setattr__(self, "height", height)
+        return self
 
-        assert len(values) == 2
-        x, y = values
-        return self.__init__(x, y)
+    def __reduce__(self):
+        # Frozen slots can't be set by the default unpickling
+        return self.__class__, (self.width, self.height)
 
     def encode_archive(self, coder) -> None:
-        pass
+        # NS.special is written by the archiver
+        coder.encode_inline(format_pair(self.width, self.height), for_key="NS.sizeval")
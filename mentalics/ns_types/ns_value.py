@@ -0,0 +1,36 @@
+"""
+NSValues of Obj-C structs (e.g. NSPoint) are archived
+as strings, as written by NSStringFromPoint: "{x, y}"
+"""
+import typing as t
+
+Number = t.Union[int, float]
+
+
+def _parse_number(string: str) -> Number:
+    # int() and float() both ignore surrounding whitespace
+    try:
+        return int(string)
+    except ValueError:
+        return float(string)
+
+
+def parse_pair(string: str) -> tuple[Number, Number]:
+    if string[:1] != "{" or string[-1:] != "}":
+        raise ValueError(f"Not an archived pair of numbers: {string!r}")
+
+    first, second = string[1:-1].split(",")
+    try:
+        return int(first), int(second)  # usually
+    except ValueError:
+        return _parse_number(first), _parse_number(second)
+
+
+def _format_number(number: Number) -> str:
+    if isinstance(number, float) and number.is_integer():
+        return str(int(number))
+    return str(number)
+
+
+def format_pair(first: Number, second: Number) -> str:
+    return f"{{{_format_number(first)}, {_format_number(second)}}}"
@@ -1,13 +1,14 @@
 import typing as t
 
 if t.TYPE_CHECKING:
+    from .archiver import Archiver
     from .unarchiver import Unarchiver
 
 
 class NSCoding:
     """
     Indicates that a class can be encoded/decoded
-    by Archiver/Dearchiver
+    by Archiver/Unarchiver
 
     Example usage:
 
@@ -19,16 +20,31 @@ class NSCoding:
 
         def encode_archive(self, archiver) -> None:
             super().encode_archive(archiver)
-            archiver.encode("myAttr", self.myAttr)
+            archiver.encode(self.my_attr, for_key="myAttr")
     """
 
+    # Lets subclasses define __slots__ without
+    # getting an instance __dict__ anyway
+    __slots__ = ()
+
     def __init_from_archive__(self, decoder: "Unarchiver") -> "NSCoding":
         return self
 
-    def encode_archive(self, coder) -> None:
+    def encode_archive(self, coder: "Archiver") -> None:
         return
 
 
+class ValueNSCoding(NSCoding):
+    """
+    Immutable, hashable values (e.g. NSPoint) that
+    reference no other objects. With an intern pool,
+    the unarchiver initializes them as soon as they
+    are referenced, so equal values can be shared.
+    """
+
+    __slots__ = ()
+
+
 class AutoNSCoding(NSCoding):
     """
     Automatically add NSCoding support to classes.
@@ -39,11 +55,18 @@ class AutoNSCoding(NSCoding):
     class MyClass(AutoNSCoding):
         myData: int
     ```
+
+    This decodes every key generically: for speed, generate
+    fixed-key classes with mentalics.codegen instead.
     """
 
+    __slots__ = ()
+
     def __init_from_archive__(self, decoder: "Unarchiver") -> "NSCoding":
         keys = decoder._current_undecoded_keys
         self.__init__(**{key: decoder.decode(key) for key in keys})
+        return self
 
-    def encode_archive(self, coder) -> None:
-        return
+    def encode_archive(self, coder: "Archiver") -> None:
+        for key, value in vars(self).items():
+            coder.encode(value, for_key=key)
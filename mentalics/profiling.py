@@ -0,0 +1,112 @@
+import json
+import typing as t
+from dataclasses import asdict, dataclass
+
+# Queue depth is sampled every so many objects,
+# twice as rarely each time there are too many samples
+DEFAULT_SAMPLE_EVERY = 1000
+MAX_QUEUE_SAMPLES = 4096
+
+# Rough sizes of archived values, for source_bytes
+REFERENCE_SIZE = 8
+SCALAR_SIZE = 8
+
+ROOT_FRAME = "Unarchiver.decode"
+
+
+def _approximate_size(archived_obj: dict) -> int:
+    size = 0
+    for key, value in archived_obj.items():
+        size += len(key)
+        if isinstance(value, (str, bytes, bytearray, memoryview)):
+            size += len(value)
+        elif isinstance(value, list):
+            size += REFERENCE_SIZE * len(value)
+        else:
+            size += SCALAR_SIZE
+    return size
+
+
+@dataclass
+class ClassProfile:
+    instance_count: int = 0
+    # Only in __init_from_archive__: objects it references
+    # are initialized (and timed) separately, even values
+    # initialized within it (see Unarchiver._decode_value)
+    init_ns: int = 0
+    # Estimated from the archived objects' own
+    # keys and values, not what they reference
+    source_bytes: int = 0
+
+    @property
+    def init_seconds(self) -> float:
+        return self.init_ns / 1e9
+
+
+class DecodeProfiler:
+    """
+    Records where an Unarchiver spends its time, per
+    archived class name (NSValues by type, e.g. NSPoint):
+
+    ```
+    profiler = DecodeProfiler()
+    unarchiver = Unarchiver(file, profiler=profiler)
+    unarchiver.decode()
+
+    print(profiler.to_json())
+    open("decode.folded", "w").write(profiler.folded())  # for flamegraph.pl
+    ```
+
+    The length of the queue of objects waiting to be
+    initialized is also sampled as decoding goes.
+    A profiler can be shared by several unarchivers.
+    """
+
+    classes: dict[str, ClassProfile]
+    # (objects initialized so far, objects waiting)
+    queue_depths: list[tuple[int, int]]
+    sample_every: int
+
+    _objects_initialized: int
+
+    def __init__(self, sample_every: int = DEFAULT_SAMPLE_EVERY):
+        self.classes = {}
+        self.queue_depths = []
+        self.sample_every = sample_every
+        self._objects_initialized = 0
+
+    def record(self, class_name: str, init_ns: int, archived_obj: dict) -> None:
+        profile = self.classes.get(class_name)
+        if profile is None:
+            profile = self.classes[class_name] = ClassProfile()
+        profile.instance_count += 1
+        profile.init_ns += init_ns
+        profile.source_bytes += _approximate_size(archived_obj)
+
+    def sample_queue(self, queue_depth: int) -> None:
+        self._objects_initialized += 1
+        if self._objects_initialized % self.sample_every:
+            return
+
+        self.queue_depths.append((self._objects_initialized, queue_depth))
+        if len(self.queue_depths) >= MAX_QUEUE_SAMPLES:
+            self.queue_depths = self.queue_depths[1::2]
+            self.sample_every *= 2
+
+    def as_dict(self) -> dict[str, t.Any]:
+        return {
+            "classes": {name: asdict(profile) for name, profile in self.classes.items()},
+            "queue_depths": [list(sample) for sample in self.queue_depths],
+            }
+
+    def to_json(self, **kwargs) -> str:
+        return json.dumps(self.as_dict(), **kwargs)
+
+    def folded(self) -> str:
+        """
+        Time per class in the folded stack format read by
+        flamegraph.pl, speedscope etc., in microseconds
+        """
+        lines = [f"{ROOT_FRAME};{name} {profile.init_ns // 1000}"
+                 for name, profile in sorted(self.classes.items())]
+        return "\n".join(lines) + "\n"
@@ -1,18 +1,72 @@
 import typing as t
 import plistlib as pl
 from collections import deque
+from time import perf_counter_ns
 from copy import copy
 from functools import wraps
 from queue import Queue
 from warnings import warn
 
-from .ns_keyed_archive import NSKeyedArchive
+from .ns_keyed_archive import NSKeyedArchive, NSVALUE_SPECIAL_CLASS_NAMES
 from .ns_types import NS_TYPES
-from .nscoding import NSCoding
+from .interning import InternPool
+from .limits import Budget, Limits
+from .nscoding import NSCoding, ValueNSCoding
+from .profiling import DecodeProfiler
 
 NULL_UID = pl.UID(0)
 ARCHIVE_VERSION = 100_000
 
+# Most classes are always archived with the same keys,
+# but some (e.g. NSValue) have a few shapes
+MAX_LAYOUTS_PER_CLASS = 8
+
+# Entries of $objects that decode to themselves
+# (apart from strings, which may be interned)
+_INLINE_TYPES = frozenset((int, float, bool, bytes, bytearray, memoryview))
+
+
+class _KeyLayout:
+    """
+    One set of keys an archived object can have,
+    with a bit assigned to each decodable key so
+    decoded keys can be tracked in a single int
+    """
+
+    __slots__ = ("all_keys", "names", "bits", "full_mask")
+
+    all_keys: frozenset[str]  # as archived, including internal keys
+    names: tuple[str, ...]  # unsanitized, in bit order
+    bits: dict[str, int]  # archived key -> bit
+    full_mask: int
+
+    def __init__(self, all_keys: frozenset[str], names: tuple[str, ...], bits: dict[str, int]):
+        self.all_keys = all_keys
+        self.names = names
+        self.bits = bits
+        self.full_mask = (1 << len(names)) - 1
+
+    def undecoded(self, decoded_mask: int) -> set[str]:
+        return {name for i, name in enumerate(self.names) if not decoded_mask & (1 << i)}
+
+
+class _DecodePlan:
+    """
+    Everything the unarchiver needs to know about the
+    instances of one archived class, compiled once per $class
+    """
+
+    __slots__ = ("class_name", "cls", "layouts")
+
+    class_name: str
+    cls: t.Optional[type[NSCoding]]  # None if it depends on the instance
+    layouts: list[_KeyLayout]
+
+    def __init__(self, class_name: str, cls: t.Optional[type[NSCoding]]):
+        self.class_name = class_name
+        self.cls = cls
+        self.layouts = []
+
 
 class Unarchiver:
     """
@@ -25,17 +79,42 @@ class Unarchiver:
 
     unarchiver.decode()
     ```
+
+    Pass lazy=True to memory-map binary archives and
+    only parse the objects that are actually decoded,
+    and zero_copy=True as well to leave data (e.g. NSData)
+    in the file rather than copying it into memory
+    (zero_copy without lazy raises ValueError).
+
+    Pass a profiling.DecodeProfiler to find out
+    which classes take the time, and an InternPool
+    to share strings and values (see ValueNSCoding)
+    between the objects of many archives.
+
+    Pass Limits to read untrusted archives: the archive
+    is read, and its lists and instances decoded, within
+    them, and LimitExceeded is raised as soon as one
+    is exceeded.
     """
 
     _archive: NSKeyedArchive
     _objects: dict[pl.UID, NSCoding]
     _class_map: dict[str, type[NSCoding]]
 
+    _plans: dict[pl.UID, _DecodePlan]
+    _nsvalue_classes: dict[int, type[NSCoding]]
+
     _current_container_stack: deque[dict[str, t.Any]]
-    _keys_to_decode_stack: deque[set[str]]
-    _decode_later_queue: deque[tuple[dict, NSCoding]]
+    _layout_stack: deque[_KeyLayout]
+    _decoded_mask_stack: deque[int]
+    _decode_later_queue: deque[tuple[dict, NSCoding, _DecodePlan]]
 
     _error_on_ignored_attributes: bool
+    _profiler: t.Optional[DecodeProfiler]
+    _inline_init_ns: int  # values initialized within other objects' init
+    _intern_pool: t.Optional[InternPool]
+    _limits: t.Optional[Limits]
+    _budget: t.Optional[Budget]
 
     @property
     def _at_top_level(self):
@@ -49,26 +128,40 @@ class Unarchiver:
 
     @property
     def _current_undecoded_keys(self) -> set[str]:
-        return self._keys_to_decode_stack[-1]
-
-    @_current_undecoded_keys.setter
-    def _current_undecoded_keys(self, value) -> None:
-        self._keys_to_decode_stack[-1] = value
-
-    def __init__(self, fp: t.IO, class_map: t.Optional[dict[str, type[NSCoding]]] = None,
-                 error_on_ignored_attributes: bool = True):
-        self._archive = NSKeyedArchive(fp)
+        return self._layout_stack[-1].undecoded(self._decoded_mask_stack[-1])
+
+    def __init__(self, fp: t.Union[t.IO, NSKeyedArchive], class_map: t.Optional[dict[str, type[NSCoding]]] = None,
+                 error_on_ignored_attributes: bool = True, lazy: bool = False, zero_copy: bool = False,
+                 profiler: t.Optional[DecodeProfiler] = None, intern_pool: t.Optional[InternPool] = None,
+                 limits: t.Optional[Limits] = None):
+        self._limits = limits
+        # Reading the archive counts towards the deadline too
+        self._budget = limits.start() if limits is not None else None
+        # An already loaded archive can be decoded again
+        if isinstance(fp, NSKeyedArchive):
+            self._archive = fp
+            if self._budget is not None:
+                self._budget.check_objects(len(fp.objects))
+        else:
+            self._archive = NSKeyedArchive(fp, lazy=lazy, zero_copy=zero_copy, limits=self._budget)
         assert self._archive.version == ARCHIVE_VERSION
         self._objects = {}
         self._class_map = class_map if class_map is not None else copy(NS_TYPES)
+        self._plans = {}
+        self._nsvalue_classes = {}
 
         self._current_container_stack = deque()
-        self._keys_to_decode_stack = deque()
-        self._push_container(self._archive.top)
+        self._layout_stack = deque()
+        self._decoded_mask_stack = deque()
+        top = self._archive.top
+        self._push_container(top, self._compile_layout(top))
 
         self._decode_later_queue = deque()
 
         self._error_on_ignored_attributes = error_on_ignored_attributes
+        self._profiler = profiler
+        self._inline_init_ns = 0
+        self._intern_pool = intern_pool
 
     def decode(self, key: t.Optional[str] = None):
         container = self._current_container
@@ -85,7 +178,7 @@ class Unarchiver:
         if key not in container:
             raise ValueError(f"Key {key} not found on the current object")
 
-        self._current_undecoded_keys = self._current_undecoded_keys.difference({key})
+        self._decoded_mask_stack[-1] |= self._layout_stack[-1].bits.get(key, 0)
 
         archived_obj = container[key]
 
@@ -93,93 +186,273 @@ class Unarchiver:
 
         if self._at_top_level:
             self._finish_decoding()
+            if self._budget is not None:
+                self._budget.check_deadline()
         return obj
 
+    def contains_value(self, key: str) -> bool:
+        """
+        Whether the object currently being
+        decoded was archived with a key
+        """
+        return self._sanitize_key(key) in self._current_container
+
+    def decode_path(self, *path: t.Union[str, int]):
+        """
+        Decode only the object at the end of a key path,
+        and the objects it references:
+
+        ```
+        unarchiver.decode_path("root", "cues", 3, "fileTarget")
+        ```
+
+        Strings look up keys on an object (or on an NSDictionary),
+        and integers index into an NSArray or a list.
+        """
+        if not self._at_top_level:
+            raise ValueError("decode_path can only be called at the top level")
+
+        archived_obj = self._archive.top
+        for component in path:
+            archived_obj = self._step_into(archived_obj, component)
+
+        obj = self._decode(archived_obj)
+        self._finish_decoding()
+        return obj
+
+    def _step_into(self, archived_obj: t.Any, component: t.Union[str, int]) -> t.Any:
+        """
+        Follow one component of a key path
+        without decoding anything
+        """
+        if isinstance(archived_obj, pl.UID):
+            if archived_obj == NULL_UID:
+                raise ValueError(f"Cannot look up {component!r} on nil")
+            archived_obj = self._archive.objects[archived_obj]
+
+        if isinstance(component, int):
+            if self._is_instance(archived_obj) and "NS.objects" in archived_obj:
+                archived_obj = archived_obj["NS.objects"]
+            if not isinstance(archived_obj, list):
+                raise ValueError(f"Cannot index {component!r} into {archived_obj!r}")
+            if not -len(archived_obj) <= component < len(archived_obj):
+                raise ValueError(f"Index {component!r} out of range for {len(archived_obj)} elements")
+            return archived_obj[component]
+
+        if not isinstance(archived_obj, dict):
+            raise ValueError(f"Cannot look up {component!r} on {archived_obj!r}")
+
+        key = self._sanitize_key(component)
+        if key in archived_obj:
+            return archived_obj[key]
+
+        if self._is_instance(archived_obj) and "NS.keys" in archived_obj:
+            # An NSDictionary: find the key among its (archived) keys
+            for archived_key, value in zip(archived_obj["NS.keys"], archived_obj["NS.objects"]):
+                if isinstance(archived_key, pl.UID):
+                    archived_key = self._archive.objects[archived_key]
+                if archived_key == component:
+                    return value
+
+        raise ValueError(f"Key {component!r} not found on {archived_obj!r}")
+
     def _decode(self, archived_object: t.Any):
-        # A separate class so it can be called recursively when decoding a list
         if not isinstance(archived_object, pl.UID):  # NOT a reference: some pre-determined type
             return self._decode_non_reference(archived_object)
         else:
             return self._decode_reference(archived_object)
 
     def _decode_non_reference(self, archived_object: t.Any):
-        if isinstance(archived_object, list):
-            return [self._decode(o) for o in archived_object]
+        if not isinstance(archived_object, list):
+            return archived_object
+        return self._decode_list(archived_object)
 
-        return archived_object
+    def _decode_list(self, archived_list: list) -> list:
+        """
+        Decode a list (e.g. an NSArray's NS.objects) in one pass.
+        Each reference is looked up in the decoded objects once,
+        and references to strings and other plist values are
+        resolved inline: only new instances go through
+        _decode_archived
+        """
+        objects_get = self._objects.get
+        archived_objects = self._archive.objects
+        decode_archived = self._decode_archived
+        intern = self._intern_pool.intern if self._intern_pool is not None else None
+        if self._budget is not None:
+            self._budget.check_list(len(archived_list))
+
+        decoded = []
+        append = decoded.append
+        for element in archived_list:
+            if element.__class__ is pl.UID:
+                obj = objects_get(element)
+                if obj is None:
+                    if not element.data:  # $null
+                        append(None)
+                        continue
+                    archived = archived_objects[element]
+                    if archived.__class__ is str:
+                        obj = archived if intern is None else intern(archived)
+                    elif archived.__class__ in _INLINE_TYPES:
+                        obj = archived
+                    else:
+                        obj = decode_archived(element, archived)
+                append(obj)
+            elif element.__class__ is list:
+                append(self._decode_nested_list(element))
+            else:
+                append(element)
+        return decoded
+
+    def _decode_nested_list(self, archived_list: list) -> list:
+        # Lists can be nested arbitrarily deep, so they are
+        # walked with an explicit stack rather than recursion.
+        # Referenced objects are never followed from here:
+        # they are queued, see _finish_decoding
+        decode_reference = self._decode_reference
+        if self._budget is not None:
+            self._budget.check_list(len(archived_list))
+        decoded = []
+        # (remaining archived elements, decoded list) of each
+        # list being decoded, innermost last
+        stack = [(iter(archived_list), decoded)]
+        while stack:
+            elements, decoded_list = stack[-1]
+            append = decoded_list.append
+            for element in elements:
+                if isinstance(element, pl.UID):
+                    append(decode_reference(element))
+                elif isinstance(element, list):
+                    if not any(isinstance(e, list) for e in element):
+                        # Most nested lists are flat: no need to stack them
+                        append(self._decode_list(element))
+                        continue
+
+                    # Decode the nested list first, then
+                    # carry on with this one where we left off
+                    if self._budget is not None:
+                        self._budget.check_list(len(element))
+                        self._budget.check_depth(len(stack) + 1)
+                    nested = []
+                    append(nested)
+                    stack.append((iter(element), nested))
+                    break
+                else:
+                    append(element)
+            else:
+                stack.pop()
+
+        return decoded
 
     def _decode_reference(self, ref: pl.UID):
         """
         Take a reference to another object (a UID) and return
         the appropriate type
         """
-        if ref == NULL_UID:
+        # Compared by data rather than == NULL_UID, and
+        # looked up once: UIDs hash and compare in Python
+        if not ref.data:
             return None
 
-        if ref in self._objects:
-            return self._objects[ref]
+        obj = self._objects.get(ref)
+        if obj is not None:
+            return obj
 
-        archived_object = self._archive.objects[ref]
+        return self._decode_archived(ref, self._archive.objects[ref])
 
+    def _decode_archived(self, ref: pl.UID, archived_object: t.Any):
+        """
+        Decode the archived object at ref, which
+        hasn't been decoded yet
+        """
         if self._is_class(archived_object):
             raise ValueError("Cannot deserialize a class as an object")
 
         if self._is_instance(archived_object):
+            if self._budget is not None:
+                self._budget.tick()
             # Make an instance of the class, and decode it later
-            cls = self._class_of(archived_object)
+            plan = self._plan_of(archived_object)
+            cls = plan.cls or self._class_of(archived_object)
+            if self._intern_pool is not None and issubclass(cls, ValueNSCoding):
+                obj = self._objects[ref] = self._decode_value(archived_object, cls, plan)
+                return obj
+
             obj = cls.__new__(cls)  # We don't initialize because it may have circular references
             self._objects[ref] = obj
-            self._decode_later(archived_object, obj)
+            self._decode_later(archived_object, obj, plan)
             return obj
 
         # Otherwise, it is instantiated by plistlib
+        if self._intern_pool is not None and isinstance(archived_object, str):
+            return self._intern_pool.intern(archived_object)
         return archived_object
 
-    @staticmethod
-    def _sanitize_key(key: str) -> str:
-        """
-        NSKeyedArchiver's metadata keys start with $
-        and we mustn't collide with them
-        """
-        if key.startswith("$"):
-            return "$" + key
-        return key
-
-    @staticmethod
-    def _unsanitize_key(key: str) -> str:
+    def _decode_value(self, archived_object: dict, cls: type[NSCoding], plan: _DecodePlan) -> NSCoding:
         """
-        Inverse of NSKeyedUnarchiver._sanitize_key
+        Values reference no other objects, so they can be
+        initialized straight away, and swapped for an
+        equal value that is already in the intern pool
         """
-        if key.startswith("$"):
-            return key[1:]
-        return key
-
-    @staticmethod
-    def _is_key_internal(key: str) -> bool:
-        return len(key) >= 2 and key[0] == "$" and key[1] != "$"
+        obj = cls.__new__(cls)
+        self._push_container(archived_object, self._layout_of(plan, archived_object))
+        if self._profiler is None:
+            obj.__init_from_archive__(self)
+        else:
+            # Recorded as _finish_decoding_profiled does
+            # for the objects that go through the queue
+            start = perf_counter_ns()
+            obj.__init_from_archive__(self)
+            init_ns = perf_counter_ns() - start
+            # Left out of the init_ns of the object decoding it
+            self._inline_init_ns += init_ns
+            class_name = plan.class_name if plan.cls is not None else self._special_class_of_nsvalue(archived_object)
+            self._profiler.record(class_name, init_ns, archived_object)
+            self._profiler.sample_queue(len(self._decode_later_queue))
+        self._pop_container()
+        return self._intern_pool.intern(obj)
+
+    # The archive format's conventions, shared with NSKeyedArchive
+    _sanitize_key = staticmethod(NSKeyedArchive.sanitize_key)
+    _unsanitize_key = staticmethod(NSKeyedArchive.unsanitize_key)
+    _is_key_internal = staticmethod(NSKeyedArchive.is_key_internal)
+    _is_class = staticmethod(NSKeyedArchive.is_class)
+    _is_instance = staticmethod(NSKeyedArchive.is_instance)
 
-    @staticmethod
-    def _is_class(archived_object: t.Any):
-        return isinstance(archived_object, dict) and "$classname" in archived_object
+    def _class_of(self, archived_instance: dict):
+        plan = self._plan_of(archived_instance)
+        if plan.cls is not None:
+            return plan.cls
+
+        # NSValue
+        special = archived_instance.get("NS.special", 0)
+        cls = self._nsvalue_classes.get(special)
+        if cls is None:
+            cls = self._nsvalue_classes[special] = self._resolve_class(self._special_class_of_nsvalue(archived_instance))
+        return cls
+
+    def _resolve_class(self, class_name: str) -> type[NSCoding]:
+        if class_name not in self._class_map:
+            raise ValueError(f"Class {class_name} not set on unarchiver")
 
-    @staticmethod
-    def _is_instance(archived_object: t.Any):
-        return isinstance(archived_object, dict) and "$class" in archived_object
+        return self._class_map[class_name]
 
-    def _class_of(self, archived_instance: dict):
+    def _plan_of(self, archived_instance: dict) -> _DecodePlan:
         assert self._is_instance(archived_instance)
         archived_class_ref = archived_instance["$class"]
-        archived_class = self._archive.objects[archived_class_ref]
-        assert self._is_class(archived_class)
-        class_name = archived_class["$classname"]
 
-        if class_name == "NSValue":
-            class_name = self._special_class_of_nsvalue(archived_instance)
+        plan = self._plans.get(archived_class_ref)
+        if plan is None:
+            archived_class = self._archive.objects[archived_class_ref]
+            assert self._is_class(archived_class)
+            class_name = archived_class["$classname"]
 
-        if class_name not in self._class_map:
-            raise ValueError(f"Class {class_name} not set on unarchiver")
+            # NSValues are resolved per instance
+            cls = None if class_name == "NSValue" else self._resolve_class(class_name)
+            plan = self._plans[archived_class_ref] = _DecodePlan(class_name, cls)
 
-        return self._class_map[class_name]
+        return plan
 
     def _special_class_of_nsvalue(self, archived_instance: dict) -> str:
         """
@@ -187,38 +460,198 @@ class Unarchiver:
         are archived as "special" NSValues. In order to provide a
         more natural interface here, we look them up specially.
         """
-        special = archived_instance["NS.special"]
+        special = archived_instance.get("NS.special", 0)
+
+        if special not in NSVALUE_SPECIAL_CLASS_NAMES:
+            raise ValueError(f"Unknown NSValue type {special}")
+
+        return NSVALUE_SPECIAL_CLASS_NAMES[special]
+
+    def unresolved_class_names(self) -> set[str]:
+        """
+        Find every class used in the archive that
+        has no class set on the unarchiver, in a single
+        pass and without decoding anything
+        """
+        class_names: dict[pl.UID, str] = {}
+        # ($class, NS.special) of every instance. Small,
+        # since it is one entry per class (and NSValue type)
+        instance_kinds: set[tuple[pl.UID, t.Optional[int]]] = set()
+
+        for uid, entry in self._archive.objects.items():
+            if self._is_class(entry):
+                class_names[uid] = entry["$classname"]
+            elif self._is_instance(entry):
+                instance_kinds.add((entry["$class"], entry.get("NS.special")))
+
+        unresolved = set()
+        for class_ref, special in instance_kinds:
+            class_name = class_names.get(class_ref)
+            if class_name is None:
+                raise ValueError(f"Instance refers to {class_ref}, which is not a class")
 
-        special_class_names = {
-            0: "NSValue",
-            1: "NSPoint",
-            2: "NSSize",
-            # other types?
-            }
+            if class_name == "NSValue":
+                special = special or 0
+                class_name = NSVALUE_SPECIAL_CLASS_NAMES.get(special, f"NSValue (NS.special={special})")
 
-        return special_class_names[special]
+            if class_name not in self._class_map:
+                unresolved.add(class_name)
 
-    def _decode_later(self, archived_obj: dict, obj: NSCoding):
-        self._decode_later_queue.append((archived_obj, obj))
+        return unresolved
 
-    def _push_container(self, container: dict):
+    def check_classes(self) -> None:
+        """
+        Raise before decoding if any class in
+        the archive has no class set
+        """
+        unresolved = self.unresolved_class_names()
+        if unresolved:
+            raise ValueError(f"Classes {sorted(unresolved)} not set on unarchiver")
+
+    def redecode(self, fp: t.Union[t.IO, NSKeyedArchive], lazy: bool = False) -> "Unarchiver":
+        """
+        Unarchive a new version of this archive (e.g. the
+        file saved again), reusing the objects decoded here:
+
+        ```
+        unarchiver = previous.redecode(file)
+        root = unarchiver.decode()
+        ```
+
+        Objects are matched by UID. Objects whose archived
+        entries are unchanged are reused as they are, and
+        changed ones are initialized again in place, so
+        references to them stay valid. Objects that can't be
+        changed in place (e.g. a string, a value or an object of
+        another class) are replaced, and the objects that
+        reference them are initialized again.
+
+        The objects decoded here are changed, so this
+        unarchiver shouldn't be used afterwards.
+        """
+        if not self._at_top_level:
+            raise ValueError("redecode can only be called at the top level")
+
+        unarchiver = Unarchiver(fp, class_map=copy(self._class_map),
+                                error_on_ignored_attributes=self._error_on_ignored_attributes, lazy=lazy,
+                                profiler=self._profiler, intern_pool=self._intern_pool, limits=self._limits)
+        old_entries = self._archive.objects
+        new_entries = unarchiver._archive.objects
+
+        changed = set()
+        changed_classes = set()
+        for uid, entry in new_entries.items():
+            if old_entries.get(uid) != entry:
+                changed.add(uid)
+                if self._is_class(entry):
+                    changed_classes.add(uid)
+
+        # UIDs of objects that are replaced, whose
+        # referrers must be initialized again
+        replaced = [uid for uid in changed if uid not in self._objects]
+        reinitialized = set()
+
+        for uid, obj in self._objects.items():
+            entry = new_entries.get(uid)
+            if entry is None:
+                continue  # no longer in the archive
+
+            unchanged = uid not in changed and not (self._is_instance(entry) and entry["$class"] in changed_classes)
+            if unchanged:
+                unarchiver._objects[uid] = obj
+            elif self._can_reinitialize(unarchiver, obj, entry):
+                unarchiver._objects[uid] = obj
+                unarchiver._reinitialize(uid, obj, entry)
+                reinitialized.add(uid)
+            else:
+                replaced.append(uid)
+
+        if replaced:
+            referrers = unarchiver._referrers()
+            while replaced:
+                for referrer in referrers.get(replaced.pop(), ()):
+                    obj = unarchiver._objects.get(referrer)
+                    if obj is None or referrer in reinitialized:
+                        continue  # decoded afresh, or already done
+                    if self._can_reinitialize(unarchiver, obj, new_entries[referrer]):
+                        unarchiver._reinitialize(referrer, obj, new_entries[referrer])
+                        reinitialized.add(referrer)
+                    else:
+                        del unarchiver._objects[referrer]
+                        replaced.append(referrer)
+
+        return unarchiver
+
+    @staticmethod
+    def _can_reinitialize(unarchiver: "Unarchiver", obj: NSCoding, entry: t.Any) -> bool:
+        if not unarchiver._is_instance(entry) or isinstance(obj, ValueNSCoding):
+            return False
+        return type(obj) is unarchiver._class_of(entry)
+
+    def _reinitialize(self, uid: pl.UID, obj: NSCoding, entry: dict) -> None:
+        self._decode_later(entry, obj, self._plan_of(entry))
+
+    def _referrers(self) -> dict[pl.UID, list[pl.UID]]:
+        """
+        The UIDs of the instances that reference each UID
+        """
+        referrers: dict[pl.UID, list[pl.UID]] = {}
+        for uid, entry in self._archive.objects.items():
+            if not self._is_instance(entry):
+                continue
+            # Plain lists can be nested, so walk them with a stack
+            values = [v for k, v in entry.items() if k != "$class"]
+            while values:
+                value = values.pop()
+                if isinstance(value, pl.UID):
+                    referrers.setdefault(value, []).append(uid)
+                elif isinstance(value, list):
+                    values.extend(value)
+        return referrers
+
+    def _decode_later(self, archived_obj: dict, obj: NSCoding, plan: _DecodePlan):
+        self._decode_later_queue.append((archived_obj, obj, plan))
+
+    def _push_container(self, container: dict, layout: _KeyLayout):
         self._current_container_stack.append(container)
         # We also want to track what keys need to be decoded,
         # so we can give appropriate warnings when keys are
         # forgotten
-        self._keys_to_decode_stack.append(self._keys_to_decode(container))
+        self._layout_stack.append(layout)
+        self._decoded_mask_stack.append(0)
 
     def _pop_container(self) -> dict:
-        if self._error_on_ignored_attributes and self._current_undecoded_keys:
-            cls = self._class_of(self._current_container)
-            raise ValueError(f"Keywords of {cls} not decoded: {self._current_undecoded_keys}. Disable with error_on_ignored_attributes=False")
-
-        self._keys_to_decode_stack.pop()
-        return self._current_container_stack.pop()
-
-    def _keys_to_decode(self, container: dict) -> set[str]:
-        all_keys = set(container.keys())
-        return {self._unsanitize_key(k) for k in all_keys if not self._is_key_internal(k)}
+        layout = self._layout_stack.pop()
+        decoded_mask = self._decoded_mask_stack.pop()
+        container = self._current_container_stack.pop()
+
+        if self._error_on_ignored_attributes and decoded_mask != layout.full_mask:
+            cls = self._class_of(container)
+            raise ValueError(f"Keywords of {cls} not decoded: {layout.undecoded(decoded_mask)}. Disable with error_on_ignored_attributes=False")
+
+        return container
+
+    def _layout_of(self, plan: _DecodePlan, container: dict) -> _KeyLayout:
+        keys = container.keys()
+        for layout in plan.layouts:
+            if keys == layout.all_keys:
+                return layout
+
+        # NS.special is read by the unarchiver itself to pick an NSValue's class
+        layout = self._compile_layout(container, implicit_keys=("NS.special",) if plan.cls is None else ())
+        if len(plan.layouts) < MAX_LAYOUTS_PER_CLASS:
+            plan.layouts.append(layout)
+        return layout
+
+    def _compile_layout(self, container: dict, implicit_keys: tuple[str, ...] = ()) -> _KeyLayout:
+        names = []
+        bits = {}
+        for key in container:
+            if not self._is_key_internal(key) and key not in implicit_keys:
+                bits[key] = 1 << len(names)
+                names.append(self._unsanitize_key(key))
+
+        return _KeyLayout(frozenset(container), tuple(names), bits)
 
     def _finish_decoding(self) -> None:
         """
@@ -228,17 +661,58 @@ class Unarchiver:
         to avoid issues with circular references. This
         method reads the list of objects to decode and
         decodes all of them.
+
+        Objects are only ever initialized from here, one
+        at a time, so the call stack stays the same depth
+        however deep the object graph is.
         """
+        if self._profiler is not None:
+            # Kept separate so decoding without
+            # a profiler pays nothing for it
+            self._finish_decoding_profiled(self._profiler)
+            return
 
         while self._decode_later_queue:  # is not empty
-            archived_obj, obj = self._decode_later_queue.popleft()
+            archived_obj, obj, plan = self._decode_later_queue.popleft()
 
             # We need to note whatever container
             # is currently being de-archived so
             # that we know where to look for keys
-            self._push_container(archived_obj)
+            self._push_container(archived_obj, self._layout_of(plan, archived_obj))
+            obj.__init_from_archive__(self)
+            self._pop_container()
+
+    def _finish_decoding_profiled(self, profiler: DecodeProfiler) -> None:
+        queue = self._decode_later_queue
+        while queue:  # is not empty
+            archived_obj, obj, plan = queue.popleft()
+
+            self._push_container(archived_obj, self._layout_of(plan, archived_obj))
+            inline_init_ns = self._inline_init_ns
+            start = perf_counter_ns()
             obj.__init_from_archive__(self)
+            init_ns = perf_counter_ns() - start - (self._inline_init_ns - inline_init_ns)
             self._pop_container()
 
+            class_name = plan.class_name if plan.cls is not None else self._special_class_of_nsvalue(archived_obj)
+            profiler.record(class_name, init_ns, archived_obj)
+            profiler.sample_queue(len(queue))
+
     def set_class(self, cls: type[NSCoding], name: str):
         self._class_map[name] = cls
+
+        # Plans keep their key layouts, but re-resolve their
+        # class. NSValues' stay resolved per instance (through
+        # NS.special), so only the classes they resolve to go
+        if name != "NSValue":
+            for plan in self._plans.values():
+                if plan.class_name == name:
+                    plan.cls = cls
+        self._nsvalue_classes.clear()
+
+    def set_classes(self, classes: t.Mapping[str, type[NSCoding]]):
+        """
+        Set many classes at once, by archived class name
+        """
+        for name, cls in classes.items():
+            self.set_class(cls, name)
@@ -0,0 +1,195 @@
+import binascii
+import plistlib as pl
+import typing as t
+from datetime import datetime
+from xml.parsers.expat import ExpatError, ParserCreate
+
+from .limits import Budget
+
+READ_CHUNK_SIZE = 1 << 16
+
+XML_DATE_FORMAT = "%Y-%m-%dT%H:%M:%SZ"
+
+# Elements whose text is their value
+SCALAR_ELEMENTS = frozenset(("key", "string", "integer", "real", "data", "date"))
+
+
+class _XMLArchiveParser:
+    """
+    Builds the contents of an XML NSKeyedArchiver plist from
+    expat's events, without keeping anything but the values.
+
+    $objects is filled entry by entry straight into the
+    mapping of UIDs that NSKeyedArchive uses, references
+    (dicts of CF$UID) become pl.UIDs as soon as they are
+    closed, and equal UIDs and keys are shared.
+    """
+
+    root: t.Optional[dict]
+    objects: dict[pl.UID, t.Any]
+
+    # The open dicts and arrays, and the key each dict
+    # (or None) is waiting to be given a value for
+    _stack: list[t.Union[dict, list]]
+    _keys: list[t.Optional[str]]
+    _text: t.Optional[list[str]]  # of the open scalar element, if any
+    _uids: dict[int, pl.UID]
+    _strings: dict[str, str]
+    _budget: t.Optional[Budget]
+
+    def __init__(self, budget: t.Optional[Budget] = None):
+        self.root = None
+        self.objects = {}
+        self._stack = []
+        self._keys = []
+        self._text = None
+        self._uids = {}
+        self._strings = {}
+        self._budget = budget
+
+        self._parser = ParserCreate()
+        self._parser.buffer_text = True
+        self._parser.StartElementHandler = self._begin
+        self._parser.EndElementHandler = self._end
+        self._parser.CharacterDataHandler = self._data
+        self._parser.EntityDeclHandler = self._reject_entity
+
+    def feed(self, chunk: bytes, final: bool = False) -> None:
+        try:
+            self._parser.Parse(chunk, final)
+        except ExpatError as error:
+            # Malformed, truncated or empty
+            raise pl.InvalidFileException(f"Invalid XML plist: {error}") from error
+
+    @staticmethod
+    def _reject_entity(*args) -> None:
+        # As plistlib does, for the same reasons
+        # (expat's entity expansion vulnerabilities)
+        raise pl.InvalidFileException("XML entity declarations are not supported in plist files")
+
+    def _error(self, message: str) -> ValueError:
+        return ValueError(f"{message} at line {self._parser.CurrentLineNumber}")
+
+    def _begin(self, element: str, attrs: dict) -> None:
+        if element in SCALAR_ELEMENTS:
+            self._text = []
+        elif element == "dict":
+            self._open({})
+        elif element == "array":
+            # The root's $objects array goes straight into the table
+            is_objects = len(self._stack) == 1 and self._keys[-1] == "$objects"
+            self._open(self.objects if is_objects else [])
+
+    def _open(self, container: t.Union[dict, list]) -> None:
+        if self._budget is not None and container is not self.objects:
+            # The root dict and $objects aren't part of an entry
+            self._budget.check_depth(len(self._stack) - 1)
+        self._stack.append(container)
+        self._keys.append(None)
+
+    def _data(self, data: str) -> None:
+        if self._text is not None:
+            self._text.append(data)
+
+    def _end(self, element: str) -> None:
+        if element in SCALAR_ELEMENTS:
+            text = "".join(self._text)
+            self._text = None
+            if element == "key":
+                self._set_key(text)
+            else:
+                self._add(self._scalar(element, text))
+        elif element in ("dict", "array"):
+            self._keys.pop()
+            container = self._stack.pop()
+            if element == "dict" and len(container) == 1 and "CF$UID" in container:
+                container = self._uid(container["CF$UID"])
+            self._add(container)
+        elif element == "true":
+            self._add(True)
+        elif element == "false":
+            self._add(False)
+
+    def _scalar(self, element: str, text: str) -> t.Any:
+        if element == "string":
+            return text
+        if element == "integer":
+            return int(text, 16) if text[:2] in ("0x", "0X") else int(text)
+        if element == "real":
+            return float(text)
+        if element == "data":
+            return binascii.a2b_base64(text)
+        # A date: naive, in UTC, as plistlib reads them
+        return datetime.strptime(text, XML_DATE_FORMAT)
+
+    def _uid(self, value: t.Any) -> pl.UID:
+        if not isinstance(value, int):
+            raise self._error("CF$UID is not an integer")
+        uid = self._uids.get(value)
+        if uid is None:
+            uid = self._uids[value] = pl.UID(value)
+        return uid
+
+    def _set_key(self, key: str) -> None:
+        if not self._stack or not isinstance(self._stack[-1], dict) or self._keys[-1] is not None:
+            raise self._error("unexpected key")
+        self._keys[-1] = self._strings.setdefault(key, key)
+
+    def _check(self, container: t.Union[dict, list]) -> None:
+        """
+        Check the budget before another value is added to container
+        """
+        if container is self.objects:
+            self._budget.check_objects(len(container) + 1)
+            self._budget.tick()
+        elif len(self._stack) > 1:
+            self._budget.check_list(len(container) + 1)
+
+    def _add(self, value: t.Any) -> None:
+        if not self._stack:
+            if not isinstance(value, dict):
+                raise self._error("the top object is not a dict")
+            self.root = value
+            return
+
+        container = self._stack[-1]
+        if self._budget is not None:
+            self._check(container)
+        if container is self.objects:
+            container[self._uid(len(container))] = value
+        elif isinstance(container, list):
+            container.append(value)
+        else:
+            key = self._keys[-1]
+            if key is None:
+                raise self._error("missing key")
+            container[key] = value
+            self._keys[-1] = None
+
+
+def load_xml_archive(fp: t.IO, budget: t.Optional[Budget] = None
+                     ) -> tuple[int, dict[str, pl.UID], dict[pl.UID, t.Any]]:
+    """
+    Parse an XML NSKeyedArchiver plist a chunk at a time,
+    into its $version, $top, and $objects by UID, within
+    the budget if there is one
+    """
+    parser = _XMLArchiveParser(budget)
+    size = 0
+    while True:
+        chunk = fp.read(READ_CHUNK_SIZE)
+        if not chunk:
+            break
+        if budget is not None:
+            size += len(chunk)
+            budget.check_bytes(size)
+            budget.check_deadline()
+        parser.feed(chunk)
+    parser.feed(b"", final=True)
+    if budget is not None:
+        budget.check_deadline()
+
+    root = parser.root
+    if root is None or not {"$version", "$top", "$objects"} <= root.keys():
+        raise pl.InvalidFileException("Not an NSKeyedArchiver plist")
+    return root["$version"], root["$top"], parser.objects
@@ -0,0 +1,60 @@
+"""
+Classes and archive builders shared by the tests
+"""
+import plistlib as pl
+import typing as t
+
+from mentalics import NSCoding
+from mentalics.ns_keyed_archive import NSKeyedArchive
+from mentalics.ns_types import NS_TYPES
+
+ARCHIVE_VERSION = 100_000
+ROOT = pl.UID(1)
+
+ARRAY_CLASS = {"$classname": "NSArray", "$classes": ["NSArray", "NSObject"]}
+NODE_CLASS = {"$classname": "Node", "$classes": ["Node", "NSObject"]}
+
+
+class Node(NSCoding):
+    """
+    A value and a reference to the next node
+    """
+
+    def __init__(self, value: t.Any = None, next: t.Optional["Node"] = None):
+        self.value = value
+        self.next = next
+
+    def __init_from_archive__(self, decoder) -> "NSCoding":
+        self.__init__(decoder.decode("value"), decoder.decode("next"))
+        return self
+
+    def encode_archive(self, coder) -> None:
+        coder.encode(self.value, for_key="value")
+        coder.encode(self.next, for_key="next")
+
+
+CLASS_MAP = dict(NS_TYPES, Node=Node)
+
+
+def as_xml(value: t.Any) -> t.Any:
+    """
+    value with its UIDs as CF$UID dicts:
+    plistlib only writes UIDs in binary plists
+    """
+    if isinstance(value, pl.UID):
+        return {"CF$UID": value.data}
+    if isinstance(value, list):
+        return [as_xml(v) for v in value]
+    if isinstance(value, dict):
+        return {k: as_xml(v) for k, v in value.items()}
+    return value
+
+
+def make_archive(objects: list, root: pl.UID = ROOT) -> NSKeyedArchive:
+    return NSKeyedArchive.from_objects(ARCHIVE_VERSION, {"root": root}, objects)
+
+
+def archive_bytes(objects: list, fmt: pl.PlistFormat = pl.FMT_BINARY, root: pl.UID = ROOT) -> bytes:
+    archive = {"$version": ARCHIVE_VERSION, "$archiver": "NSKeyedArchiver", "$top": {"root": root},
+               "$objects": objects}
+    return pl.dumps(as_xml(archive) if fmt == pl.FMT_XML else archive, fmt=fmt)
@@ -0,0 +1,117 @@
+import io
+import plistlib as pl
+from datetime import datetime
+
+import pytest
+
+from mentalics import Archiver, Unarchiver
+from mentalics.ns_types import NS_TYPES, NSData, NSPoint, NSSize
+
+from .helpers import CLASS_MAP, Node
+
+
+def _archive(root) -> bytes:
+    file = io.BytesIO()
+    archiver = Archiver(file)
+    archiver.set_class(Node, "Node")
+    archiver.encode(root)
+    archiver.finish()
+    return file.getvalue()
+
+
+def _round_trip(root, lazy: bool = False):
+    unarchiver = Unarchiver(io.BytesIO(_archive(root)), class_map=dict(CLASS_MAP), lazy=lazy)
+    return unarchiver.decode()
+
+
+@pytest.mark.parametrize("value", [
+    "string", "", 0, -5, 2 ** 40, 1.5, True, False, b"bytes",
+    datetime(2020, 1, 2, 3, 4, 5), None, [1, "two", None, [3.0]], {"key": 1, "other": ["value"]},
+    ])
+def test_plist_values(value):
+    assert _round_trip(value) == value
+
+
+@pytest.mark.parametrize("lazy", [False, True])
+def test_instances(lazy):
+    root = _round_trip(Node("first", Node("second")), lazy=lazy)
+    assert isinstance(root, Node) and isinstance(root.next, Node)
+    assert (root.value, root.next.value, root.next.next) == ("first", "second", None)
+
+
+def test_nsdata():
+    assert bytes(_round_trip(NSData(b"\x00data"))) == b"\x00data"
+
+
+@pytest.mark.parametrize("value", [NSPoint(1, 2), NSPoint(1.5, -2.25), NSSize(3, 4)])
+def test_special_nsvalues(value):
+    data = _archive(value)
+    objects = pl.loads(data)["$objects"]
+    assert objects[2]["$classname"] == "NSValue"
+    assert objects[1]["NS.special"] in (1, 2)
+
+    assert _round_trip(value) == value
+
+
+def test_shared_objects_stay_shared():
+    shared = Node("shared")
+    root = _round_trip(Node([shared, shared], shared))
+    assert root.value[0] is root.value[1] is root.next
+
+
+def test_cycle():
+    first = Node("first")
+    first.next = Node("second", first)
+    root = _round_trip(first)
+    assert root.next.value == "second"
+    assert root.next.next is root
+
+
+def test_self_reference():
+    node = Node("self")
+    node.next = node
+    root = _round_trip(node)
+    assert root.next is root
+
+
+def test_self_referencing_dict():
+    value = {"key": "value"}
+    value["self"] = value
+    root = _round_trip(value)
+    assert root["key"] == "value"
+    assert root["self"] is root
+
+
+def test_shared_dicts_stay_shared():
+    shared = {"key": "value"}
+    root = _round_trip([shared, shared])
+    assert root[0] is root[1]
+
+
+def test_self_referencing_list():
+    value = ["value"]
+    value.append(value)
+    root = _round_trip(value)
+    assert root[0] == "value"
+    assert root[1] is root
+
+
+def test_list_cycle_through_another_list():
+    first = ["first"]
+    first.append(["second", first])
+    root = _round_trip(first)
+    assert root[1][0] == "second"
+    assert root[1][1] is root
+
+
+def test_archive_is_a_valid_plist():
+    archive = pl.loads(_archive(Node("value")))
+    assert archive["$archiver"] == "NSKeyedArchiver"
+    assert archive["$version"] == 100_000
+    assert archive["$objects"][0] == "$null"
+    assert isinstance(archive["$top"]["root"], pl.UID)
+
+
+def test_unknown_class():
+    with pytest.raises(ValueError):
+        Unarchiver(io.BytesIO(_archive(Node("value"))), class_map=dict(NS_TYPES)).decode()
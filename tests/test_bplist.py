@@ -0,0 +1,182 @@
+import io
+import plistlib as pl
+import struct
+from datetime import datetime
+
+import pytest
+
+from mentalics import LimitExceeded
+from mentalics.bplist import BPLIST_MAGIC, TRAILER_FORMAT, LazyBinaryPlist
+from mentalics.ns_keyed_archive import NSKeyedArchive
+
+from .helpers import ARRAY_CLASS, archive_bytes
+
+EVERY_TYPE = {
+    "true": True,
+    "false": False,
+    "small": 7,
+    "negative": -12345,
+    "large": 2 ** 62,
+    "float": 1.5,
+    "date": datetime(2020, 1, 2, 3, 4, 5),
+    "data": b"\x00\x01\x02" * 20,
+    "empty data": b"",
+    "ascii": "hello",
+    "long ascii": "x" * 300,
+    "unicode": "héllo ☃",
+    "uid": pl.UID(3),
+    "big uid": pl.UID(70_000),
+    "array": [1, "two", [3.0, [b"four"]]],
+    "empty array": [],
+    "dict": {"nested": {"deeper": [pl.UID(1)]}},
+    }
+
+
+def _lazy(data: bytes, **kwargs) -> LazyBinaryPlist:
+    return LazyBinaryPlist(io.BytesIO(data), **kwargs)
+
+
+def _bplist(objects: list[bytes], top: int = 0) -> bytes:
+    """
+    A bplist00 of already encoded objects, with
+    one-byte offsets and references
+    """
+    body = bytearray(BPLIST_MAGIC)
+    offsets = []
+    for encoded in objects:
+        offsets.append(len(body))
+        body += encoded
+    table_offset = len(body)
+    body += bytes(offsets)
+    body += struct.pack(TRAILER_FORMAT, 1, 1, len(objects), top, table_offset)
+    return bytes(body)
+
+
+def test_every_type_matches_plistlib():
+    data = pl.dumps(EVERY_TYPE, fmt=pl.FMT_BINARY)
+    plist = _lazy(data)
+    assert plist.read_object(plist.top_object) == pl.loads(data)
+
+
+def test_memory_mapped_file_matches_plistlib(tmp_path):
+    path = tmp_path / "every.plist"
+    path.write_bytes(pl.dumps(EVERY_TYPE, fmt=pl.FMT_BINARY))
+    with open(path, "rb") as file:
+        plist = LazyBinaryPlist(file)
+    assert plist.read_object(plist.top_object) == EVERY_TYPE
+
+
+def test_zero_copy_data_is_a_view():
+    plist = _lazy(pl.dumps({"data": b"abc"}, fmt=pl.FMT_BINARY), zero_copy=True)
+    data = plist.read_object(plist.top_object)["data"]
+    assert isinstance(data, memoryview)
+    assert bytes(data) == b"abc"
+
+
+def test_shared_containers_are_equal():
+    shared = [1, 2, 3]
+    data = pl.dumps({"a": shared, "b": shared}, fmt=pl.FMT_BINARY)
+    plist = _lazy(data)
+    result = plist.read_object(plist.top_object)
+    assert result == {"a": [1, 2, 3], "b": [1, 2, 3]}
+    # Parsed once per read_object
+    assert result["a"] is result["b"]
+
+
+def test_self_referencing_array():
+    # One array, holding itself
+    plist = _lazy(_bplist([b"\xa1\x00"]))
+    result = plist.read_object(0)
+    assert result[0] is result
+
+
+def test_not_a_bplist():
+    with pytest.raises(pl.InvalidFileException):
+        _lazy(b"<?xml version='1.0'?><plist/>" + bytes(32))
+
+
+def test_truncated_file():
+    data = pl.dumps(EVERY_TYPE, fmt=pl.FMT_BINARY)
+    with pytest.raises(pl.InvalidFileException):
+        plist = _lazy(data[:-10])
+        plist.read_object(plist.top_object)
+
+
+def test_zero_sized_offsets_in_trailer():
+    data = bytearray(_bplist([b"\x09"]))
+    data[-26] = 0  # offset size
+    with pytest.raises(pl.InvalidFileException):
+        _lazy(bytes(data))
+
+
+def test_offset_table_past_the_end():
+    data = bytearray(_bplist([b"\x09"]))
+    data[-8:] = struct.pack(">Q", 1 << 40)
+    with pytest.raises(pl.InvalidFileException):
+        _lazy(bytes(data)).read_object(0)
+
+
+def test_reference_out_of_range():
+    # An array holding object 5, of 1
+    with pytest.raises(pl.InvalidFileException):
+        _lazy(_bplist([b"\xa1\x05"])).read_object(0)
+
+
+def test_array_longer_than_the_file():
+    with pytest.raises(pl.InvalidFileException):
+        _lazy(_bplist([b"\xaf\x10\x7f\x00"])).read_object(0)
+
+
+def test_unknown_object_type():
+    with pytest.raises(pl.InvalidFileException):
+        _lazy(_bplist([b"\x70"])).read_object(0)
+
+
+def test_container_refs_of_a_corrupt_file():
+    # An array claiming more references than there are bytes
+    plist = _lazy(_bplist([b"\xaf\x10\x7f"]))
+    with pytest.raises(pl.InvalidFileException):
+        position, count = plist.container_refs(0)
+        plist.read_refs(position, count)
+
+
+def test_deep_nesting_is_bounded():
+    # Each array holds the next, 1000 deep, with two-byte
+    # offsets and references
+    data = bytearray(BPLIST_MAGIC)
+    offsets = []
+    for i in range(1000):
+        offsets.append(len(data))
+        data += b"\xa1" + struct.pack(">H", i + 1) if i < 999 else b"\xa0"
+    table_offset = len(data)
+    data += b"".join(struct.pack(">H", offset) for offset in offsets)
+    data += struct.pack(TRAILER_FORMAT, 2, 2, 1000, 0, table_offset)
+    # Rather than RecursionError
+    with pytest.raises(LimitExceeded):
+        _lazy(bytes(data)).read_object(0)
+
+
+def _archive_bytes() -> bytes:
+    return archive_bytes(["$null", {"$class": pl.UID(2), "NS.objects": [pl.UID(3), pl.UID(3)]}, ARRAY_CLASS, "shared"])
+
+
+def test_lazy_objects_match_eager():
+    eager = NSKeyedArchive(io.BytesIO(_archive_bytes()))
+    lazy = NSKeyedArchive(io.BytesIO(_archive_bytes()), lazy=True)
+    assert lazy.top == eager.top
+    assert len(lazy.objects) == len(eager.objects) == 4
+    assert list(lazy.objects) == list(eager.objects)
+    assert dict(lazy.objects.items()) == eager.objects
+    assert lazy.objects.entries() == list(eager.objects.values())
+
+
+def test_lazy_objects_lookups():
+    objects = NSKeyedArchive(io.BytesIO(_archive_bytes()), lazy=True).objects
+    assert objects[pl.UID(3)] == "shared"
+    assert pl.UID(3) in objects
+    assert pl.UID(4) not in objects
+    assert 3 not in objects
+    with pytest.raises(KeyError):
+        objects[pl.UID(4)]
+    with pytest.raises(KeyError):
+        objects[3]
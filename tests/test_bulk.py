@@ -0,0 +1,99 @@
+import asyncio
+import io
+import os
+import plistlib as pl
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+from mentalics import Archiver, NSCoding, aload_many, load_many
+
+from .helpers import CLASS_MAP, Node
+
+# Enough files after a crash that the last of them
+# is only submitted once the pool has been restarted
+FILES_AFTER_CRASH = 40
+
+
+class Crash(NSCoding):
+    """
+    Kills the process decoding it, as if it ran out of memory
+    """
+
+    def __init_from_archive__(self, decoder) -> "NSCoding":
+        os._exit(1)
+
+    def encode_archive(self, coder) -> None:
+        pass
+
+
+def _write(path, root, class_map: dict = CLASS_MAP) -> str:
+    file = io.BytesIO()
+    archiver = Archiver(file, class_map=dict(class_map))
+    archiver.encode(root)
+    archiver.finish()
+    path.write_bytes(file.getvalue())
+    return str(path)
+
+
+def _paths(tmp_path) -> tuple[list[str], str, str]:
+    """
+    Two good archives around a corrupt one and a missing one
+    """
+    corrupt = tmp_path / "corrupt.plist"
+    corrupt.write_bytes(b"bplist00 and then not much")
+    missing = str(tmp_path / "missing.plist")
+    paths = [_write(tmp_path / "first.plist", Node("first")), str(corrupt), missing,
+             _write(tmp_path / "second.plist", Node("second"))]
+    return paths, str(corrupt), missing
+
+
+def _check_isolated(results, paths: list[str], corrupt: str, missing: str):
+    results = {str(result.path): result for result in results}
+    assert sorted(results) == sorted(paths)
+    assert results[paths[0]].ok and results[paths[0]].root.value == "first"
+    assert results[paths[-1]].ok and results[paths[-1]].root.value == "second"
+    assert not results[corrupt].ok and isinstance(results[corrupt].error, pl.InvalidFileException)
+    assert not results[missing].ok and isinstance(results[missing].error, FileNotFoundError)
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_errors_only_fail_their_own_result(tmp_path, workers):
+    paths, corrupt, missing = _paths(tmp_path)
+    _check_isolated(load_many(paths, CLASS_MAP, workers=workers), paths, corrupt, missing)
+
+
+def test_in_process_results_are_in_order(tmp_path):
+    paths = [_write(tmp_path / f"{i}.plist", Node(i)) for i in range(10)]
+    assert [result.root.value for result in load_many(paths, CLASS_MAP, workers=1)] == list(range(10))
+
+
+def test_options_reach_workers(tmp_path):
+    path = _write(tmp_path / "a.plist", Node("a"))
+    (strict,) = load_many([path], dict(CLASS_MAP, Node=NSCoding), workers=2)
+    assert isinstance(strict.error, ValueError)
+    (lenient,) = load_many([path], dict(CLASS_MAP, Node=NSCoding), workers=2, error_on_ignored_attributes=False)
+    assert lenient.ok and type(lenient.root) is NSCoding
+
+
+def test_aload_many(tmp_path):
+    paths, corrupt, missing = _paths(tmp_path)
+
+    async def load():
+        return [result async for result in aload_many(paths, CLASS_MAP, workers=2)]
+
+    _check_isolated(asyncio.run(load()), paths, corrupt, missing)
+
+
+def test_broken_pools_are_restarted(tmp_path):
+    class_map = dict(CLASS_MAP, Crash=Crash)
+    crash = _write(tmp_path / "crash.plist", Crash(), class_map)
+    paths = [crash] + [_write(tmp_path / f"{i}.plist", Node(i)) for i in range(FILES_AFTER_CRASH)]
+
+    results = {str(result.path): result for result in load_many(paths, class_map, workers=2)}
+    assert sorted(results) == sorted(paths)
+    assert isinstance(results[crash].error, BrokenProcessPool)
+    # Only the files in flight with it failed
+    failed = [result for result in results.values() if not result.ok]
+    assert all(isinstance(result.error, BrokenProcessPool) for result in failed)
+    assert results[paths[-1]].ok and results[paths[-1]].root.value == FILES_AFTER_CRASH - 1
@@ -0,0 +1,156 @@
+import io
+import json
+import os
+import pickle
+import plistlib as pl
+import sys
+
+import pytest
+
+from mentalics import ArchiveCache, Archiver, cache as cache_module
+from mentalics.cache import INDEX_FILE_NAME, SNAPSHOT_SUFFIX, _hash_file
+
+from .helpers import CLASS_MAP, NODE_CLASS, Node, archive_bytes
+
+# Too long for pickle to recurse along
+CHAIN_LENGTH = sys.getrecursionlimit() * 2
+
+
+def _write(path, root) -> str:
+    file = io.BytesIO()
+    archiver = Archiver(file, class_map=dict(CLASS_MAP))
+    archiver.encode(root)
+    archiver.finish()
+    path.write_bytes(file.getvalue())
+    return str(path)
+
+
+def _snapshots(cache: ArchiveCache) -> list[str]:
+    return sorted(name for name in os.listdir(cache.directory) if name.endswith(SNAPSHOT_SUFFIX))
+
+
+def _graph_snapshots(cache: ArchiveCache) -> list[str]:
+    return [name for name in _snapshots(cache) if ".graph-" in name]
+
+
+def _snapshots_of(cache: ArchiveCache, path: str) -> list[str]:
+    content_hash = _hash_file(path)
+    return [name for name in _snapshots(cache) if name.startswith(content_hash)]
+
+
+def _fail(*args, **kwargs):
+    raise AssertionError("not served from a snapshot")
+
+
+def test_hits_are_served_from_snapshots(tmp_path, monkeypatch):
+    path = _write(tmp_path / "a.plist", Node("a", Node("b")))
+    cache = ArchiveCache(tmp_path / "cache")
+    cache.decode(path, CLASS_MAP)
+    archive = cache.load_archive(path)
+    assert len(_snapshots(cache)) == 2
+
+    monkeypatch.setattr(cache_module, "Unarchiver", _fail)
+    monkeypatch.setattr(cache_module.NSKeyedArchive, "__init__", _fail)
+    root = cache.decode(path, CLASS_MAP)
+    assert (root.value, root.next.value, root.next.next) == ("a", "b", None)
+    assert cache.load_archive(path).objects == archive.objects
+    # And by another cache, from the index
+    assert ArchiveCache(tmp_path / "cache").decode(path, CLASS_MAP).value == "a"
+
+
+def test_changed_files_are_reloaded(tmp_path):
+    cache = ArchiveCache(tmp_path / "cache")
+    path = _write(tmp_path / "a.plist", Node("before"))
+    assert cache.decode(path, CLASS_MAP).value == "before"
+
+    _write(tmp_path / "a.plist", Node("after, and longer"))
+    assert cache.decode(path, CLASS_MAP).value == "after, and longer"
+    assert len(_graph_snapshots(cache)) == 2
+
+
+def test_touched_files_reuse_snapshots(tmp_path, monkeypatch):
+    cache = ArchiveCache(tmp_path / "cache")
+    path = _write(tmp_path / "a.plist", Node("a"))
+    cache.decode(path, CLASS_MAP)
+    os.utime(path, ns=(0, 0))
+
+    monkeypatch.setattr(cache_module, "Unarchiver", _fail)
+    assert cache.decode(path, CLASS_MAP).value == "a"
+
+
+def test_least_recently_used_are_evicted(tmp_path):
+    cache = ArchiveCache(tmp_path / "cache")
+    a, b, c = (_write(tmp_path / f"{name}.plist", Node(name)) for name in "abc")
+    for seconds, path in enumerate((a, b, c), start=1):
+        cache.decode(path, CLASS_MAP)
+        for name in _snapshots_of(cache, path):
+            os.utime(os.path.join(cache.directory, name), ns=(0, seconds * 10 ** 9))
+    # Using a again leaves b least recently used
+    cache.decode(a, CLASS_MAP)
+    cache.load_archive(a)
+
+    sizes = {name: os.path.getsize(os.path.join(cache.directory, name)) for name in _snapshots(cache)}
+    evicted = _snapshots_of(cache, b)
+    assert len(evicted) == 2
+    cache = ArchiveCache(tmp_path / "cache", max_bytes=sum(sizes.values()) - sum(sizes[name] for name in evicted))
+
+    assert _snapshots(cache) == sorted(set(sizes) - set(evicted))
+    with open(os.path.join(cache.directory, INDEX_FILE_NAME)) as file:
+        assert sorted(json.load(file)) == sorted(os.path.realpath(path) for path in (a, c))
+
+
+def test_clear(tmp_path):
+    cache = ArchiveCache(tmp_path / "cache")
+    path = _write(tmp_path / "a.plist", Node("a"))
+    cache.decode(path, CLASS_MAP)
+    cache.clear()
+    assert _snapshots(cache) == []
+    assert cache.decode(path, CLASS_MAP).value == "a"
+
+
+@pytest.mark.parametrize("contents", [b"", b"not a pickle", pickle.dumps((-1, None))],
+                         ids=["empty", "corrupt", "older format"])
+def test_unreadable_snapshots_are_replaced(tmp_path, contents):
+    cache = ArchiveCache(tmp_path / "cache")
+    path = _write(tmp_path / "a.plist", Node("a"))
+    cache.decode(path, CLASS_MAP)
+    for name in _snapshots(cache):
+        (tmp_path / "cache" / name).write_bytes(contents)
+
+    assert cache.decode(path, CLASS_MAP).value == "a"
+    assert all(os.path.getsize(os.path.join(cache.directory, name)) > len(contents)
+               for name in _snapshots(cache))
+
+
+def test_strict_decodes_are_cached_apart(tmp_path):
+    # A Node with an attribute it doesn't decode
+    path = tmp_path / "extra.plist"
+    path.write_bytes(archive_bytes(["$null", {"$class": pl.UID(2), "value": 1, "next": pl.UID(0), "extra": 2},
+                                    NODE_CLASS]))
+    cache = ArchiveCache(tmp_path / "cache")
+    assert cache.decode(path, CLASS_MAP, error_on_ignored_attributes=False).value == 1
+
+    with pytest.raises(ValueError):
+        cache.decode(path, CLASS_MAP)
+    # Nor under another class map
+    cache.decode(path, dict(CLASS_MAP, Other=Node), error_on_ignored_attributes=False)
+    assert len(_graph_snapshots(cache)) == 2
+
+
+def test_long_cycles_are_cached(tmp_path):
+    # CHAIN_LENGTH - 1 -> ... -> 0 -> back to the start
+    first = head = Node(0)
+    for i in range(1, CHAIN_LENGTH):
+        head = Node(i, head)
+    first.next = head
+    path = _write(tmp_path / "chain.plist", head)
+    cache = ArchiveCache(tmp_path / "cache")
+
+    cache.decode(path, CLASS_MAP)
+    assert len(_graph_snapshots(cache)) == 1
+
+    root = node = cache.decode(path, CLASS_MAP)
+    for i in reversed(range(CHAIN_LENGTH)):
+        assert isinstance(node, Node) and node.value == i
+        node = node.next
+    assert node is root
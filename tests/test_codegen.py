@@ -0,0 +1,120 @@
+import io
+import plistlib as pl
+
+import pytest
+
+from mentalics import Archiver, Explorer, Unarchiver
+from mentalics.codegen import generate_classes, generate_source
+from mentalics.ns_types import NS_TYPES, NSPoint
+
+from .helpers import ARRAY_CLASS, archive_bytes
+
+A_CLASS = {"$classname": "A", "$classes": ["A", "Base", "NSObject"]}
+B_CLASS = {"$classname": "B", "$classes": ["B", "Base", "NSObject"]}
+VALUE_CLASS = {"$classname": "NSValue", "$classes": ["NSValue", "NSObject"]}
+
+# Instances of A and B, subclasses of Base,
+# with keys that aren't identifiers
+OBJECTS = [
+    "$null",
+    {"$class": pl.UID(2), "NS.objects": [pl.UID(3), pl.UID(5), pl.UID(6)]},
+    ARRAY_CLASS,
+    {"$class": pl.UID(4), "sharedValue": 1, "class": pl.UID(5), "optional": "yes"},
+    A_CLASS,
+    {"$class": pl.UID(7), "sharedValue": 2, "b": pl.UID(8)},
+    {"$class": pl.UID(4), "sharedValue": 3, "class": pl.UID(0), "optional": "no"},
+    B_CLASS,
+    {"$class": pl.UID(9), "NS.special": 1, "NS.pointval": "{1, 2}"},
+    VALUE_CLASS,
+    ]
+
+# Another archive, whose A doesn't have "optional"
+OTHER_OBJECTS = [
+    "$null",
+    {"$class": pl.UID(2), "sharedValue": 4, "class": pl.UID(0)},
+    A_CLASS,
+    ]
+
+
+def _data(objects: list = OBJECTS) -> bytes:
+    return archive_bytes(objects)
+
+
+def _explorer() -> Explorer:
+    summaries = [Explorer(io.BytesIO(_data(objects))).summary() for objects in (OBJECTS, OTHER_OBJECTS)]
+    return Explorer.from_summary(summaries[0].merge(summaries[1]))
+
+
+def _decode(data: bytes, classes: dict) -> list:
+    unarchiver = Unarchiver(io.BytesIO(data), class_map=dict(NS_TYPES))
+    unarchiver.set_classes(classes)
+    return unarchiver.decode()
+
+
+def test_generated_classes_decode_the_archive():
+    classes = generate_classes(_explorer())
+    assert set(classes) == {"Base", "A", "B"}
+    assert issubclass(classes["A"], classes["Base"])
+
+    first, second, third = _decode(_data(), classes)
+    assert type(first) is classes["A"]
+    assert (first.shared_value, first.class_, first.optional) == (1, second, "yes")
+    assert (second.shared_value, second.b) == (2, NSPoint(1, 2))
+    assert (third.shared_value, third.class_, third.optional) == (3, None, "no")
+
+    # Not archived on every A
+    other = _decode(_data(OTHER_OBJECTS), classes)
+    assert (other.shared_value, other.class_, other.optional) == (4, None, None)
+
+
+def test_generated_classes_have_slots():
+    classes = generate_classes(_explorer())
+    first = _decode(_data(), classes)[0]
+    assert not hasattr(first, "__dict__")
+    with pytest.raises(AttributeError):
+        first.unknown = 1
+
+
+def test_generated_classes_round_trip():
+    classes = generate_classes(_explorer())
+    roots = _decode(_data(), classes)
+
+    file = io.BytesIO()
+    archiver = Archiver(file)
+    archiver.set_classes(classes)
+    archiver.encode(roots)
+    archiver.finish()
+
+    first, second, third = _decode(file.getvalue(), classes)
+    assert (first.shared_value, first.class_, first.optional) == (1, second, "yes")
+    assert second.b == NSPoint(1, 2)
+    assert (third.class_, third.optional) == (None, "no")
+
+    # Optional keys that are None aren't archived
+    other = _decode(_data(OTHER_OBJECTS), classes)
+    file = io.BytesIO()
+    archiver = Archiver(file)
+    archiver.set_classes(classes)
+    archiver.encode(other)
+    archiver.finish()
+    assert "optional" not in pl.loads(file.getvalue())["$objects"][1]
+
+
+def test_generated_source():
+    source = generate_source(_explorer())
+    namespace = {}
+    exec(compile(source, "<generated>", "exec"), namespace)
+
+    assert set(namespace["CLASSES"]) == {"Base", "A", "B"}
+    # Known classes are imported rather than generated
+    assert "class NSArray" not in source
+    first = _decode(_data(), namespace["CLASSES"])[0]
+    assert (first.shared_value, first.optional) == (1, "yes")
+
+
+def test_known_classes_are_not_generated():
+    explorer = _explorer()
+    base = generate_classes(explorer)["Base"]
+    classes = generate_classes(explorer, known=dict(NS_TYPES, Base=base))
+    assert set(classes) == {"A", "B"}
+    assert issubclass(classes["A"], base)
@@ -0,0 +1,159 @@
+import io
+import json
+import plistlib as pl
+import sys
+from array import array
+
+import pytest
+
+from mentalics import Explorer, columnar
+from mentalics.columnar import (ARCHIVE_COLUMN, BOOL, FLOAT, INT, JSON, MANIFEST_NAME, STR, UID, UID_COLUMN,
+                                UID_LIST, Column, ColumnarWriter, export_columns, read_manifest, read_table)
+from mentalics.ns_keyed_archive import NSKeyedArchive
+
+from .helpers import ARRAY_CLASS, NODE_CLASS, archive_bytes
+
+RECORD_CLASS = {"$classname": "Record", "$classes": ["Record", "NSObject"]}
+
+# Two records in a root array, one referring to a node
+FIRST_OBJECTS = [
+    "$null",
+    {"$class": pl.UID(9), "NS.objects": [pl.UID(2), pl.UID(3)]},
+    {"$class": pl.UID(4), "count": 1, "ratio": 0.5, "flag": True, "name": pl.UID(5), "label": "first",
+     "ref": pl.UID(7), "items": [pl.UID(7), pl.UID(7)], "extra": {"a": [1, 2]}},
+    {"$class": pl.UID(4), "count": -2, "ratio": 2, "flag": False, "name": pl.UID(6), "label": "second",
+     "ref": pl.UID(0), "items": [], "extra": {"b": "x"}},
+    RECORD_CLASS,
+    "name one",
+    "name two",
+    {"$class": pl.UID(8), "value": 1, "next": pl.UID(0)},
+    NODE_CLASS,
+    ARRAY_CLASS,
+    ]
+
+# One record, with an attribute the others don't have
+SECOND_OBJECTS = [
+    "$null",
+    {"$class": pl.UID(2), "count": 2 ** 40, "ratio": 1.25, "flag": True, "name": pl.UID(3), "label": "third",
+     "ref": pl.UID(0), "items": [pl.UID(0)], "extra": {"c": 3}, "note": "only here"},
+    RECORD_CLASS,
+    "name three",
+    ]
+
+
+@pytest.fixture
+def paths(tmp_path) -> list[str]:
+    paths = []
+    for name, objects in (("first", FIRST_OBJECTS), ("second", SECOND_OBJECTS)):
+        path = tmp_path / f"{name}.plist"
+        path.write_bytes(archive_bytes(objects))
+        paths.append(str(path))
+    return paths
+
+
+def _rows(column: Column) -> list:
+    return [list(row) if isinstance(row, array) else row for row in column.values]
+
+
+@pytest.mark.parametrize("lazy", [False, True])
+def test_round_trip(tmp_path, paths, lazy):
+    export_columns(paths, tmp_path / "out", lazy=lazy)
+    assert read_manifest(tmp_path / "out")["archives"] == paths
+
+    table = read_table(tmp_path / "out", "Record")
+    assert {attr: column.type for attr, column in table.items()} == {
+        ARCHIVE_COLUMN: INT, UID_COLUMN: INT, "count": INT, "ratio": FLOAT, "flag": BOOL, "name": STR,
+        "label": STR, "ref": UID, "items": UID_LIST, "extra": JSON, "note": STR}
+
+    assert list(table[ARCHIVE_COLUMN].values) == [0, 0, 1]
+    assert list(table[UID_COLUMN].values) == [2, 3, 1]
+    assert list(table["count"].values) == [1, -2, 2 ** 40]
+    assert list(table["ratio"].values) == [0.5, 2.0, 1.25]
+    assert list(table["flag"].values) == [1, 0, 1]
+    assert table["name"].values == ["name one", "name two", "name three"]
+    assert table["label"].values == ["first", "second", "third"]
+    assert [list(items) for items in table["items"].values] == [[7, 7], [], [0]]
+    assert table["extra"].values == [{"a": [1, 2]}, {"b": "x"}, {"c": 3}]
+
+    # Nulls, and attributes missing from some archives
+    assert list(table["ref"].values) == [7, 0, 0]
+    assert list(table["ref"].validity) == [1, 0, 0]
+    assert list(table["note"].validity) == [0, 0, 1]
+    assert table["note"].values[2] == "only here"
+    assert table["count"].validity is None
+
+    node = read_table(tmp_path / "out", "Node")
+    assert (list(node[UID_COLUMN].values), list(node["value"].values)) == ([7], [1])
+
+
+def test_chunks(tmp_path, paths):
+    export_columns(paths, tmp_path / "whole")
+    explorer = Explorer.from_summary(Explorer(io.BytesIO(archive_bytes(FIRST_OBJECTS))).summary().merge(
+        Explorer(io.BytesIO(archive_bytes(SECOND_OBJECTS))).summary()))
+    with ColumnarWriter(tmp_path / "chunked", explorer, chunk_rows=1) as writer:
+        for path in paths:
+            with open(path, "rb") as file:
+                writer.add_archive(NSKeyedArchive(file), name=path)
+
+    whole, chunked = read_table(tmp_path / "whole", "Record"), read_table(tmp_path / "chunked", "Record")
+    assert whole.keys() == chunked.keys()
+    for attr in whole:
+        assert whole[attr].type == chunked[attr].type
+        assert _rows(whole[attr]) == _rows(chunked[attr])
+        assert whole[attr].validity == chunked[attr].validity
+
+
+def test_class_names(tmp_path, paths):
+    export_columns(paths, tmp_path / "out", class_names=["Node"])
+    assert list(read_manifest(tmp_path / "out")["tables"]) == ["Node"]
+    with pytest.raises(KeyError):
+        read_table(tmp_path / "out", "Record")
+
+
+def test_attributes_the_explorer_did_not_find(tmp_path, paths):
+    explorer = Explorer(io.BytesIO(archive_bytes(FIRST_OBJECTS)))
+    with ColumnarWriter(tmp_path / "out", explorer) as writer:
+        with pytest.raises(ValueError):
+            writer.add_archive(NSKeyedArchive(io.BytesIO(archive_bytes(SECOND_OBJECTS))))
+
+
+def test_needs_field_stats(tmp_path):
+    explorer = Explorer(io.BytesIO(archive_bytes(FIRST_OBJECTS)), field_stats=False)
+    with pytest.raises(ValueError):
+        ColumnarWriter(tmp_path / "out", explorer)
+
+
+def test_other_byte_order(tmp_path, paths):
+    export_columns(paths, tmp_path / "out")
+    exported = read_table(tmp_path / "out", "Record")
+
+    # As if exported on a machine of the other byte order
+    manifest = read_manifest(tmp_path / "out")
+    for column in manifest["tables"]["Record"]["columns"].values():
+        for extension, typecode in ((".values", column["typecode"]), (".offsets", "Q")):
+            path = tmp_path / "out" / (column["path"] + extension)
+            if path.exists():
+                values = array(typecode, path.read_bytes())
+                values.byteswap()
+                path.write_bytes(values.tobytes())
+    manifest["byteorder"] = "big" if sys.byteorder == "little" else "little"
+    (tmp_path / "out" / MANIFEST_NAME).write_text(json.dumps(manifest))
+
+    table = read_table(tmp_path / "out", "Record")
+    assert {attr: _rows(column) for attr, column in table.items()} == {
+        attr: _rows(column) for attr, column in exported.items()}
+
+
+@pytest.mark.skipif(columnar.np is not None, reason="NumPy is installed")
+def test_numpy_is_optional(tmp_path, paths):
+    export_columns(paths, tmp_path / "out")
+    with pytest.raises(ImportError):
+        read_table(tmp_path / "out", "Record", use_numpy=True)
+
+
+@pytest.mark.skipif(columnar.np is None, reason="needs NumPy")
+def test_numpy(tmp_path, paths):
+    export_columns(paths, tmp_path / "out")
+    table = read_table(tmp_path / "out", "Record", use_numpy=True)
+    assert table["count"].values.tolist() == [1, -2, 2 ** 40]
+    assert table["name"].values == ["name one", "name two", "name three"]
@@ -0,0 +1,96 @@
+import io
+
+import pytest
+
+from benchmarks import run
+from benchmarks.corpus import SHAPES, Node, generate
+from mentalics import Unarchiver
+from mentalics.ns_keyed_archive import NSKeyedArchive
+from mentalics.ns_types import NSData, NSPoint, NSSize
+
+SIZE = 200
+
+
+def _decode(shape: str, size: int = SIZE):
+    archive = generate(shape, size)
+    return Unarchiver(io.BytesIO(archive.data), class_map=dict(archive.class_map)).decode()
+
+
+@pytest.mark.parametrize("shape", SHAPES)
+def test_deterministic(shape):
+    assert generate(shape, SIZE) == generate(shape, SIZE)
+    assert generate(shape, SIZE).data != generate(shape, SIZE * 2).data
+
+
+@pytest.mark.parametrize("shape", SHAPES)
+def test_seeds_differ(shape):
+    assert generate(shape, SIZE, seed=1).data != generate(shape, SIZE, seed=2).data
+
+
+@pytest.mark.parametrize("shape", SHAPES)
+def test_object_count(shape):
+    archive = generate(shape, SIZE)
+    assert archive.object_count == len(NSKeyedArchive(io.BytesIO(archive.data)).objects)
+    if shape != "data_blobs":
+        assert archive.object_count > SIZE
+
+
+def test_wide_dictionary():
+    root = _decode("wide_dictionary")
+    assert len(root) == SIZE
+    assert all(isinstance(value, (int, str)) for value in root.values())
+
+
+def test_deep_arrays():
+    depth = 0
+    array = _decode("deep_arrays")
+    while len(array) == 2:
+        depth += 1
+        array = array[1]
+    assert depth == SIZE - 1
+
+
+def test_cycles():
+    root = node = _decode("cycles")
+    for i in range(SIZE):
+        assert isinstance(node, Node) and node.value == i and isinstance(node.other, Node)
+        node = node.next
+    assert node is root
+
+
+def test_values():
+    root = _decode("values")
+    assert len(root) == SIZE
+    assert {type(value) for value in root} == {NSPoint, NSSize}
+
+
+def test_data_blobs():
+    root = _decode("data_blobs", 1000)
+    assert len(root) == 10
+    assert all(isinstance(data, NSData) for data in root)
+
+
+def test_many_classes():
+    archive = generate("many_classes", SIZE)
+    node_names = [name for name, cls in archive.class_map.items() if cls is Node]
+    assert 1 < len(node_names) <= SIZE
+    assert all(isinstance(node, Node) for node in _decode("many_classes"))
+
+
+def test_measure():
+    result = run.measure(generate("cycles", 100))
+    assert sorted(result) == sorted(run.METRICS)
+    assert all(value > 0 for value in result.values())
+
+
+def test_regressions_are_counted(capsys):
+    baseline = {"a/1": dict.fromkeys(run.METRICS, 1.0)}
+    assert run.report({"a/1": dict.fromkeys(run.METRICS, 1.0)}, baseline) == 0
+    # Slower, and fewer objects per second
+    slower = dict.fromkeys(run.METRICS, 1.0) | {"decode_seconds": 1.5, "objects_per_second": 0.5}
+    assert run.report({"a/1": slower}, baseline) == 2
+    # Within the threshold, or faster
+    assert run.report({"a/1": dict(slower, decode_seconds=1.05, objects_per_second=2.0)}, baseline) == 0
+    # Nothing to compare with
+    assert run.report({"b/1": slower}, baseline) == 0
+    assert "+50%" in capsys.readouterr().out
@@ -0,0 +1,64 @@
+import plistlib as pl
+
+import pytest
+
+from mentalics import Unarchiver
+
+from .helpers import ARRAY_CLASS, CLASS_MAP, NODE_CLASS, Node, make_archive
+
+DICTIONARY_CLASS = {"$classname": "NSDictionary", "$classes": ["NSDictionary", "NSObject"]}
+
+# A node whose value is a dictionary of an array
+# of a string and another node: {"items": ["first", node]}
+OBJECTS = [
+    "$null",
+    {"$class": pl.UID(2), "value": pl.UID(3), "next": pl.UID(0)},
+    NODE_CLASS,
+    {"$class": pl.UID(4), "NS.keys": [pl.UID(5)], "NS.objects": [pl.UID(6)]},
+    DICTIONARY_CLASS,
+    "items",
+    {"$class": pl.UID(9), "NS.objects": [pl.UID(7), pl.UID(8)]},
+    "first",
+    {"$class": pl.UID(2), "value": "inline", "next": pl.UID(0)},
+    ARRAY_CLASS,
+    ]
+
+
+def _decode_path(*path):
+    return Unarchiver(make_archive(OBJECTS), class_map=dict(CLASS_MAP)).decode_path(*path)
+
+
+def test_whole_archive():
+    root = _decode_path("root")
+    assert isinstance(root, Node)
+    assert root.value == {"items": ["first", root.value["items"][1]]}
+
+
+@pytest.mark.parametrize("index", [0, -2])
+def test_index_into_an_array(index):
+    assert _decode_path("root", "value", "items", index) == "first"
+
+
+def test_only_the_end_of_the_path_is_decoded():
+    unarchiver = Unarchiver(make_archive(OBJECTS), class_map=dict(CLASS_MAP))
+    node = unarchiver.decode_path("root", "value", "items", 1)
+    assert isinstance(node, Node)
+    assert (node.value, node.next) == ("inline", None)
+    # Nothing on the way there
+    assert not any(isinstance(obj, dict) for obj in unarchiver._objects.values())
+    assert pl.UID(1) not in unarchiver._objects
+
+
+@pytest.mark.parametrize("path, message", [
+    (("root", "next", "value"), "nil"),
+    (("root", "missing"), "not found"),
+    (("root", "value", "missing"), "not found"),
+    (("root", "value", "items", 2), "out of range"),
+    (("root", "value", "items", -3), "out of range"),
+    (("root", 0), "Cannot index"),
+    (("root", "value", "items", 0, "key"), "Cannot look up"),
+    (("root", "value", "items", 0, 0), "Cannot index"),
+    ])
+def test_invalid_paths(path, message):
+    with pytest.raises(ValueError, match=message):
+        _decode_path(*path)
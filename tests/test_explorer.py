@@ -0,0 +1,232 @@
+import io
+import pickle
+import plistlib as pl
+
+import pytest
+
+from mentalics import Explorer, ExplorerSummary, explore_many
+from mentalics.explorer import (DISTINCT_SKETCH_SIZE, MAX_SAMPLE_LENGTH, MAX_SAMPLES, MAX_TARGET_CLASSES, OTHER_TARGETS,
+                                FieldStats)
+from mentalics.ns_keyed_archive import NSKeyedArchive
+
+from .helpers import ARRAY_CLASS, NODE_CLASS, archive_bytes
+
+
+def _objects(values: list) -> list:
+    """
+    A root array of one node per value, each
+    referencing the next, the last none
+    """
+    first = 3
+    objects = ["$null", {"$class": pl.UID(2), "NS.objects": [pl.UID(first + i) for i in range(len(values))]},
+               ARRAY_CLASS]
+    node_class = first + len(values)
+    for i, value in enumerate(values):
+        next_uid = pl.UID(first + i + 1) if i + 1 < len(values) else pl.UID(0)
+        objects.append({"$class": pl.UID(node_class), "value": value, "next": next_uid})
+    objects.append(NODE_CLASS)
+    return objects
+
+
+def _explore(objects: list, **kwargs) -> Explorer:
+    return Explorer(io.BytesIO(archive_bytes(objects)), **kwargs)
+
+
+def _write(tmp_path, objects_per_file: list[list]) -> list[str]:
+    paths = []
+    for i, objects in enumerate(objects_per_file):
+        path = tmp_path / f"{i}.plist"
+        path.write_bytes(archive_bytes(objects))
+        paths.append(str(path))
+    return paths
+
+
+def test_merge_summaries():
+    first = _explore(_objects([1, 2])).summary()
+    second = _explore(_objects(["a"])).summary()
+    merged = first.merge(second)
+
+    assert merged.archive_count == 2
+    assert merged.instance_counts == {"NSArray": 2, "Node": 3}
+    assert merged.final_attrs["Node"] == {"value", "next"}
+    assert merged.hierarchy["Node"] == ()
+    assert merged.field_stats["Node"]["value"].value_types == {"int": 2, "str": 1}
+    # Neither is changed
+    assert first.instance_counts == {"NSArray": 1, "Node": 2}
+
+
+def test_merge_keeps_every_attribute():
+    objects = _objects([1])
+    objects[3] = dict(objects[3], extra=True)
+    merged = _explore(_objects([1])).summary().merge(_explore(objects).summary())
+    assert merged.final_attrs["Node"] == {"value", "next", "extra"}
+
+
+def test_merge_conflicting_hierarchies():
+    objects = _objects([1])
+    objects[-1] = {"$classname": "Node", "$classes": ["Node", "Base", "NSObject"]}
+    with pytest.raises(ValueError, match="Conflicting superclasses"):
+        _explore(_objects([1])).summary().merge(_explore(objects).summary())
+
+
+def test_summaries_pickle():
+    summary = _explore(_objects([1, 2, None])).summary()
+    assert pickle.loads(pickle.dumps(summary)) == summary
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_explore_many(tmp_path, workers):
+    paths = _write(tmp_path, [_objects([1, 2]), _objects(["a"]), _objects([3.5, 4.5, 5.5])])
+    explorer = explore_many(paths, workers=workers)
+
+    summary = explorer.summary()
+    assert summary.archive_count == 3
+    assert summary.instance_counts == {"NSArray": 3, "Node": 6}
+    assert summary.field_stats["Node"]["value"].value_types == {"int": 2, "str": 1, "float": 3}
+    assert explorer._classes["Node"].instance_count == 6
+
+
+def test_explore_many_without_field_stats(tmp_path):
+    summary = explore_many(_write(tmp_path, [_objects([1])]), workers=1, field_stats=False).summary()
+    assert summary.field_stats == {}
+    assert summary.instance_counts == {"NSArray": 1, "Node": 1}
+
+
+def test_explore_nothing():
+    with pytest.raises(ValueError):
+        explore_many([])
+
+
+def test_from_summary_matches_the_explorer():
+    explorer = _explore(_objects([1, 2]))
+    rebuilt = Explorer.from_summary(explorer.summary())
+    assert rebuilt._classes.keys() == explorer._classes.keys()
+    assert rebuilt._classes["Node"].final_attrs == explorer._classes["Node"].final_attrs
+    assert isinstance(rebuilt.summary(), ExplorerSummary)
+
+
+def _hierarchy_objects() -> list:
+    """
+    A root array of instances of A and B, both subclasses
+    of Base, and of NSValues of two kinds
+    """
+    base_a = {"$classname": "A", "$classes": ["A", "Base", "NSObject"]}
+    base_b = {"$classname": "B", "$classes": ["B", "Base", "NSObject"]}
+    value_class = {"$classname": "NSValue", "$classes": ["NSValue", "NSObject"]}
+    return [
+        "$null",
+        {"$class": pl.UID(2), "NS.objects": [pl.UID(uid) for uid in (3, 5, 6, 8, 9, 10)]},
+        ARRAY_CLASS,
+        {"$class": pl.UID(4), "shared": 1, "a": 2},
+        base_a,
+        {"$class": pl.UID(7), "shared": 3, "b": 4},
+        {"$class": pl.UID(4), "shared": 5, "a": 6},
+        base_b,
+        {"$class": pl.UID(11), "NS.special": 1, "NS.pointval": "{1, 2}"},
+        {"$class": pl.UID(11), "NS.special": 2, "NS.sizeval": "{3, 4}"},
+        {"$class": pl.UID(7), "shared": 7, "b": 8},
+        value_class,
+        ]
+
+
+def test_class_hierarchy():
+    summary = _explore(_hierarchy_objects()).summary()
+    assert summary.hierarchy == {"NSArray": (), "A": ("Base",), "Base": (), "B": ("Base",), "NSValue": ()}
+    assert summary.instance_counts == {"NSArray": 1, "A": 2, "B": 2, "NSValue": 2}
+
+
+def test_superclass_attributes_are_inferred():
+    classes = _explore(_hierarchy_objects())._classes
+    assert classes["A"].superclass is classes["Base"]
+    assert classes["Base"].superclass is classes["$Object"]
+    assert set(classes["Base"].subclasses) == {classes["A"], classes["B"]}
+
+    # Attributes both subclasses have move to Base
+    assert classes["Base"].attrs == {"shared"}
+    assert classes["A"].attrs == {"a"}
+    assert classes["B"].attrs == {"b"}
+    assert classes["A"].final_attrs == {"shared", "a"}
+    assert classes["A"].instance_count == 2
+
+
+def test_explorer_accepts_a_loaded_archive():
+    archive = NSKeyedArchive(io.BytesIO(archive_bytes(_hierarchy_objects())), lazy=True)
+    assert Explorer(archive).summary() == _explore(_hierarchy_objects()).summary()
+
+
+def test_field_stats():
+    objects = _objects([1, 2, 2, "three", None])
+    # The last node's value references a string
+    objects[7] = dict(objects[7], value=pl.UID(len(objects)))
+    objects.append("referenced")
+    stats = _explore(objects).summary().field_stats["Node"]
+
+    value = stats["value"]
+    assert value.count == 5
+    assert value.value_types == {"int": 3, "str": 1, "uid": 1}
+    assert value.target_classes == {"str": 1}
+    assert value.samples == [1, 2, "three", "referenced"]
+    assert value.cardinality == 4
+
+    next_node = stats["next"]
+    assert (next_node.count, next_node.null_count) == (5, 1)
+    assert next_node.null_rate == 0.2
+    assert next_node.target_classes == {"Node": 4}
+    # References to instances are counted by UID
+    assert next_node.cardinality == 4
+
+
+def test_field_stats_of_lists():
+    objects = _objects([[pl.UID(1), 2, "three"], []])
+    stats = _explore(objects).summary().field_stats["Node"]["value"]
+    assert stats.value_types == {"list": 2}
+    assert stats.element_types == {"uid": 1, "int": 1, "str": 1}
+    assert stats.target_classes == {"NSArray": 1}
+
+
+def test_field_stats_are_optional():
+    assert _explore(_objects([1]), field_stats=False).summary().field_stats == {}
+
+
+def test_samples_are_bounded():
+    stats = FieldStats()
+    for i in range(MAX_SAMPLES * 2):
+        stats.add_sample(str(i) + "x" * (MAX_SAMPLE_LENGTH * 2))
+    stats.add_sample({"not": "sampled"})
+    assert len(stats.samples) == MAX_SAMPLES
+    assert all(len(sample) == MAX_SAMPLE_LENGTH for sample in stats.samples)
+
+
+def test_target_classes_are_bounded():
+    stats = FieldStats()
+    for i in range(MAX_TARGET_CLASSES + 10):
+        stats.add_target(f"Class{i}")
+    stats.add_target("Class0")
+    assert len(stats.target_classes) == MAX_TARGET_CLASSES + 1
+    assert stats.target_classes[OTHER_TARGETS] == 10
+    assert stats.target_classes["Class0"] == 2
+
+
+def _distinct(values) -> FieldStats:
+    stats = FieldStats()
+    for value in values:
+        stats.add_distinct(value)
+    return stats
+
+
+def test_cardinality_is_exact_for_few_values():
+    assert _distinct(i % (DISTINCT_SKETCH_SIZE - 1) for i in range(1000)).cardinality == DISTINCT_SKETCH_SIZE - 1
+
+
+@pytest.mark.parametrize("count", [1000, 100_000])
+def test_cardinality_is_estimated_for_many_values(count):
+    stats = _distinct(range(count))
+    assert len(stats.distinct_sketch) == DISTINCT_SKETCH_SIZE
+    # The sketch's standard error is about 1 / sqrt(DISTINCT_SKETCH_SIZE)
+    assert abs(stats.cardinality - count) < count * 3 / DISTINCT_SKETCH_SIZE ** 0.5
+
+
+def test_merged_sketches_match_a_sketch_of_both():
+    first, second = _distinct(range(0, 6000)), _distinct(range(3000, 9000))
+    merged = first.merge(second)
+    assert merged.distinct_sketch == _distinct(range(9000)).distinct_sketch
@@ -0,0 +1,111 @@
+import plistlib as pl
+import sys
+
+import pytest
+
+from mentalics import ReferenceGraph
+
+from .helpers import NODE_CLASS, make_archive
+
+# Far deeper than Python could recurse
+CHAIN_LENGTH = sys.getrecursionlimit() * 10
+
+# 1 -> 2 <-> 3, with 2 also referring to 5 and to 6 from
+# within nested containers; 4 refers to itself, and 9
+# to 8, but nothing in $top leads to either
+OBJECTS = [
+    "$null",
+    {"$class": pl.UID(7), "value": 1, "next": pl.UID(2)},
+    {"$class": pl.UID(7), "value": [pl.UID(5), {"nested": pl.UID(6)}], "next": pl.UID(3)},
+    {"$class": pl.UID(7), "value": pl.UID(0), "next": pl.UID(2)},
+    {"$class": pl.UID(7), "value": 4, "next": pl.UID(4)},
+    "leaf",
+    {"$class": pl.UID(7), "value": "inline", "next": pl.UID(0)},
+    NODE_CLASS,
+    "orphan",
+    {"$class": pl.UID(7), "value": pl.UID(8), "next": pl.UID(0)},
+    ]
+
+
+def _uids(*uids: int) -> set[pl.UID]:
+    return {pl.UID(uid) for uid in uids}
+
+
+def _sorted(uids: list[pl.UID]) -> list[int]:
+    return sorted(uid.data for uid in uids)
+
+
+@pytest.fixture
+def graph() -> ReferenceGraph:
+    return ReferenceGraph(make_archive(OBJECTS))
+
+
+def test_size(graph):
+    assert len(graph) == len(OBJECTS)
+    # Six instances refer to their class, and seven to
+    # other objects: references to $null are left out
+    assert graph.edge_count == 6 + 7
+
+
+def test_references(graph):
+    assert _sorted(graph.references(pl.UID(2))) == [3, 5, 6, 7]
+    assert _sorted(graph.references(pl.UID(3))) == [2, 7]
+    assert graph.references(pl.UID(5)) == []
+    assert graph.references(pl.UID(0)) == []
+
+
+def test_referrers(graph):
+    assert _sorted(graph.referrers(pl.UID(2))) == [1, 3]
+    assert graph.referrers(pl.UID(4)) == [pl.UID(4)]
+    assert set(graph.referrers(pl.UID(7))) == _uids(1, 2, 3, 4, 6, 9)
+    assert graph.referrers(pl.UID(1)) == []
+
+
+def test_unknown_uids(graph):
+    for lookup in (graph.references, graph.referrers, graph.reachable):
+        with pytest.raises(KeyError):
+            lookup(pl.UID(len(OBJECTS)))
+
+
+def test_reachable(graph):
+    assert graph.roots == [pl.UID(1)]
+    assert graph.reachable() == _uids(1, 2, 3, 5, 6, 7)
+    assert graph.reachable(pl.UID(9)) == _uids(7, 8, 9)
+    assert graph.reachable(pl.UID(5), reverse=True) == _uids(1, 2, 3, 5)
+    assert graph.reachable(pl.UID(8), pl.UID(4), reverse=True) == _uids(4, 8, 9)
+
+
+def test_unreachable(graph):
+    assert graph.unreachable() == _uids(4, 8, 9)
+
+
+def test_strongly_connected_components(graph):
+    components = graph.strongly_connected_components()
+    assert sorted(_sorted(component) for component in components) == [[0], [1], [2, 3], [4], [5], [6], [7], [8], [9]]
+
+    # Referenced components come before those referring to them
+    position = {uid: i for i, component in enumerate(components) for uid in component}
+    for uid in range(len(OBJECTS)):
+        for target in graph.references(pl.UID(uid)):
+            assert position[target] <= position[pl.UID(uid)]
+
+
+def test_cycles(graph):
+    assert sorted(_sorted(cycle) for cycle in graph.cycles()) == [[2, 3], [4]]
+
+
+def test_references_past_the_end():
+    with pytest.raises(ValueError):
+        ReferenceGraph(make_archive(["$null", [pl.UID(2)]]))
+
+
+def test_long_chains():
+    # Each node refers to the next, and the last back to the first
+    objects = ["$null"] + [{"$class": pl.UID(CHAIN_LENGTH + 1), "next": pl.UID(i + 2)}
+                           for i in range(CHAIN_LENGTH)] + [NODE_CLASS]
+    objects[CHAIN_LENGTH]["next"] = pl.UID(1)
+    graph = ReferenceGraph(make_archive(objects))
+
+    (cycle,) = graph.cycles()
+    assert _sorted(cycle) == list(range(1, CHAIN_LENGTH + 1))
+    assert graph.unreachable() == set()
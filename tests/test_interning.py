@@ -0,0 +1,94 @@
+import io
+import threading
+
+from mentalics import Archiver, InternPool, Unarchiver
+from mentalics.ns_types import NSPoint
+
+from .helpers import CLASS_MAP, Node
+
+THREADS = 8
+THREAD_VALUES = 1000
+
+
+def _decode(root, intern_pool):
+    file = io.BytesIO()
+    archiver = Archiver(file, class_map=dict(CLASS_MAP))
+    archiver.encode(root)
+    archiver.finish()
+    file.seek(0)
+    return Unarchiver(file, class_map=dict(CLASS_MAP), intern_pool=intern_pool).decode()
+
+
+def _distinct(string: str) -> str:
+    # An equal string that is not the same object
+    return "".join(list(string))
+
+
+def test_hits_and_misses():
+    pool = InternPool()
+    first = pool.intern(_distinct("a string"))
+    assert pool.intern(_distinct("a string")) is first
+    assert pool.intern(_distinct("another string")) is not first
+    assert (pool.hits, pool.misses, len(pool)) == (1, 2, 2)
+
+
+def test_least_recently_used_are_evicted():
+    pool = InternPool(max_size=2)
+    a, b = pool.intern(_distinct("string a")), pool.intern(_distinct("string b"))
+    pool.intern(_distinct("string a"))  # b is now least recently used
+    pool.intern(_distinct("string c"))
+    assert len(pool) == 2
+
+    assert pool.intern(_distinct("string a")) is a
+    new_b = _distinct("string b")
+    assert pool.intern(new_b) is new_b and new_b is not b
+    # Still equal, wherever it is used
+    assert b == new_b
+
+
+def test_clear():
+    pool = InternPool()
+    first = pool.intern(_distinct("a string"))
+    pool.clear()
+    assert len(pool) == 0
+    assert pool.intern(_distinct("a string")) is not first
+
+
+def test_shared_between_unarchivers():
+    pool = InternPool()
+    first = _decode(Node("a shared string", Node(NSPoint(1, 2))), pool)
+    second = _decode(Node("a shared string", Node(NSPoint(1, 2))), pool)
+    assert second.value is first.value
+    assert second.next.value is first.next.value
+    # Nodes are not values, so are never shared
+    assert second.next is not first.next
+
+
+def test_not_shared_without_a_pool():
+    first = _decode(Node("a shared string", Node(NSPoint(1, 2))), None)
+    second = _decode(Node("a shared string", Node(NSPoint(1, 2))), None)
+    assert second.value == first.value and second.value is not first.value
+    assert second.next.value == first.next.value and second.next.value is not first.next.value
+
+
+def test_lists_share_interned_strings():
+    pool = InternPool()
+    first = _decode(["one string", "another string"], pool)
+    second = _decode(["another string", "one string"], pool)
+    assert second[0] is first[1] and second[1] is first[0]
+
+
+def test_threads():
+    pool = InternPool(max_size=THREAD_VALUES // 2)
+
+    def intern_all():
+        for i in range(THREAD_VALUES):
+            pool.intern(_distinct(f"string {i}"))
+
+    threads = [threading.Thread(target=intern_all) for _ in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert pool.hits + pool.misses == THREADS * THREAD_VALUES
+    assert len(pool) == THREAD_VALUES // 2
@@ -0,0 +1,94 @@
+import io
+import pickle
+import plistlib as pl
+
+import pytest
+
+from mentalics import LimitExceeded, Limits, Unarchiver, load_many
+from mentalics.ns_keyed_archive import NSKeyedArchive
+
+from .helpers import ARRAY_CLASS, archive_bytes, make_archive
+
+# A root array of 5 strings, and an array of nested lists:
+# 10 objects in all, the longest list 5 long, and 5 deep
+# (counting the entry, its NS.objects and 3 nested lists)
+OBJECTS = [
+    "$null",
+    {"$class": pl.UID(2), "NS.objects": [pl.UID(3), pl.UID(4), pl.UID(5), pl.UID(6), pl.UID(9)]},
+    ARRAY_CLASS,
+    "a", "b", "c", "d",
+    "unused",
+    "unused",
+    {"$class": pl.UID(2), "NS.objects": [[1, [2, [3]]]]},
+    ]
+
+
+def _data(fmt: pl.PlistFormat) -> bytes:
+    return archive_bytes(OBJECTS, fmt)
+
+
+# Binary eagerly, binary lazily, and XML
+READS = [(pl.FMT_BINARY, False), (pl.FMT_BINARY, True), (pl.FMT_XML, False)]
+
+
+def _decode(fmt, lazy: bool, limits: Limits):
+    return Unarchiver(io.BytesIO(_data(fmt)), lazy=lazy, limits=limits).decode()
+
+
+@pytest.mark.parametrize("fmt, lazy", READS)
+def test_within_limits(fmt, lazy):
+    limits = Limits(max_objects=10, max_bytes=len(_data(fmt)), max_list_length=5, max_depth=5, timeout=60)
+    assert _decode(fmt, lazy, limits) == ["a", "b", "c", "d", [[1, [2, [3]]]]]
+
+
+@pytest.mark.parametrize("fmt, lazy", READS)
+@pytest.mark.parametrize("limit, value", [
+    ("max_objects", 9),
+    ("max_list_length", 4),
+    ("max_depth", 4),
+    ("timeout", 0),
+    ])
+def test_each_limit(fmt, lazy, limit, value):
+    with pytest.raises(LimitExceeded) as error:
+        _decode(fmt, lazy, Limits(**{limit: value}))
+    assert error.value.limit == limit
+
+
+@pytest.mark.parametrize("fmt, lazy", READS)
+def test_max_bytes(fmt, lazy):
+    size = len(_data(fmt))
+    with pytest.raises(LimitExceeded) as error:
+        _decode(fmt, lazy, Limits(max_bytes=size - 1))
+    assert (error.value.limit, error.value.value, error.value.maximum) == ("max_bytes", size, size - 1)
+
+
+def test_loaded_archive():
+    archive = NSKeyedArchive(io.BytesIO(_data(pl.FMT_BINARY)))
+    with pytest.raises(LimitExceeded):
+        Unarchiver(archive, limits=Limits(max_objects=9))
+
+
+def test_nested_lists_of_a_loaded_archive():
+    # Not checked while loading: only while decoding
+    archive = make_archive(["$null", {"$class": pl.UID(2), "NS.objects": [[1, 2], [[1, 2, 3, 4]]]}, ARRAY_CLASS])
+    with pytest.raises(LimitExceeded) as error:
+        Unarchiver(archive, limits=Limits(max_list_length=3)).decode()
+    assert error.value.limit == "max_list_length"
+
+
+def test_is_a_value_error():
+    with pytest.raises(ValueError):
+        _decode(pl.FMT_BINARY, False, Limits(max_objects=1))
+
+
+def test_pickles():
+    error = pickle.loads(pickle.dumps(LimitExceeded("max_objects", 10, 9)))
+    assert (error.limit, error.value, error.maximum) == ("max_objects", 10, 9)
+    assert str(error) == "max_objects exceeded: 10 > 9"
+
+
+def test_load_many(tmp_path):
+    path = tmp_path / "archive.plist"
+    path.write_bytes(_data(pl.FMT_BINARY))
+    (result,) = load_many([path], workers=1, limits=Limits(max_objects=9))
+    assert isinstance(result.error, LimitExceeded)
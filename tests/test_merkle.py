@@ -0,0 +1,164 @@
+import plistlib as pl
+import random
+import typing as t
+
+import pytest
+
+from mentalics import Unarchiver
+from mentalics.merkle import SubgraphStore, archive_digest, structural_diff, structural_hashes
+from mentalics.ns_keyed_archive import NSKeyedArchive
+
+from .helpers import ARRAY_CLASS, CLASS_MAP, NODE_CLASS, make_archive
+
+
+def _objects(leaf_value: str = "leaf") -> list:
+    """
+    A root array of a three node cycle (with distinct values)
+    and a chain ending in a leaf string, sharing a class
+    """
+    return [
+        "$null",
+        {"$class": pl.UID(2), "NS.objects": [pl.UID(3), pl.UID(6)]},
+        ARRAY_CLASS,
+        {"$class": pl.UID(9), "value": 1, "next": pl.UID(4)},
+        {"$class": pl.UID(9), "value": 2, "next": pl.UID(5)},
+        {"$class": pl.UID(9), "value": 3, "next": pl.UID(3)},
+        {"$class": pl.UID(9), "value": pl.UID(8), "next": pl.UID(7)},
+        {"$class": pl.UID(9), "value": pl.UID(8), "next": pl.UID(10)},
+        "shared string",
+        NODE_CLASS,
+        leaf_value,
+        ]
+
+
+def _renumber(value: t.Any, uids: dict[int, int]) -> t.Any:
+    if isinstance(value, pl.UID):
+        return pl.UID(uids[value.data])
+    if isinstance(value, list):
+        return [_renumber(v, uids) for v in value]
+    if isinstance(value, dict):
+        return {k: _renumber(v, uids) for k, v in value.items()}
+    return value
+
+
+def _permuted(objects: list, seed: int) -> tuple[list, dict[int, int]]:
+    """
+    The same objects under other UIDs ($null stays
+    at 0), and the new UID of each old one
+    """
+    order = list(range(1, len(objects)))
+    random.Random(seed).shuffle(order)
+    uids = {0: 0, **{old: new for new, old in enumerate(order, 1)}}
+    permuted = [None] * len(objects)
+    for old, entry in enumerate(objects):
+        permuted[uids[old]] = _renumber(entry, uids)
+    return permuted, uids
+
+
+def _permuted_archive(objects: list, seed: int) -> tuple[NSKeyedArchive, dict[int, int]]:
+    permuted, uids = _permuted(objects, seed)
+    return make_archive(permuted, root=pl.UID(uids[1])), uids
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_hashes_do_not_depend_on_uids(seed):
+    archive = make_archive(_objects())
+    permuted_archive, uids = _permuted_archive(_objects(), seed)
+
+    hashes = structural_hashes(archive)
+    permuted_hashes = structural_hashes(permuted_archive)
+    assert {pl.UID(uids[uid.data]): h for uid, h in hashes.items()} == permuted_hashes
+    assert archive_digest(archive) == archive_digest(permuted_archive)
+
+
+def _ring_objects() -> list:
+    """
+    A root array of two opposite nodes of a
+    ring of four equal nodes
+    """
+    return [
+        "$null",
+        {"$class": pl.UID(2), "NS.objects": [pl.UID(3), pl.UID(5)]},
+        ARRAY_CLASS,
+        {"$class": pl.UID(7), "value": 0, "next": pl.UID(4)},
+        {"$class": pl.UID(7), "value": 0, "next": pl.UID(5)},
+        {"$class": pl.UID(7), "value": 0, "next": pl.UID(6)},
+        {"$class": pl.UID(7), "value": 0, "next": pl.UID(3)},
+        NODE_CLASS,
+        ]
+
+
+@pytest.mark.parametrize("seed", range(8))
+def test_symmetric_ring_hashes_do_not_depend_on_uids(seed):
+    archive = make_archive(_ring_objects())
+    permuted_archive, uids = _permuted_archive(_ring_objects(), seed)
+
+    hashes = structural_hashes(archive)
+    permuted_hashes = structural_hashes(permuted_archive)
+    assert {pl.UID(uids[uid.data]): h for uid, h in hashes.items()} == permuted_hashes
+    assert archive_digest(archive) == archive_digest(permuted_archive)
+
+
+def test_symmetric_ring_round_trip(tmp_path):
+    permuted_archive, _ = _permuted_archive(_ring_objects(), 1)
+    with SubgraphStore(tmp_path / "store.db") as store:
+        stored = store.get(store.put(permuted_archive))
+
+    first, opposite = Unarchiver(stored, class_map=dict(CLASS_MAP)).decode()
+    assert first.next.next is opposite
+    assert opposite.next.next is first
+    assert first.next is not opposite
+
+
+def test_different_objects_have_different_hashes():
+    hashes = structural_hashes(make_archive(_objects()))
+    # Every node of the cycle, and both chain nodes
+    node_hashes = [hashes[pl.UID(uid)] for uid in (3, 4, 5, 6, 7)]
+    assert len(set(node_hashes)) == len(node_hashes)
+
+
+def test_digest_ignores_unreachable_objects():
+    objects = _objects()
+    assert archive_digest(make_archive(objects)) == archive_digest(make_archive(objects + ["unreachable"]))
+
+
+def test_diff_finds_changes_and_their_referrers():
+    only_in_old, only_in_new = structural_diff(make_archive(_objects()), make_archive(_objects("edited")))
+    # The leaf, what leads to it, and the root
+    assert only_in_old == only_in_new == {pl.UID(10), pl.UID(7), pl.UID(6), pl.UID(1)}
+
+
+def test_store_round_trip(tmp_path):
+    archive = make_archive(_objects())
+    with SubgraphStore(tmp_path / "store.db") as store:
+        key = store.put(archive)
+        assert key == archive_digest(archive)
+        assert key in store
+        stored = store.get(key)
+
+    assert archive_digest(stored) == key
+    root = Unarchiver(stored, class_map=dict(CLASS_MAP)).decode()
+    cycle, chain = root
+    assert (cycle.value, cycle.next.value, cycle.next.next.value) == (1, 2, 3)
+    assert cycle.next.next.next is cycle
+    assert (chain.value, chain.next.value, chain.next.next) == ("shared string", "shared string", "leaf")
+
+
+def test_store_shares_subgraphs(tmp_path):
+    with SubgraphStore(tmp_path / "store.db") as store:
+        store.put(make_archive(_objects()))
+        size = store.stored_bytes()
+        # Renumbered: nothing new to store
+        store.put(_permuted_archive(_objects(), 0)[0])
+        assert store.stored_bytes() == size
+        # Only the leaf and what leads to it are new
+        edited = store.put(make_archive(_objects("edited")))
+        assert size < store.stored_bytes() < 2 * size
+        assert archive_digest(store.get(edited)) == edited
+
+
+def test_store_missing_key(tmp_path):
+    with SubgraphStore(tmp_path / "store.db") as store:
+        assert b"missing" not in store
+        with pytest.raises(KeyError):
+            store.get(b"missing")
@@ -0,0 +1,57 @@
+import io
+import plistlib as pl
+
+import pytest
+
+from mentalics.ns_keyed_archive import NSKeyedArchive
+
+from .helpers import ARRAY_CLASS, NODE_CLASS, archive_bytes
+
+VALUE_CLASS = {"$classname": "NSValue", "$classes": ["NSValue", "NSObject"]}
+
+OBJECTS = [
+    "$null",
+    {"$class": pl.UID(2), "NS.objects": [pl.UID(3), pl.UID(5), pl.UID(6)]},
+    ARRAY_CLASS,
+    {"$class": pl.UID(4), "value": "first", "next": pl.UID(5), "$$dollar": 1},
+    NODE_CLASS,
+    {"$class": pl.UID(4), "value": "second", "next": pl.UID(0)},
+    {"$class": pl.UID(7), "NS.special": 1, "NS.pointval": "{1, 2}"},
+    VALUE_CLASS,
+    ]
+
+# Binary eagerly, binary lazily, and XML
+READS = [(pl.FMT_BINARY, False), (pl.FMT_BINARY, True), (pl.FMT_XML, False)]
+
+
+def _archive(fmt: pl.PlistFormat, lazy: bool, objects: list = OBJECTS) -> NSKeyedArchive:
+    return NSKeyedArchive(io.BytesIO(archive_bytes(objects, fmt)), lazy=lazy)
+
+
+@pytest.mark.parametrize("fmt, lazy", READS)
+def test_iter_instances(fmt, lazy):
+    assert list(_archive(fmt, lazy).iter_instances()) == [
+        (pl.UID(1), "NSArray", {"NS.objects": [pl.UID(3), pl.UID(5), pl.UID(6)]}),
+        (pl.UID(3), "Node", {"value": "first", "next": pl.UID(5), "$dollar": 1}),
+        (pl.UID(5), "Node", {"value": "second", "next": pl.UID(0)}),
+        # Named after its type, with NS.special kept
+        (pl.UID(6), "NSPoint", {"NS.special": 1, "NS.pointval": "{1, 2}"}),
+        ]
+
+
+@pytest.mark.parametrize("fmt, lazy", READS)
+def test_iter_instances_of_some_classes(fmt, lazy):
+    archive = _archive(fmt, lazy)
+    assert [uid for uid, _, _ in archive.iter_instances(["Node"])] == [pl.UID(3), pl.UID(5)]
+    assert [uid for uid, _, _ in archive.iter_instances({"NSPoint", "NSArray"})] == [pl.UID(1), pl.UID(6)]
+    assert list(archive.iter_instances(["Missing"])) == []
+
+
+def test_iter_instances_is_lazy():
+    objects = OBJECTS + [{"$class": pl.UID(3)}]
+    instances = _archive(pl.FMT_BINARY, True, objects).iter_instances()
+    # Nothing is read until asked for, and the bad
+    # instance at the end is only found when reached
+    assert next(instances)[0] == pl.UID(1)
+    with pytest.raises(ValueError, match="not a class"):
+        list(instances)
@@ -0,0 +1,135 @@
+import io
+import pickle
+
+import pytest
+
+from mentalics import Archiver, Unarchiver
+from mentalics.ns_types import (NSArray, NSData, NSDictionary, NSImage, NSMutableArray, NSMutableData,
+                                NSMutableDictionary, NSPoint, NSSize)
+from mentalics.ns_types.ns_value import format_pair, parse_pair
+
+PAYLOAD = b"\x00\x01data" * 100
+
+
+def _write(path, root) -> str:
+    file = io.BytesIO()
+    archiver = Archiver(file)
+    archiver.encode(root)
+    archiver.finish()
+    path.write_bytes(file.getvalue())
+    return str(path)
+
+
+def _decode(path: str, **kwargs):
+    with open(path, "rb") as file:
+        return Unarchiver(file, **kwargs).decode()
+
+
+def test_zero_copy_data_is_a_view(tmp_path):
+    path = _write(tmp_path / "data.plist", [NSData(PAYLOAD), NSData(b"")])
+    data, empty = _decode(path, lazy=True, zero_copy=True)
+
+    # Still readable once the file is closed
+    assert isinstance(data.data, memoryview)
+    assert data.view().obj is data.data.obj
+    assert bytes(data) == PAYLOAD
+    assert len(data) == len(PAYLOAD)
+    assert bytes(empty) == b""
+    assert empty
+
+
+@pytest.mark.parametrize("lazy", [False, True])
+def test_data_is_copied_by_default(tmp_path, lazy):
+    path = _write(tmp_path / "data.plist", NSData(PAYLOAD))
+    data = _decode(path, lazy=lazy)
+    assert isinstance(data.data, bytes)
+    assert bytes(data) == PAYLOAD
+
+
+def test_zero_copy_needs_lazy(tmp_path):
+    path = _write(tmp_path / "data.plist", NSData(PAYLOAD))
+    with pytest.raises(ValueError, match="lazy"):
+        _decode(path, zero_copy=True)
+
+
+def test_mutable_data_is_copied_when_changed(tmp_path):
+    path = _write(tmp_path / "data.plist", NSMutableData(PAYLOAD))
+    data = _decode(path, lazy=True, zero_copy=True)
+    assert isinstance(data, NSMutableData)
+    assert isinstance(data.data, memoryview)
+
+    mutable = data.make_mutable()
+    assert isinstance(mutable, bytearray)
+    assert data.make_mutable() is mutable
+    mutable[:4] = b"edit"
+    assert bytes(data) == b"edit" + PAYLOAD[4:]
+    with open(path, "rb") as file:
+        assert PAYLOAD in file.read()
+
+
+def test_zero_copy_data_round_trips(tmp_path):
+    path = _write(tmp_path / "data.plist", NSData(PAYLOAD))
+    data = _decode(path, lazy=True, zero_copy=True)
+    copy_path = _write(tmp_path / "copy.plist", data)
+    assert bytes(_decode(copy_path)) == PAYLOAD
+
+
+INSTANCES = [
+    NSArray([1, 2]),
+    NSMutableArray([1, 2]),
+    NSDictionary({"a": 1}),
+    NSMutableDictionary({"a": 1}),
+    NSData(b"data"),
+    NSMutableData(b"data"),
+    NSPoint(1, 2),
+    NSSize(3.5, 4),
+    NSImage("description", None, 0, [], 1),
+    ]
+
+
+@pytest.mark.parametrize("obj", INSTANCES, ids=lambda obj: type(obj).__name__)
+def test_no_instance_dict(obj):
+    assert not hasattr(obj, "__dict__")
+
+
+@pytest.mark.parametrize("obj", INSTANCES, ids=lambda obj: type(obj).__name__)
+def test_pickles(obj):
+    copy = pickle.loads(pickle.dumps(obj))
+    assert type(copy) is type(obj)
+    if isinstance(obj, NSData):
+        assert bytes(copy) == bytes(obj)
+    else:
+        assert copy == obj
+
+
+def test_values_are_hashable():
+    assert len({NSPoint(1, 2), NSPoint(1, 2), NSPoint(2, 1), NSSize(1, 2)}) == 3
+
+
+@pytest.mark.parametrize("string, pair", [
+    ("{1, 2}", (1, 2)),
+    ("{-1, 0}", (-1, 0)),
+    ("{1.5, -2.25}", (1.5, -2.25)),
+    ("{1, 2.5}", (1, 2.5)),
+    ("{ 3 ,4 }", (3, 4)),
+    ("{1e3, 2}", (1000.0, 2)),
+    ])
+def test_parse_pair(string, pair):
+    parsed = parse_pair(string)
+    assert parsed == pair
+    assert [type(n) for n in parsed] == [type(n) for n in pair]
+
+
+@pytest.mark.parametrize("string", ["1, 2", "{1, 2", "{1}", "{1, 2, 3}", "{a, b}", "", "{}"])
+def test_parse_invalid_pair(string):
+    with pytest.raises(ValueError):
+        parse_pair(string)
+
+
+@pytest.mark.parametrize("pair", [(1, 2), (-1.5, 2.25), (0, 1e20)])
+def test_format_pair_round_trips(pair):
+    assert parse_pair(format_pair(*pair)) == pair
+
+
+def test_format_pair_writes_whole_floats_as_integers():
+    assert format_pair(1.0, -2.0) == "{1, -2}"
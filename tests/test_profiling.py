@@ -0,0 +1,110 @@
+import io
+import json
+import plistlib as pl
+import time
+
+from mentalics import Archiver, InternPool, Unarchiver, ValueNSCoding
+from mentalics.ns_types import NSPoint
+from mentalics.profiling import MAX_QUEUE_SAMPLES, ROOT_FRAME, ClassProfile, DecodeProfiler
+
+from .helpers import CLASS_MAP, NODE_CLASS, Node, make_archive
+
+SLOW_INIT_SECONDS = 0.05
+
+
+class SlowValue(ValueNSCoding):
+    """
+    A value that takes SLOW_INIT_SECONDS to decode
+    """
+
+    def __init_from_archive__(self, decoder) -> "ValueNSCoding":
+        time.sleep(SLOW_INIT_SECONDS)
+        return self
+
+    def encode_archive(self, coder) -> None:
+        coder.encode_inline("slow", for_key="name")
+
+
+def _archive(root, class_map: dict) -> bytes:
+    file = io.BytesIO()
+    archiver = Archiver(file, class_map=dict(class_map))
+    archiver.encode(root)
+    archiver.finish()
+    return file.getvalue()
+
+
+def test_values_initialized_inline_are_not_counted_twice():
+    class_map = dict(CLASS_MAP, SlowValue=SlowValue)
+    profiler = DecodeProfiler()
+    unarchiver = Unarchiver(io.BytesIO(_archive(Node(SlowValue()), class_map)), class_map=class_map,
+                            error_on_ignored_attributes=False, profiler=profiler, intern_pool=InternPool())
+    assert isinstance(unarchiver.decode().value, SlowValue)
+
+    assert profiler.classes["SlowValue"].init_seconds >= SLOW_INIT_SECONDS
+    assert profiler.classes["Node"].init_seconds < SLOW_INIT_SECONDS
+
+
+def _profile(root, profiler: DecodeProfiler) -> DecodeProfiler:
+    Unarchiver(io.BytesIO(_archive(root, CLASS_MAP)), class_map=dict(CLASS_MAP), profiler=profiler).decode()
+    return profiler
+
+
+def test_counts_per_class():
+    profiler = _profile(Node(NSPoint(1, 2), Node("a", Node("b"))), DecodeProfiler())
+    assert sorted(profiler.classes) == ["NSPoint", "Node"]
+    assert profiler.classes["Node"].instance_count == 3
+    assert profiler.classes["NSPoint"].instance_count == 1
+    assert all(profile.init_ns > 0 for profile in profiler.classes.values())
+
+
+def test_shared_between_unarchivers():
+    profiler = DecodeProfiler()
+    _profile(Node("a"), profiler)
+    _profile(Node("b", Node("c")), profiler)
+    assert profiler.classes["Node"].instance_count == 3
+
+
+def test_source_bytes():
+    archive = make_archive(["$null", {"$class": pl.UID(2), "value": "abc", "next": pl.UID(0)}, NODE_CLASS])
+    profiler = DecodeProfiler()
+    Unarchiver(archive, class_map=dict(CLASS_MAP), profiler=profiler).decode()
+    # Each key, the string's length, and 8 for the UIDs
+    assert profiler.classes["Node"].source_bytes == len("$class") + 8 + len("value") + 3 + len("next") + 8
+
+
+def test_queue_depths_are_sampled():
+    profiler = _profile(Node("a", Node("b", Node("c"))), DecodeProfiler(sample_every=1))
+    assert [initialized for initialized, _ in profiler.queue_depths] == [1, 2, 3]
+    assert all(depth >= 0 for _, depth in profiler.queue_depths)
+    assert profiler.queue_depths[-1][1] == 0
+
+    assert _profile(Node("a", Node("b")), DecodeProfiler(sample_every=2)).queue_depths == [(2, 0)]
+
+
+def test_samples_are_halved_when_there_are_too_many():
+    profiler = DecodeProfiler(sample_every=1)
+    for depth in range(MAX_QUEUE_SAMPLES):
+        profiler.sample_queue(depth)
+    assert profiler.sample_every == 2
+    assert len(profiler.queue_depths) == MAX_QUEUE_SAMPLES // 2
+    assert all(initialized % 2 == 0 for initialized, _ in profiler.queue_depths)
+
+    # Now only every other object is sampled
+    profiler.sample_queue(0)
+    assert len(profiler.queue_depths) == MAX_QUEUE_SAMPLES // 2
+    profiler.sample_queue(0)
+    assert len(profiler.queue_depths) == MAX_QUEUE_SAMPLES // 2 + 1
+
+
+def test_to_json():
+    profiler = _profile(Node("a"), DecodeProfiler(sample_every=1))
+    loaded = json.loads(profiler.to_json())
+    assert loaded["classes"]["Node"]["instance_count"] == 1
+    assert ClassProfile(**loaded["classes"]["Node"]) == profiler.classes["Node"]
+    assert loaded["queue_depths"] == [list(sample) for sample in profiler.queue_depths]
+
+
+def test_folded():
+    profiler = DecodeProfiler()
+    profiler.classes = {"b": ClassProfile(init_ns=2_500_000), "a": ClassProfile(init_ns=999)}
+    assert profiler.folded() == f"{ROOT_FRAME};a 0\n{ROOT_FRAME};b 2500\n"
@@ -0,0 +1,91 @@
+import plistlib as pl
+
+from mentalics import Unarchiver
+from mentalics.ns_keyed_archive import NSKeyedArchive
+
+from . import helpers
+from .helpers import NODE_CLASS, Node, make_archive
+
+
+class OtherNode(Node):
+    pass
+
+
+CLASS_MAP = dict(helpers.CLASS_MAP, OtherNode=OtherNode)
+
+OTHER_NODE_CLASS = {"$classname": "OtherNode", "$classes": ["OtherNode", "Node", "NSObject"]}
+
+
+def _archive(first_value="first", second_value: pl.UID = pl.UID(4), second_class: pl.UID = pl.UID(3)
+             ) -> NSKeyedArchive:
+    """
+    first -> second -> $null, with second's
+    value a reference to a string
+    """
+    return make_archive([
+        "$null",
+        {"$class": pl.UID(3), "value": first_value, "next": pl.UID(2)},
+        {"$class": second_class, "value": second_value, "next": pl.UID(0)},
+        NODE_CLASS,
+        "second",
+        "changed",
+        OTHER_NODE_CLASS,
+        ])
+
+
+def _decode(archive: NSKeyedArchive) -> tuple[Unarchiver, Node]:
+    unarchiver = Unarchiver(archive, class_map=dict(CLASS_MAP))
+    return unarchiver, unarchiver.decode()
+
+
+def test_unchanged_objects_are_reused():
+    unarchiver, root = _decode(_archive())
+    second = root.next
+
+    new_root = unarchiver.redecode(_archive()).decode()
+    assert new_root is root
+    assert new_root.next is second
+    assert (new_root.value, new_root.next.value) == ("first", "second")
+
+
+def test_changed_objects_are_reinitialized_in_place():
+    unarchiver, root = _decode(_archive())
+    second = root.next
+
+    new_root = unarchiver.redecode(_archive(first_value="edited")).decode()
+    assert new_root is root
+    assert new_root.value == "edited"
+    assert new_root.next is second
+
+
+def test_replaced_references_reach_their_referrers():
+    unarchiver, root = _decode(_archive())
+    second = root.next
+
+    # Only the string second references has changed
+    new_root = unarchiver.redecode(_archive(second_value=pl.UID(5))).decode()
+    assert new_root is root
+    assert new_root.next is second
+    assert second.value == "changed"
+
+
+def test_objects_of_another_class_are_replaced():
+    unarchiver, root = _decode(_archive())
+    second = root.next
+
+    new_root = unarchiver.redecode(_archive(second_class=pl.UID(6))).decode()
+    assert new_root is root
+    assert isinstance(new_root.next, OtherNode)
+    assert new_root.next is not second
+    assert new_root.next.value == "second"
+
+
+def test_matches_a_fresh_decode():
+    unarchiver, _ = _decode(_archive())
+    edited = _archive(first_value="edited", second_value=pl.UID(5), second_class=pl.UID(6))
+
+    redecoded = unarchiver.redecode(edited).decode()
+    _, fresh = _decode(edited)
+    assert type(redecoded.next) is type(fresh.next)
+    assert (redecoded.value, redecoded.next.value, redecoded.next.next) == (
+        fresh.value, fresh.next.value, fresh.next.next)
@@ -0,0 +1,217 @@
+import plistlib as pl
+import sys
+
+import pytest
+
+from mentalics import InternPool, NSCoding, Unarchiver
+from mentalics.ns_types import NS_TYPES, NSPoint, NSSize
+from mentalics.unarchiver import MAX_LAYOUTS_PER_CLASS
+
+from .helpers import ARRAY_CLASS, CLASS_MAP, NODE_CLASS, Node, make_archive
+
+FLEXIBLE_CLASS = {"$classname": "Flexible", "$classes": ["Flexible", "NSObject"]}
+VALUE_CLASS = {"$classname": "NSValue", "$classes": ["NSValue", "NSObject"]}
+
+# A root array of two nodes, a point and a size,
+# the point and the size sharing their NSValue class
+MIXED_OBJECTS = [
+    "$null",
+    {"$class": pl.UID(2), "NS.objects": [pl.UID(3), pl.UID(5), pl.UID(6), pl.UID(8)]},
+    ARRAY_CLASS,
+    {"$class": pl.UID(4), "value": 1, "next": pl.UID(0)},
+    NODE_CLASS,
+    {"$class": pl.UID(4), "value": 2, "next": pl.UID(3)},
+    {"$class": pl.UID(7), "NS.special": 1, "NS.pointval": "{1, 2}"},
+    VALUE_CLASS,
+    {"$class": pl.UID(7), "NS.special": 2, "NS.sizeval": "{3, 4}"},
+    ]
+
+
+class Flexible(NSCoding):
+    """
+    Decodes whichever of a few keys it was archived with
+    """
+
+    KEYS = ("a", "b", "c", "d", "$dollar")
+
+    def __init_from_archive__(self, decoder) -> "NSCoding":
+        self.values = {key: decoder.decode(key) for key in self.KEYS if decoder.contains_value(key)}
+        return self
+
+
+def _decode(instances: list[dict], error_on_ignored_attributes: bool = True) -> list:
+    """
+    Decode a root array of instances of
+    Flexible (whose $class is UID 3)
+    """
+    objects = ["$null", {"$class": pl.UID(2), "NS.objects": [pl.UID(4 + i) for i in range(len(instances))]},
+               ARRAY_CLASS, FLEXIBLE_CLASS]
+    objects += [{"$class": pl.UID(3), **instance} for instance in instances]
+    unarchiver = Unarchiver(make_archive(objects), class_map=dict(CLASS_MAP, Flexible=Flexible),
+                            error_on_ignored_attributes=error_on_ignored_attributes)
+    return unarchiver.decode()
+
+
+def test_instances_of_a_class_with_different_keys():
+    instances = [{"a": 1, "b": 2}, {"a": 3}, {"c": 4, "d": 5}, {"a": 6, "b": 7}, {}]
+    assert [obj.values for obj in _decode(instances)] == instances
+
+
+def test_more_layouts_than_are_kept():
+    keys = Flexible.KEYS[:4]
+    # Every subset of the keys
+    instances = [{key: i for j, key in enumerate(keys) if i & (1 << j)} for i in range(1 << len(keys))]
+    assert len(instances) > MAX_LAYOUTS_PER_CLASS
+    assert [obj.values for obj in _decode(instances + instances)] == instances + instances
+
+
+def test_sanitized_keys():
+    # "$dollar" is archived as "$$dollar"
+    assert _decode([{"$$dollar": 1}])[0].values == {"$dollar": 1}
+
+
+def test_ignored_attributes_are_found_in_every_layout():
+    # The first layout is fine, the second has a key Flexible ignores
+    with pytest.raises(ValueError, match="ignored"):
+        _decode([{"a": 1}, {"a": 2, "ignored": 3}])
+
+
+def test_ignored_attributes_can_be_allowed():
+    decoded = _decode([{"a": 1}, {"a": 2, "ignored": 3}], error_on_ignored_attributes=False)
+    assert [obj.values for obj in decoded] == [{"a": 1}, {"a": 2}]
+
+
+class OtherNode(Node):
+    pass
+
+
+class OtherSize(NSSize):
+    pass
+
+
+def test_unresolved_class_names():
+    objects = MIXED_OBJECTS + [{"$class": pl.UID(7), "NS.special": 99}]
+    objects[1] = {"$class": pl.UID(2), "NS.objects": objects[1]["NS.objects"] + [pl.UID(9)]}
+    unarchiver = Unarchiver(make_archive(objects), class_map=dict(NS_TYPES))
+    assert unarchiver.unresolved_class_names() == {"Node", "NSValue (NS.special=99)"}
+
+
+def test_check_classes():
+    unarchiver = Unarchiver(make_archive(MIXED_OBJECTS), class_map=dict(NS_TYPES))
+    with pytest.raises(ValueError, match="Node"):
+        unarchiver.check_classes()
+
+    unarchiver.set_class(Node, "Node")
+    unarchiver.check_classes()
+    first, second, point, size = unarchiver.decode()
+    assert second.next is first
+    assert (point, size) == (NSPoint(1, 2), NSSize(3, 4))
+
+
+def test_instance_of_something_other_than_a_class():
+    objects = MIXED_OBJECTS + [{"$class": pl.UID(3)}]
+    with pytest.raises(ValueError, match="not a class"):
+        Unarchiver(make_archive(objects), class_map=dict(CLASS_MAP)).unresolved_class_names()
+
+
+def test_missing_class_raises_when_decoded():
+    with pytest.raises(ValueError, match="Node"):
+        Unarchiver(make_archive(MIXED_OBJECTS), class_map=dict(NS_TYPES)).decode()
+
+
+def test_classes_set_after_decoding_starts():
+    unarchiver = Unarchiver(make_archive(MIXED_OBJECTS), class_map=dict(CLASS_MAP))
+    assert type(unarchiver.decode_path("root", 0)) is Node
+    assert unarchiver.decode_path("root", 2) == NSPoint(1, 2)
+
+    # Instances of the same $class decoded from now on use the new class
+    unarchiver.set_class(OtherNode, "Node")
+    unarchiver.set_class(OtherSize, "NSSize")
+    assert type(unarchiver.decode_path("root", 1)) is OtherNode
+    assert type(unarchiver.decode_path("root", 3)) is OtherSize
+
+
+# Deeper than Python could recurse
+DEEP = sys.getrecursionlimit() * 3
+
+
+def test_deeply_nested_lists():
+    # [[[... ["bottom", node] ...]]], in a node's value
+    nested = [pl.UID(3), pl.UID(1)]
+    for _ in range(DEEP):
+        nested = [nested]
+    objects = ["$null", {"$class": pl.UID(2), "value": nested, "next": pl.UID(0)}, NODE_CLASS, "bottom"]
+    root = Unarchiver(make_archive(objects), class_map=dict(CLASS_MAP)).decode()
+
+    value = root.value
+    for _ in range(DEEP):
+        assert len(value) == 1
+        value = value[0]
+    assert value == ["bottom", root]
+
+
+def test_nested_lists_of_mixed_depths():
+    value = [1, [2, pl.UID(3)], [[3, [4]], []], [pl.UID(0)], 5]
+    objects = ["$null", {"$class": pl.UID(2), "value": value, "next": pl.UID(0)}, NODE_CLASS, "three"]
+    root = Unarchiver(make_archive(objects), class_map=dict(CLASS_MAP)).decode()
+    assert root.value == [1, [2, "three"], [[3, [4]], []], [None], 5]
+
+
+def test_long_chains_of_objects():
+    # Each node the next's value
+    objects = ["$null", NODE_CLASS]
+    objects += [{"$class": pl.UID(1), "value": pl.UID(uid + 1) if uid < DEEP else "end", "next": pl.UID(0)}
+                for uid in range(2, DEEP + 1)]
+    node = Unarchiver(make_archive(objects, root=pl.UID(2)), class_map=dict(CLASS_MAP)).decode()
+    length = 1
+    while isinstance(node.value, Node):
+        node, length = node.value, length + 1
+    assert (length, node.value) == (DEEP - 1, "end")
+
+
+# A root array of one node (twice), $null, a string (twice),
+# referenced plist values, a node referring back to the
+# array, an inline value, a nested list and a point
+LIST_OBJECTS = [
+    "$null",
+    {"$class": pl.UID(2), "NS.objects": [pl.UID(3), pl.UID(3), pl.UID(0), pl.UID(5), pl.UID(5), pl.UID(6),
+                                         pl.UID(7), pl.UID(8), 42, [pl.UID(3), pl.UID(5)], pl.UID(9)]},
+    ARRAY_CLASS,
+    {"$class": pl.UID(4), "value": pl.UID(5), "next": pl.UID(0)},
+    NODE_CLASS,
+    "a string",
+    7,
+    b"data",
+    {"$class": pl.UID(4), "value": pl.UID(1), "next": pl.UID(3)},
+    {"$class": pl.UID(10), "NS.special": 1, "NS.pointval": "{1, 2}"},
+    VALUE_CLASS,
+    ]
+
+
+@pytest.mark.parametrize("intern_pool", [None, InternPool()], ids=["plain", "interned"])
+def test_lists(intern_pool):
+    root = Unarchiver(make_archive(LIST_OBJECTS), class_map=dict(CLASS_MAP), intern_pool=intern_pool).decode()
+    node, same_node, null, string, same_string, number, data, other_node, inline, nested, point = root
+
+    assert isinstance(node, Node) and node is same_node
+    assert null is None
+    assert string == "a string" and string is same_string and node.value is string
+    assert (number, data, inline) == (7, b"data", 42)
+    assert other_node.value is root and other_node.next is node
+    assert nested == [node, string] and nested[0] is node and nested[1] is string
+    assert point == NSPoint(1, 2)
+
+
+def test_lists_share_decoded_objects():
+    # The node is decoded as the array's value before the list
+    objects = ["$null", {"$class": pl.UID(2), "value": pl.UID(3), "next": pl.UID(4)}, NODE_CLASS,
+               {"$class": pl.UID(2), "value": 1, "next": pl.UID(0)},
+               {"$class": pl.UID(2), "value": [pl.UID(3), pl.UID(3)], "next": pl.UID(0)}]
+    root = Unarchiver(make_archive(objects), class_map=dict(CLASS_MAP)).decode()
+    assert root.next.value[0] is root.next.value[1] is root.value
+
+
+def test_lists_cannot_hold_classes():
+    objects = ["$null", {"$class": pl.UID(2), "NS.objects": [pl.UID(2)]}, ARRAY_CLASS]
+    with pytest.raises(ValueError):
+        Unarchiver(make_archive(objects)).decode()
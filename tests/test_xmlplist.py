@@ -0,0 +1,106 @@
+import io
+import plistlib as pl
+from datetime import datetime
+
+import pytest
+
+from mentalics import Unarchiver
+from mentalics.ns_keyed_archive import NSKeyedArchive
+from mentalics.xmlplist import READ_CHUNK_SIZE, load_xml_archive
+
+from .helpers import ARRAY_CLASS, archive_bytes
+
+OBJECTS = [
+    "$null",
+    {
+        "$class": pl.UID(2),
+        "NS.objects": [pl.UID(3), pl.UID(4), pl.UID(0)],
+        "true": True,
+        "false": False,
+        "integer": -42,
+        "large": 2 ** 60,
+        "real": 0.25,
+        "date": datetime(2021, 6, 7, 8, 9, 10),
+        "data": b"\x00\xff" * 50,
+        "nested": {"list": [1, [2, {"three": "3"}]]},
+        "empty": [],
+        },
+    ARRAY_CLASS,
+    "a string & <escaped> text",
+    "héllo ☃",
+    ]
+
+
+def _archive(objects: list, fmt: pl.PlistFormat = pl.FMT_XML) -> bytes:
+    return archive_bytes(objects, fmt)
+
+
+def test_matches_plistlib():
+    xml = NSKeyedArchive(io.BytesIO(_archive(OBJECTS)))
+    binary = NSKeyedArchive(io.BytesIO(_archive(OBJECTS, fmt=pl.FMT_BINARY)))
+    assert xml.version == binary.version
+    assert xml.top == binary.top
+    assert xml.objects == binary.objects
+
+
+def test_cf_uid_dicts_become_uids():
+    version, top, objects = load_xml_archive(io.BytesIO(_archive(OBJECTS)))
+    assert version == 100_000
+    assert top == {"root": pl.UID(1)}
+    assert list(objects) == [pl.UID(i) for i in range(len(OBJECTS))]
+    assert objects[pl.UID(1)]["$class"] == pl.UID(2)
+    assert objects[pl.UID(1)]["NS.objects"] == [pl.UID(3), pl.UID(4), pl.UID(0)]
+    assert all(isinstance(uid, pl.UID) for uid in objects[pl.UID(1)]["NS.objects"])
+
+
+def test_equal_uids_are_shared():
+    _, _, objects = load_xml_archive(io.BytesIO(_archive(["$null", [pl.UID(0), pl.UID(0)]])))
+    first, second = objects[pl.UID(1)]
+    assert first is second
+
+
+def test_larger_than_a_chunk():
+    objects = ["$null", {"$class": pl.UID(2), "NS.objects": [pl.UID(3)] * 20_000},
+               ARRAY_CLASS, "x" * 100]
+    data = _archive(objects)
+    assert len(data) > 2 * READ_CHUNK_SIZE
+    assert Unarchiver(io.BytesIO(data)).decode() == ["x" * 100] * 20_000
+
+
+def test_decodes():
+    root = Unarchiver(io.BytesIO(_archive(OBJECTS)), error_on_ignored_attributes=False).decode()
+    assert root == ["a string & <escaped> text", "héllo ☃", None]
+
+
+def test_entities_are_rejected():
+    data = b'<?xml version="1.0"?><!DOCTYPE plist [<!ENTITY a "b">]><plist><dict/></plist>'
+    with pytest.raises(pl.InvalidFileException):
+        load_xml_archive(io.BytesIO(data))
+
+
+@pytest.mark.parametrize("data", [
+    b"",
+    b"not xml at all",
+    b'<?xml version="1.0"?><plist><dict><key>a</key></array></plist>',
+    ], ids=["empty", "not xml", "mismatched tags"])
+def test_malformed_xml(data):
+    with pytest.raises(pl.InvalidFileException) as raised:
+        load_xml_archive(io.BytesIO(data))
+    assert raised.value.__cause__ is not None
+
+
+def test_truncated_xml():
+    data = _archive(OBJECTS)
+    with pytest.raises(pl.InvalidFileException):
+        load_xml_archive(io.BytesIO(data[:len(data) // 2]))
+
+
+def test_not_an_archive():
+    with pytest.raises(pl.InvalidFileException):
+        load_xml_archive(io.BytesIO(pl.dumps({"just": "a plist"})))
+
+
+def test_cf_uid_must_be_an_integer():
+    data = pl.dumps({"$version": 100_000, "$top": {"root": {"CF$UID": "one"}}, "$objects": ["$null"]})
+    with pytest.raises(ValueError):
+        load_xml_archive(io.BytesIO(data))